@@ -1,30 +1,163 @@
-import pyaudiowpatch as pyaudio
-import numpy as np
 import threading
-import queue
+import time
+from collections import deque
 
-class AudioCapture:
-    def __init__(self, sample_rate=16000, block_size=1024):
+try:
+    import pyaudiowpatch as pyaudio
+except ImportError:
+    # Only the WASAPI loopback capture needs it; file/pipe/synthetic sources run anywhere.
+    pyaudio = None
+
+import metrics
+from resample import Resampler
+from ringbuffer import RingBuffer
+
+class AudioSource:
+    # Produces 16k mono float32 audio from its own thread. Subclasses implement
+    # _record_loop and hand int16 interleaved blocks to _deliver. Standalone, audio goes
+    # into self.ring for get_audio_chunk(); connect(sink) instead writes every block
+    # straight into the consumer's queue (the transcriber's AudioBacklog).
+    def __init__(self, sample_rate=16000, block_size=1024, buffer_seconds=10.0, realtime=True):
         self.sample_rate = sample_rate
         self.block_size = block_size
-        self.audio_queue = queue.Queue()
+        # Producer writes converted audio straight into a preallocated ring; the oldest
+        # audio is dropped if the consumer falls more than buffer_seconds behind.
+        self.ring = RingBuffer(int(buffer_seconds * sample_rate))
+        # Paced sources deliver at wall-clock rate; unpaced ones run as fast as the
+        # consumer drains the ring and never drop audio.
+        self.realtime = realtime
         self.running = False
         self.thread = None
-        self.p = None
-        self.stream = None
+        self.sink = None
+        self.finished = threading.Event()
+        self._stopping = threading.Event()
+        self._resampler = None
+        self._frames_delivered = 0
+        self._started_at = 0.0
+        # (ring write position, perf_counter) per block written. Appending to a deque is the
+        # only per-block cost; get_audio_chunk turns it into last_captured_at.
+        self._stamps = deque(maxlen=1024)
+        self.last_captured_at = None
+        self.overruns = 0
+        # Summed over every live capture, so each source counts.
+        metrics.REGISTRY.gauge("capture_ring_seconds", "Captured audio waiting for the bridge",
+                               fn=lambda c: len(c.ring) / c.sample_rate, owner=self)
+        metrics.REGISTRY.gauge("capture_dropped_seconds", "Audio dropped by the capture rings on overflow",
+                               fn=lambda c: c.ring.dropped / c.sample_rate, owner=self)
+        metrics.REGISTRY.gauge("capture_overruns", "Device buffer overruns reported by the capture callbacks",
+                               fn=lambda c: c.overruns, owner=self)
+
+    def connect(self, sink):
+        # sink.put(samples, block, captured_at) is called on the capture thread for every
+        # block: no ring, bridge thread or polling in between. Unpaced sources block in
+        # put() when the sink is full (back-pressure); live ones never wait.
+        self.sink = sink
 
     def start(self):
         self.running = True
-        self.thread = threading.Thread(target=self._record_loop)
+        self.finished.clear()
+        self._stopping.clear()
+        self.thread = threading.Thread(target=self._run)
         self.thread.daemon = True
         self.thread.start()
 
     def stop(self):
         self.running = False
+        self._stopping.set()
         if self.thread:
             self.thread.join()
 
+    def _run(self):
+        try:
+            self._record_loop()
+        finally:
+            self.finished.set()
+
     def _record_loop(self):
+        raise NotImplementedError
+
+    def _open(self, device_rate, channels):
+        # Filter bank and all scratch buffers are built once per stream, so per-block work
+        # only runs preallocated numpy kernels.
+        self.device_rate = int(device_rate)
+        self.channels = int(channels)
+        self._resampler = Resampler(self.device_rate, self.sample_rate, self.channels, max_block=self.block_size)
+        self._frames_delivered = 0
+        self._started_at = time.perf_counter()
+
+    def _deliver(self, block):
+        # block: int16 interleaved samples (bytes or ndarray) at the device rate.
+        out = self._resampler.process(block)
+        if self.sink is not None:
+            self.sink.put(out, block=not self.realtime, captured_at=time.perf_counter())
+        else:
+            if not self.realtime:
+                # Back-pressure instead of drop-oldest when running unpaced.
+                while self.running and self.ring.free < len(out):
+                    time.sleep(0.002)
+            self.ring.write(out)
+            self._stamp()
+
+        self._frames_delivered += len(out)
+        if self.realtime:
+            due = self._started_at + self._frames_delivered / self.sample_rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def _stamp(self):
+        self._stamps.append((self.ring.write_pos, time.perf_counter()))
+
+    def get_audio_chunk(self):
+        # Drain everything captured since the last call in one copy. last_captured_at is
+        # the capture time of the newest sample in it (perf_counter clock).
+        if len(self.ring) == 0:
+            return None
+        chunk = self.ring.read()
+        end = self.ring.read_pos
+        stamps = self._stamps
+        while stamps and stamps[0][0] < end:
+            stamps.popleft()
+        self.last_captured_at = stamps[0][1] if stamps else time.perf_counter()
+        return chunk
+
+class AudioCapture(AudioSource):
+    # WASAPI loopback of the default output device (Windows, PyAudioWPatch).
+    def __init__(self, sample_rate=16000, block_size=1024, buffer_seconds=10.0):
+        super().__init__(sample_rate, block_size, buffer_seconds, realtime=True)
+        self.p = None
+        self.stream = None
+
+    def _find_device(self, wasapi_info):
+        # Get default output device
+        default_speakers = self.p.get_device_info_by_index(wasapi_info["defaultOutputDevice"])
+        print(f"Default Output Device: {default_speakers['name']}")
+
+        # Find loopback device
+        loopback_device = None
+        if not default_speakers["isLoopbackDevice"]:
+            for loopback in self.p.get_loopback_device_info_generator():
+                if default_speakers["name"] in loopback["name"]:
+                    loopback_device = loopback
+                    break
+
+            # Fallback: use first loopback device if exact match not found
+            if not loopback_device:
+                for loopback in self.p.get_loopback_device_info_generator():
+                    loopback_device = loopback
+                    break
+        else:
+            loopback_device = default_speakers
+
+        if not loopback_device:
+            print("No loopback device found.")
+        return loopback_device
+
+    def _record_loop(self):
+        if pyaudio is None:
+            print("PyAudioWPatch not available; loopback capture requires Windows")
+            return
+
         try:
             self.p = pyaudio.PyAudio()
             
@@ -35,54 +168,31 @@ class AudioCapture:
                 print("WASAPI not found")
                 return
 
-            # Get default output device
-            default_speakers = self.p.get_device_info_by_index(wasapi_info["defaultOutputDevice"])
-            print(f"Default Output Device: {default_speakers['name']}")
-            
-            # Find loopback device
-            loopback_device = None
-            if not default_speakers["isLoopbackDevice"]:
-                for loopback in self.p.get_loopback_device_info_generator():
-                    if default_speakers["name"] in loopback["name"]:
-                        loopback_device = loopback
-                        break
-                
-                # Fallback: use first loopback device if exact match not found
-                if not loopback_device:
-                    for loopback in self.p.get_loopback_device_info_generator():
-                        loopback_device = loopback
-                        break
-            else:
-                loopback_device = default_speakers
-
+            loopback_device = self._find_device(wasapi_info)
             if not loopback_device:
-                print("No loopback device found.")
                 return
 
             print(f"Recording from: {loopback_device['name']}")
             
+            self._open(loopback_device["defaultSampleRate"], loopback_device["maxInputChannels"])
+            resampler = self._resampler
+            sink = self.sink
+
             def callback(in_data, frame_count, time_info, status):
                 if not self.running:
                     return (None, pyaudio.paComplete)
-                
-                # Convert to numpy array
-                audio_data = np.frombuffer(in_data, dtype=np.int16)
-                audio_data = audio_data.astype(np.float32) / 32768.0
-                channels = loopback_device["maxInputChannels"]
-                audio_data = audio_data.reshape(-1, channels)
-                mono_data = np.mean(audio_data, axis=1)
-                
-                # Resample if necessary
-                device_rate = int(loopback_device["defaultSampleRate"])
-                if device_rate == 48000:
-                    mono_data = mono_data[::3]
-                elif device_rate == 44100:
-                    step = device_rate / 16000
-                    indices = np.arange(0, len(mono_data), step).astype(int)
-                    indices = indices[indices < len(mono_data)]
-                    mono_data = mono_data[indices]
-
-                self.audio_queue.put(mono_data)
+                if status:
+                    # paInputOverflow and friends: the device dropped audio before we saw it.
+                    self.overruns += 1
+
+                # int16 -> float32, downmix to mono and anti-aliased resample to 16k in one pass.
+                # The device clock paces this callback, so it writes directly.
+                out = resampler.process(in_data)
+                if sink is not None:
+                    sink.put(out, captured_at=time.perf_counter())
+                else:
+                    self.ring.write(out)
+                    self._stamp()
                 return (None, pyaudio.paContinue)
 
             # Open stream
@@ -98,10 +208,12 @@ class AudioCapture:
             
             self.stream.start_stream()
             
-            while self.running:
-                self.stream.is_active()
-                import time
-                time.sleep(0.1)
+            # Sleep until stop(); the callback does all the work. A stream that dies
+            # (device removed) ends the loop at the next check.
+            while not self._stopping.wait(1.0):
+                if not self.stream.is_active():
+                    print("Capture stream stopped.")
+                    break
 
         except Exception as e:
             print(f"Error in audio capture: {e}")
@@ -112,8 +224,13 @@ class AudioCapture:
             if self.p:
                 self.p.terminate()
 
-    def get_audio_chunk(self):
-        try:
-            return self.audio_queue.get_nowait()
-        except queue.Empty:
+
+class MicrophoneCapture(AudioCapture):
+    # WASAPI default input device (the local microphone), through the same callback path.
+    def _find_device(self, wasapi_info):
+        if wasapi_info["defaultInputDevice"] < 0:
+            print("No microphone found.")
             return None
+        device = self.p.get_device_info_by_index(wasapi_info["defaultInputDevice"])
+        print(f"Default Input Device: {device['name']}")
+        return device
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+from draft import word_edits, words
+
+SAMPLE_RATE = 16000
+# What CTranslate2 can run on a CPU, most to least quantized.
+CPU_COMPUTE_TYPES = ("int8", "int8_float32", "float32")
+PROFILE_DIR_ENV = "CAPTIONS_PROFILE_DIR"
+
+
+def cpu_name():
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine() or "cpu"
+
+
+def host_key():
+    # Profiles are per SKU (CPU model and count), so one tuned host covers its identical
+    # siblings: copy the profile file to them.
+    slug = re.sub(r"[^a-z0-9]+", "-", cpu_name().lower()).strip("-")
+    return f"{slug}-{os.cpu_count()}cpu"
+
+
+def profile_path(directory=None):
+    directory = directory or os.environ.get(PROFILE_DIR_ENV) or os.path.join(
+        os.path.expanduser("~"), ".cache", "desktop-audio-to-text", "profiles")
+    return os.path.join(directory, f"{host_key()}.json")
+
+
+def load_profile(model_size, path=None):
+    # Tuned settings for model_size on this host (a dict), or None.
+    path = path or profile_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"CPU profile: could not read {path}: {e}")
+        return None
+    if profile.get("host") != host_key():
+        print(f"CPU profile: {path} was tuned on {profile.get('host')}, not this host ({host_key()}); ignored")
+        return None
+    return profile.get("models", {}).get(model_size)
+
+
+def save_profile(model_size, settings, path=None):
+    # Adds or replaces model_size's entry; other models' entries are kept.
+    path = path or profile_path()
+    profile = dict(host=host_key(), cpu=cpu_name(), cpus=os.cpu_count(), models={})
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            existing = json.load(f)
+        if existing.get("host") == profile["host"]:
+            profile["models"] = existing.get("models", {})
+    profile["models"][model_size] = settings
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def thread_splits(cpus, streams=1):
+    # (cpu_threads, num_workers): one worker per concurrent stream or a single shared
+    # one, each with all or half of the cores it gets.
+    splits = []
+    for workers in sorted({1, max(1, streams)}):
+        for threads in (cpus // workers, cpus // (2 * workers)):
+            if threads >= 1 and (threads, workers) not in splits:
+                splits.append((threads, workers))
+    return splits
+
+
+def supported_compute_types():
+    import ctranslate2
+
+    supported = ctranslate2.get_supported_compute_types("cpu")
+    return [c for c in CPU_COMPUTE_TYPES if c in supported]
+
+
+def whisper_factory(model_size, compute_type, cpu_threads, num_workers):
+    from faster_whisper import WhisperModel
+
+    return WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads,
+                        num_workers=num_workers)
+
+
+@dataclass(frozen=True)
+class Candidate:
+    compute_type: str
+    cpu_threads: int
+    num_workers: int
+    beam_size: int
+    transcribe_interval: float
+
+    def __str__(self):
+        return (f"{self.compute_type}/{self.cpu_threads}t x{self.num_workers}/beam{self.beam_size}/"
+                f"{self.transcribe_interval:g}s")
+
+
+def agreement(reference, hypothesis):
+    # 1 - word error rate of hypothesis against reference (floored at 0).
+    reference, hypothesis = words(reference), words(hypothesis)
+    if not reference:
+        return 1.0 if not hypothesis else 0.0
+    return max(0.0, 1.0 - word_edits(reference, hypothesis) / len(reference))
+
+
+def decode(model, audio, window, beam_size, language=None, streams=1):
+    # The fixture in window-second pieces through AudioTranscriber's offline path (live
+    # decode settings, language lock, hallucination filter), `streams` copies at once the
+    # way several sources share one model. Returns (text, language, rtf) with rtf the
+    # wall seconds per audio second of one stream.
+    from transcriber import AudioTranscriber
+
+    texts, languages = [], []
+
+    def run():
+        t = AudioTranscriber(model=model, beam_size=beam_size, transcribe_interval=window, warmup_decode=False,
+                             language_id=False)
+        if language:
+            t.locked_language = language
+            t.last_language_check_ts = time.time()
+        step = int(window * SAMPLE_RATE)
+        pieces = []
+        for start in range(0, len(audio), step):
+            captions, piece_language, _ = t.transcribe_segments(audio[start:start + step], start / SAMPLE_RATE)
+            pieces += [c.text for c in captions]
+            languages.append(piece_language)
+        texts.append(" ".join(pieces))
+
+    threads = [threading.Thread(target=run) for _ in range(streams)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    rtf = (time.perf_counter() - start) / (len(audio) / SAMPLE_RATE)
+    return texts[0], language or next((l for l in languages if l), None), rtf
+
+
+def warm_up(model):
+    from transcriber import AudioTranscriber
+
+    AudioTranscriber(model=model, language_id=False).load_model()
+
+
+def tune(model_size, audio, *, factory=whisper_factory, compute_types=None, splits=None, beams=(5, 3, 1),
+         windows=(3.0, 5.0, 8.0), target_rtf=0.5, min_agreement=0.9, streams=1, log=print):
+    # Two stages, so the search stays a few dozen decodes of the fixture:
+    #   1. engine: every compute type x thread split, greedy at the middle window;
+    #   2. decoding: beam sizes x window lengths on the fastest engine of stage 1 that
+    #      reached min_agreement.
+    # Agreement is against the most exact decode (float32 or the last compute type, the
+    # widest beam, the whole fixture at once). Picks the fastest candidate with rtf at or
+    # under target_rtf and agreement at or above min_agreement; if none qualifies, the
+    # most accurate one that is fast enough, else the fastest (meets_target=False).
+    compute_types = list(compute_types or supported_compute_types())
+    splits = list(splits or thread_splits(os.cpu_count() or 1, streams))
+    beams = sorted(set(beams), reverse=True)
+    windows = sorted(set(float(w) for w in windows))
+    models = {}
+    load_seconds = {}
+
+    def model_for(compute_type, split):
+        key = (compute_type, split)
+        if key not in models:
+            start = time.perf_counter()
+            models[key] = factory(model_size, compute_type, *split)
+            warm_up(models[key])
+            load_seconds[key] = round(time.perf_counter() - start, 3)
+        return models[key]
+
+    exact = "float32" if "float32" in compute_types else compute_types[-1]
+    reference, language, rtf = decode(model_for(exact, splits[0]), audio, len(audio) / SAMPLE_RATE + 1, beams[0])
+    log(f"reference: {exact}/beam{beams[0]} rtf={rtf:.3f}, {len(words(reference))} words, language {language}")
+
+    results = []
+
+    def run(candidate):
+        model = model_for(candidate.compute_type, (candidate.cpu_threads, candidate.num_workers))
+        text, _, rtf = decode(model, audio, candidate.transcribe_interval, candidate.beam_size, language, streams)
+        result = dict(asdict(candidate), rtf=round(rtf, 4), agreement=round(agreement(reference, text), 4),
+                      load_seconds=load_seconds[(candidate.compute_type, (candidate.cpu_threads, candidate.num_workers))])
+        results.append(result)
+        log(f"{str(candidate):<36} rtf={result['rtf']:.3f} agreement={result['agreement']:.3f}")
+        return result
+
+    middle = windows[len(windows) // 2]
+    stage1 = [run(Candidate(c, threads, workers, beams[-1], middle)) for c in compute_types for threads, workers in splits]
+    accurate = [r for r in stage1 if r["agreement"] >= min_agreement] or stage1
+    engine = min(accurate, key=lambda r: r["rtf"])
+    for key in [k for k in models if k != (engine["compute_type"], (engine["cpu_threads"], engine["num_workers"]))]:
+        del models[key]
+    for beam in beams:
+        for window in windows:
+            candidate = Candidate(engine["compute_type"], engine["cpu_threads"], engine["num_workers"], beam, window)
+            if not (beam == beams[-1] and window == middle):
+                run(candidate)
+
+    fast = [r for r in results if r["rtf"] <= target_rtf]
+    qualified = [r for r in fast if r["agreement"] >= min_agreement]
+    if qualified:
+        best = min(qualified, key=lambda r: (r["rtf"], -r["agreement"]))
+    elif fast:
+        best = max(fast, key=lambda r: (r["agreement"], -r["rtf"]))
+    else:
+        best = min(results, key=lambda r: r["rtf"])
+    return dict(best, meets_target=bool(qualified), target_rtf=target_rtf, min_agreement=min_agreement,
+                streams=streams, language=language, tuned_at=round(time.time()), candidates=results)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Tune CPU inference settings on this host and save them as its profile, which "
+                    "AudioTranscriber applies whenever the model runs on CPU.")
+    parser.add_argument("fixture", help="speech recording to tune on (the same file across the fleet), WAV or any "
+                                        "format faster-whisper decodes; a minute of typical audio is plenty")
+    parser.add_argument("--model", default="small", help="Whisper model size to tune")
+    parser.add_argument("--target-rtf", type=float, default=0.5,
+                        help="decode seconds per audio second a configuration may take")
+    parser.add_argument("--min-agreement", type=float, default=0.9,
+                        help="word agreement with the most exact decode a configuration must reach")
+    parser.add_argument("--compute-types", nargs="+", choices=CPU_COMPUTE_TYPES, help="default: all this CPU supports")
+    parser.add_argument("--beams", nargs="+", type=int, default=[5, 3, 1])
+    parser.add_argument("--windows", nargs="+", type=float, default=[3.0, 5.0, 8.0], help="transcribe_interval seconds")
+    parser.add_argument("--streams", type=int, default=1, help="sources captioned at once on this host")
+    parser.add_argument("--profile", help=f"profile file (default: this host's file in ${PROFILE_DIR_ENV} or ~/.cache)")
+    parser.add_argument("--dry-run", action="store_true", help="print the choice without saving it")
+    args = parser.parse_args()
+
+    from batch import load_audio
+
+    audio = load_audio(args.fixture)
+    print(f"host {host_key()}: tuning {args.model} on {len(audio) / SAMPLE_RATE:.0f}s of {args.fixture}")
+    settings = tune(args.model, audio, compute_types=args.compute_types, beams=args.beams, windows=args.windows,
+                    target_rtf=args.target_rtf, min_agreement=args.min_agreement, streams=args.streams)
+    settings["fixture"] = os.path.basename(args.fixture)
+    choice = Candidate(*(settings[k] for k in Candidate.__dataclass_fields__))
+    print(f"chosen: {choice} rtf={settings['rtf']:.3f} agreement={settings['agreement']:.3f}")
+    if not settings["meets_target"]:
+        print(f"no configuration reached rtf <= {args.target_rtf} with agreement >= {args.min_agreement}; "
+              "consider a smaller --model", file=sys.stderr)
+    if not args.dry_run:
+        print(f"saved {save_profile(args.model, settings, args.profile)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import queue
+import threading
+from collections import deque
+
+import numpy as np
+
+OVERLOAD_POLICIES = ("drop_oldest", "skip_silence", "summary")
+
+
+def _rms_db(samples):
+    return 10.0 * np.log10(np.mean(samples * samples) + 1e-10) if len(samples) else -100.0
+
+
+class AudioBacklog:
+    # Bounded single-producer/single-consumer audio ring between capture and the decoder.
+    # The capture callback (or add_audio) writes straight into a preallocated mirrored
+    # array and the transcriber reads each chunk back as a zero-copy view, so nothing is
+    # copied or allocated per chunk beyond one (start, end, captured_at) tuple.
+    #
+    # No lock on the data path: the producer only advances _write_pos and appends chunk
+    # bounds, the consumer only advances _read_pos and pops/edits chunk bounds from the
+    # left (deque appends and pops are atomic). Events wake a side only when it is
+    # actually waiting. Positions are monotonic stream samples, so audio shed later leaves
+    # a gap in time instead of shifting the captions that follow it.
+    #
+    # Overflow past max_seconds is resolved by the consumer (oldest audio first); the
+    # ring keeps 2 s of slack beyond that so the chunk the consumer is reading is never
+    # overwritten by a producer that has run ahead.
+    def __init__(self, sample_rate=16000, max_seconds=60.0):
+        self.sample_rate = sample_rate
+        self.max_samples = int(max_seconds * sample_rate)
+        self.capacity = self.max_samples + 2 * sample_rate
+        self._data = np.zeros(2 * self.capacity, dtype=np.float32)
+        self._chunks = deque()
+        # Producer-owned.
+        self._write_pos = 0
+        self.peak = 0
+        # Consumer-owned: read position, samples removed ahead of it (quiet runs), and the
+        # start of the chunk handed out last (still being read).
+        self._read_pos = 0
+        self._removed_ahead = 0
+        self._held = 0
+        self._dropped = 0
+        self.dropped_chunks = 0
+        self.dropped_quiet = 0
+
+        self._ready = threading.Event()
+        self._space = threading.Event()
+        self._consumer_waiting = False
+        self._producer_waiting = False
+        self._closed = False
+
+    def _queued(self):
+        return self._write_pos - self._read_pos - self._removed_ahead
+
+    def __len__(self):
+        return min(self._queued(), self.max_samples)
+
+    @property
+    def seconds(self):
+        return len(self) / self.sample_rate
+
+    @property
+    def received(self):
+        return self._write_pos
+
+    @property
+    def received_seconds(self):
+        return self._write_pos / self.sample_rate
+
+    @property
+    def dropped(self):
+        # Includes overflow the consumer hasn't trimmed yet.
+        return self._dropped + max(self._queued() - self.max_samples, 0)
+
+    @property
+    def dropped_seconds(self):
+        return self.dropped / self.sample_rate
+
+    # --- producer -----------------------------------------------------------------------
+
+    def put(self, samples, block=False, captured_at=None):
+        # block=True waits for room (unpaced sources: back-pressure, nothing is lost);
+        # otherwise the oldest queued audio is dropped to stay within max_samples.
+        # captured_at (perf_counter) travels with the chunk for latency metrics.
+        n = len(samples)
+        if n == 0:
+            return
+        if n > self.max_samples:
+            # Only the newest max_samples can survive anyway.
+            self._dropped += n - self.max_samples
+            samples = samples[-self.max_samples:]
+            n = self.max_samples
+        if block:
+            self._wait_for_space(n)
+
+        cap = self.capacity
+        start = self._write_pos
+        at = start % cap
+        first = min(n, cap - at)
+        data = self._data
+        data[at:at + first] = samples[:first]
+        data[at + cap:at + cap + first] = samples[:first]
+        if n > first:
+            data[:n - first] = samples[first:]
+            data[cap:cap + n - first] = samples[first:]
+        self._write_pos = start + n
+        self._chunks.append((start, start + n, captured_at))
+        self.peak = max(self.peak, len(self))
+        if self._consumer_waiting:
+            self._ready.set()
+
+    def _fits(self, n):
+        return self._queued() + n <= self.max_samples and self._write_pos + n - self._held <= self.capacity
+
+    def _wait_for_space(self, n):
+        while not self._closed and not self._fits(n):
+            self._producer_waiting = True
+            self._space.clear()
+            # Re-check after clearing, so a release in between is not missed.
+            if not self._closed and not self._fits(n):
+                self._space.wait()
+            self._producer_waiting = False
+
+    # --- consumer -----------------------------------------------------------------------
+
+    def get(self, timeout=None):
+        # Returns (stream_pos, samples, captured_at) and raises queue.Empty like
+        # queue.Queue.get. samples is a view into the ring, valid until the next get().
+        self._trim()
+        if not self._chunks:
+            self._consumer_waiting = True
+            self._ready.clear()
+            if not self._chunks and not self._closed:
+                self._ready.wait(timeout)
+            self._consumer_waiting = False
+            self._trim()
+            if not self._chunks:
+                raise queue.Empty
+        start, end, captured_at = self._chunks.popleft()
+        # Anything between the read position and this chunk was removed by drop_quiet.
+        self._removed_ahead -= start - self._read_pos
+        self._read_pos = end
+        self._held = start
+        self._release()
+        return start, self._view(start, end), captured_at
+
+    def get_nowait(self):
+        return self.get(timeout=0)
+
+    def wake(self):
+        # Let a consumer blocked in get() return (queue.Empty if nothing arrived).
+        self._ready.set()
+
+    def close(self):
+        # Release producers blocked in put() and consumers blocked in get(); used when
+        # the consumer stops.
+        self._closed = True
+        self._ready.set()
+        self._space.set()
+
+    def drop_oldest(self, keep_seconds):
+        # Shed queued audio oldest-first until at most keep_seconds remain; returns seconds dropped.
+        before = self._dropped
+        self._drop_front(self._queued() - int(keep_seconds * self.sample_rate))
+        self._release()
+        return (self._dropped - before) / self.sample_rate
+
+    def drop_quiet(self, keep_seconds, threshold_db=-45.0, min_run_seconds=0.25):
+        # Shed pauses first: runs of consecutive chunks quieter than threshold_db lasting at
+        # least min_run_seconds, oldest first, until at most keep_seconds remain. Short gaps
+        # inside words and all louder audio are left alone even if that is not enough.
+        self._trim()
+        keep = int(keep_seconds * self.sample_rate)
+        min_run = int(min_run_seconds * self.sample_rate)
+        before = self._dropped
+        # Snapshot: the producer only appends, so these indices stay valid from the left.
+        chunks = list(self._chunks)
+        runs, start, length = [], None, 0
+        for i, (begin, end, _) in enumerate(chunks):
+            if _rms_db(self._view(begin, end)) < threshold_db:
+                start = i if start is None else start
+                length += end - begin
+                continue
+            if start is not None and length >= min_run:
+                runs.append((start, i))
+            start, length = None, 0
+        if start is not None and length >= min_run:
+            runs.append((start, len(chunks)))
+
+        removed = 0
+        for start, end in runs:
+            at = start - removed
+            for _ in range(end - start):
+                if self._queued() <= keep:
+                    break
+                begin, stop, _ = self._chunks[at]
+                del self._chunks[at]
+                self._removed_ahead += stop - begin
+                self._dropped += stop - begin
+                self.dropped_chunks += 1
+                removed += 1
+        self.dropped_quiet += self._dropped - before
+        self._release()
+        return (self._dropped - before) / self.sample_rate
+
+    def _view(self, start, end):
+        at = start % self.capacity
+        return self._data[at:at + end - start]
+
+    def _trim(self):
+        # Overflow: the producer ran more than max_samples ahead; drop the oldest audio.
+        excess = self._queued() - self.max_samples
+        if excess > 0:
+            self._drop_front(excess)
+
+    def _drop_front(self, n):
+        chunks = self._chunks
+        while n > 0 and chunks:
+            start, end, captured_at = chunks[0]
+            self._removed_ahead -= start - self._read_pos
+            take = min(end - start, n)
+            if take == end - start:
+                chunks.popleft()
+                self.dropped_chunks += 1
+            else:
+                chunks[0] = (start + take, end, captured_at)
+            self._read_pos = start + take
+            self._dropped += take
+            n -= take
+        # Only called between reads: nothing handed out earlier is still in use.
+        self._held = self._read_pos
+
+    def _release(self):
+        if self._producer_waiting:
+            self._space.set()
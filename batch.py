@@ -0,0 +1,310 @@
+import argparse
+import json
+import os
+import sys
+import time
+import wave
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+
+import autotune
+from resample import Resampler
+from sources import _pcm_to_int16
+
+SAMPLE_RATE = 16000
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".opus", ".mp4", ".mkv", ".webm")
+
+
+def load_audio(path):
+    # 16k mono float32. WAV goes through the same polyphase resampler as live capture;
+    # anything else is decoded by faster-whisper (PyAV).
+    if not str(path).lower().endswith(".wav"):
+        from faster_whisper import decode_audio
+
+        return decode_audio(str(path), sampling_rate=SAMPLE_RATE)
+
+    with wave.open(str(path), "rb") as wav:
+        rate, channels, width = wav.getframerate(), wav.getnchannels(), wav.getsampwidth()
+        block = rate
+        resampler = Resampler(rate, SAMPLE_RATE, channels, max_block=block)
+        total = wav.getnframes() * SAMPLE_RATE // rate + SAMPLE_RATE
+        out = np.empty(total, dtype=np.float32)
+        n = 0
+        while True:
+            frames = wav.readframes(block)
+            if not frames:
+                break
+            chunk = resampler.process(_pcm_to_int16(frames, width))
+            if n + len(chunk) > len(out):
+                out = np.concatenate([out, np.empty(len(chunk) + SAMPLE_RATE, dtype=np.float32)])
+            out[n:n + len(chunk)] = chunk
+            n += len(chunk)
+    return out[:n]
+
+
+def split_at_silence(audio, sample_rate=SAMPLE_RATE, target_seconds=120.0, search_seconds=15.0, frame_ms=30):
+    # Cut a long recording into pieces of about target_seconds so one file can be spread
+    # over the pool. Each cut goes at the quietest ~0.3 s within the search_seconds before
+    # the target, so words are not split. Returns [(start, end)] in samples.
+    frame = int(sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame
+    target = int(target_seconds * sample_rate / frame)
+    search = max(1, min(int(search_seconds * sample_rate / frame), target - 1))
+    if n_frames <= target + search:
+        return [(0, len(audio))]
+
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    energy = np.mean(frames * frames, axis=1)
+    smooth = max(1, int(300 / frame_ms))
+    energy = np.convolve(energy, np.ones(smooth) / smooth, mode="same")
+
+    cuts = [0]
+    pos = 0
+    while n_frames - pos > target + search:
+        lo, hi = pos + target - search, pos + target
+        # Last minimum, i.e. the quiet spot nearest the target length.
+        cut = hi - 1 - int(np.argmin(energy[lo:hi][::-1]))
+        cuts.append(cut)
+        pos = cut
+    bounds = [c * frame for c in cuts] + [len(audio)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def format_timestamp(seconds, separator=","):
+    ms = int(round(seconds * 1000))
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    secs, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{ms:03d}"
+
+
+def write_srt(captions, f):
+    for i, caption in enumerate(captions, 1):
+        f.write(f"{i}\n{format_timestamp(caption.start)} --> {format_timestamp(caption.end)}\n{caption.text}\n\n")
+
+
+def write_vtt(captions, f):
+    f.write("WEBVTT\n\n")
+    for caption in captions:
+        f.write(f"{format_timestamp(caption.start, '.')} --> {format_timestamp(caption.end, '.')}\n{caption.text}\n\n")
+
+
+def write_jsonl(captions, f):
+    for caption in captions:
+        f.write(json.dumps(dict(start=round(caption.start, 3), end=round(caption.end, 3),
+                                text=caption.text, language=caption.language)) + "\n")
+
+
+WRITERS = dict(srt=write_srt, vtt=write_vtt, jsonl=write_jsonl)
+
+
+# --- pool worker ------------------------------------------------------------------------
+
+_transcriber = None
+
+
+def _init_worker(model_size, cpu_threads, cpu_profile, options):
+    # One CPU model per process, created once and reused for every piece. Loaded through
+    # AudioTranscriber, so the host profile's compute type (and beam size, unless given)
+    # apply; its cpu_threads/num_workers do not, since they were tuned for one process
+    # with the whole machine and the pool splits the cores across processes instead.
+    global _transcriber
+    from faster_whisper import WhisperModel
+    from transcriber import AudioTranscriber
+
+    def factory(model_size, device, compute_type, **profile_threads):
+        return WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads, num_workers=1)
+
+    _transcriber = AudioTranscriber(model_size, "cpu", "int8", model_factory=factory, cpu_profile=cpu_profile,
+                                    warmup_decode=False, **options)
+    if not _transcriber.load_model():
+        raise RuntimeError(f"Could not load model {model_size}")
+
+
+def _transcribe_piece(audio, offset, language, overrides):
+    t = _transcriber
+    # Pieces from different files share this process: carry the file's lock, not the last one.
+    t.locked_language = language
+    t.last_language_check_ts = time.time()
+    return t.transcribe_segments(audio, offset, **overrides)
+
+
+# --- driver -----------------------------------------------------------------------------
+
+def collect_inputs(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(AUDIO_EXTENSIONS))
+        else:
+            paths.append(item)
+    return paths
+
+
+def output_names(paths, inputs):
+    # Output name per input file: its path relative to the inputs' common folder, without
+    # the extension, so a/standup.wav and b/standup.wav don't overwrite each other's
+    # transcripts. Files that still clash (x.wav and x.mp3) keep their extension.
+    roots = [os.path.abspath(item if os.path.isdir(item) else os.path.dirname(item) or ".") for item in inputs]
+    base = os.path.commonpath(roots) if roots else os.getcwd()
+    names = {path: os.path.splitext(os.path.relpath(os.path.abspath(path), base))[0] for path in paths}
+    counts = {}
+    for name in names.values():
+        counts[os.path.normcase(name)] = counts.get(os.path.normcase(name), 0) + 1
+    for path, name in names.items():
+        if counts[os.path.normcase(name)] > 1:
+            names[path] = name + os.path.splitext(path)[1]
+    return names
+
+
+def default_pool_size(cores=None):
+    # CTranslate2 int8 gains little past ~4 threads per model, so more processes with
+    # fewer threads each gives the best aggregate throughput on many-core hosts.
+    cores = cores or os.cpu_count() or 1
+    threads = min(4, cores)
+    return max(1, cores // threads), threads
+
+
+class FileJob:
+    def __init__(self, index, path, name, audio, pieces, language):
+        self.index = index
+        self.path = path
+        self.name = name
+        self.audio = audio
+        self.pieces = pieces
+        self.language = language
+        self.captions = []
+        self.pending = 0
+        self.started = time.perf_counter()
+
+    @property
+    def seconds(self):
+        return len(self.audio) / SAMPLE_RATE
+
+
+def run_batch(paths, args):
+    workers, threads = default_pool_size()
+    workers = args.workers or workers
+    threads = args.threads or threads
+    # Each piece carries its file's language; no background language ID across files.
+    options = dict(language_redetect_interval=0, language_id=False)
+    if args.beam_size is not None:
+        options["beam_size"] = args.beam_size
+    overrides = dict(task=args.task)
+    cpu_profile = False if args.no_cpu_profile else args.cpu_profile or True
+    profile = autotune.load_profile(args.model, None if cpu_profile is True else cpu_profile) if cpu_profile else None
+    compute_type = f"{profile['compute_type']} (host profile)" if profile else "int8"
+    os.makedirs(args.output_dir, exist_ok=True)
+    print(f"{len(paths)} file(s), {workers} worker process(es) x {threads} thread(s), model {args.model} {compute_type}",
+          file=sys.stderr)
+
+    start = time.perf_counter()
+    done_seconds = 0.0
+    files_done = 0
+    waiting = list(enumerate(paths))
+    names = output_names(paths, args.inputs)
+    running = {}
+
+    def submit(job, piece_index):
+        begin, end = job.pieces[piece_index]
+        future = pool.submit(_transcribe_piece, job.audio[begin:end], begin / SAMPLE_RATE, job.language, overrides)
+        running[future] = (job, piece_index)
+        job.pending += 1
+
+    def open_next():
+        index, path = waiting.pop(0)
+        try:
+            audio = load_audio(path)
+        except Exception as e:
+            print(f"[{index + 1}/{len(paths)}] {path}: cannot read ({e})", file=sys.stderr)
+            return
+        job = FileJob(index, path, names[path], audio, split_at_silence(audio, target_seconds=args.chunk_seconds), args.language)
+        # Without --language the first piece alone decides it; the rest follow once known.
+        for i in range(len(job.pieces) if job.language else 1):
+            submit(job, i)
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(args.model, threads, cpu_profile, options)) as pool:
+        while waiting or running:
+            # Keep every process busy without loading more files than needed.
+            while waiting and len(running) < workers * 2:
+                open_next()
+            if not running:
+                continue
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                job, piece_index = running.pop(future)
+                job.pending -= 1
+                try:
+                    captions, language, probability = future.result()
+                except BrokenProcessPool:
+                    print("Worker processes died (model failed to load?); stopping.", file=sys.stderr)
+                    sys.exit(1)
+                except Exception as e:
+                    print(f"{job.path}: piece {piece_index} failed ({e})", file=sys.stderr)
+                    captions, language, probability = [], None, 0.0
+                job.captions.extend(captions)
+                if piece_index == 0 and job.pending == 0 and len(job.pieces) > 1:
+                    if job.language is None and probability >= args.language_lock_threshold:
+                        job.language = language
+                    for i in range(1, len(job.pieces)):
+                        submit(job, i)
+                if job.pending == 0:
+                    files_done += 1
+                    done_seconds += job.seconds
+                    finish_file(job, args, files_done, len(paths), done_seconds, start)
+                    job.audio = None
+
+    elapsed = time.perf_counter() - start
+    hours = done_seconds / 3600
+    print(f"done: {hours:.2f} h of audio in {elapsed / 3600:.2f} h "
+          f"({done_seconds / max(elapsed, 1e-9):.1f} audio-hours per hour)", file=sys.stderr)
+
+
+def finish_file(job, args, files_done, total, done_seconds, start):
+    job.captions.sort(key=lambda c: c.start)
+    written = []
+    os.makedirs(os.path.dirname(os.path.join(args.output_dir, job.name)), exist_ok=True)
+    for fmt in args.formats:
+        out = os.path.join(args.output_dir, f"{job.name}.{fmt}")
+        with open(out, "w", encoding="utf-8") as f:
+            WRITERS[fmt](job.captions, f)
+        written.append(out)
+    took = time.perf_counter() - job.started
+    overall = done_seconds / max(time.perf_counter() - start, 1e-9)
+    print(f"[{files_done}/{total}] {job.path}: {job.seconds:.0f}s audio, {len(job.pieces)} piece(s), "
+          f"{len(job.captions)} segment(s), language {job.language or '?'}, {job.seconds / max(took, 1e-9):.1f}x "
+          f"(overall {overall:.1f} audio-h/h) -> {', '.join(written)}", file=sys.stderr)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe recorded audio files with a CPU process pool.")
+    parser.add_argument("inputs", nargs="+", help="audio files and/or directories")
+    parser.add_argument("-o", "--output-dir", default="transcripts")
+    parser.add_argument("--formats", nargs="+", choices=sorted(WRITERS), default=["srt", "vtt", "jsonl"])
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--workers", type=int, help="processes (default: cores / threads)")
+    parser.add_argument("--threads", type=int, help="cpu_threads per process (default: up to 4)")
+    parser.add_argument("--chunk-seconds", type=float, default=120.0, help="split long files at silence near this length")
+    parser.add_argument("--language", help="skip detection and use this language code")
+    parser.add_argument("--language-lock-threshold", type=float, default=0.80)
+    parser.add_argument("--task", choices=["translate", "transcribe"], default="translate")
+    parser.add_argument("--beam-size", type=int, help="default: this host's CPU profile's, else 3")
+    parser.add_argument("--cpu-profile", metavar="FILE",
+                        help="use the settings autotune.py saved in FILE (default: this host's profile, if any)")
+    parser.add_argument("--no-cpu-profile", action="store_true", help="ignore any autotune.py profile (int8)")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    paths = collect_inputs(args.inputs)
+    if not paths:
+        print("No audio files found.", file=sys.stderr)
+        sys.exit(1)
+    run_batch(paths, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1098 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import wave
+import numpy as np
+
+import metrics
+from conftest import StubWhisperModel, jingle
+from resample import Resampler, design_filter_bank
+from ringbuffer import RingBuffer
+
+
+def bench_ring(args):
+    # Per-chunk cost of accumulating one transcription window: the old grow-by-concatenate
+    # buffer against the preallocated ring. Ring cost should stay flat as the window grows.
+    sample_rate = 16000
+    chunk = np.random.default_rng(0).standard_normal(args.chunk).astype(np.float32)
+    print(f"{'window_s':>8} {'concat_us/chunk':>16} {'ring_us/chunk':>14}")
+    for window_s in args.windows:
+        n_chunks = max(1, int(window_s * sample_rate / args.chunk))
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            buffer = np.array([], dtype=np.float32)
+            for _ in range(n_chunks):
+                buffer = np.concatenate((buffer, chunk))
+        concat_us = (time.perf_counter() - start) / (args.repeat * n_chunks) * 1e6
+
+        ring = RingBuffer(int((window_s + 1.0) * sample_rate))
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for _ in range(n_chunks):
+                ring.write(chunk)
+            ring.view()
+            ring.clear()
+        ring_us = (time.perf_counter() - start) / (args.repeat * n_chunks) * 1e6
+
+        print(f"{window_s:>8g} {concat_us:>16.2f} {ring_us:>14.2f}")
+
+
+def legacy_convert(in_data, channels, device_rate):
+    # The pre-resampler capture callback, kept verbatim for comparison.
+    audio_data = np.frombuffer(in_data, dtype=np.int16)
+    audio_data = audio_data.astype(np.float32) / 32768.0
+    audio_data = audio_data.reshape(-1, channels)
+    mono_data = np.mean(audio_data, axis=1)
+    if device_rate == 48000:
+        mono_data = mono_data[::3]
+    elif device_rate == 44100:
+        step = device_rate / 16000
+        indices = np.arange(0, len(mono_data), step).astype(int)
+        indices = indices[indices < len(mono_data)]
+        mono_data = mono_data[indices]
+    return mono_data
+
+
+def chirp(rate, seconds, f0, f1, delay=0.0):
+    t = np.arange(int(rate * seconds)) / rate - delay
+    return 0.5 * np.sin(2 * np.pi * (f0 * t + 0.5 * (f1 - f0) / seconds * t * t))
+
+
+def bench_resample(args):
+    # Callback cost (time and transient allocation per block) and fidelity on a sine sweep,
+    # legacy decimation vs the polyphase resampler. Fidelity is SNR against the analytic
+    # sweep sampled at 16 kHz; the second sweep runs past 8 kHz to expose aliasing.
+    import tracemalloc
+
+    print(f"{'rate':>6} {'path':>9} {'us/block':>9} {'alloc_B/block':>14} {'snr_db':>7} {'alias_db':>9}")
+    for rate in args.rates:
+        pcm = np.round(chirp(rate, args.seconds, 50.0, 5000.0) * 32767).astype(np.int16)
+        pcm = np.repeat(pcm[:, None], args.channels, axis=1).reshape(-1)
+        # Above-Nyquist sweep (9-11 kHz at the device rate) should vanish after resampling.
+        hf = np.round(chirp(rate, args.seconds, 9000.0, 11000.0) * 32767).astype(np.int16)
+        hf = np.repeat(hf[:, None], args.channels, axis=1).reshape(-1)
+        step = args.block * args.channels
+        blocks = [pcm[i:i + step].tobytes() for i in range(0, len(pcm) - step + 1, step)]
+        hf_blocks = [hf[i:i + step].tobytes() for i in range(0, len(hf) - step + 1, step)]
+
+        up, down, bank = design_filter_bank(rate, 16000)
+        delay = (bank.size - 1) / 2.0 / (up * rate)
+        paths = [
+            ("legacy", lambda data: legacy_convert(data, args.channels, rate), 0.0),
+            ("polyphase", Resampler(rate, 16000, args.channels, args.block).process, delay),
+        ]
+        for name, convert, path_delay in paths:
+            out = np.concatenate([np.array(convert(b)) for b in blocks])
+
+            start = time.perf_counter()
+            for b in blocks:
+                convert(b)
+            us = (time.perf_counter() - start) / len(blocks) * 1e6
+
+            tracemalloc.start()
+            worst = 0
+            for b in blocks[:50]:
+                tracemalloc.reset_peak()
+                current = tracemalloc.get_traced_memory()[0]
+                convert(b)
+                worst = max(worst, tracemalloc.get_traced_memory()[1] - current)
+            tracemalloc.stop()
+
+            ref = chirp(16000, args.seconds, 50.0, 5000.0, delay=path_delay)[:len(out)]
+            n = min(len(out), len(ref))
+            trim = slice(800, n - 800)
+            snr = 10 * np.log10(np.sum(ref[trim] ** 2) / np.sum((out[trim] - ref[trim]) ** 2))
+
+            alias = np.concatenate([np.array(convert(b)) for b in hf_blocks])
+            alias_db = 20 * np.log10(np.sqrt(np.mean(alias[800:-800] ** 2)) / (0.5 / np.sqrt(2)) + 1e-12)
+            print(f"{rate:>6} {name:>9} {us:>9.1f} {worst:>14} {snr:>7.1f} {alias_db:>9.1f}")
+
+
+def write_wav(path, audio, rate=16000, channels=1):
+    pcm = np.round(np.clip(audio, -1, 1) * 32767).astype(np.int16)
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.repeat(pcm, channels).tobytes())
+
+
+def render_synthetic(kind, seconds, seed=0):
+    from sources import SyntheticSource
+
+    source = SyntheticSource(kind, seconds=seconds, rate=16000, channels=1, realtime=False,
+                             seed=seed, buffer_seconds=seconds + 1)
+    source.start()
+    source.finished.wait()
+    source.stop()
+    return source.ring.read()
+
+
+def run_pipeline(path, model, **options):
+    # Replay a WAV through the real FileSource -> Worker -> AudioTranscriber path, unpaced.
+    from PyQt6.QtCore import Qt
+    from main import Worker
+    from sources import FileSource
+
+    captions = []
+    worker = Worker(FileSource(path, realtime=False), model=model, **options)
+    worker.text_updated.connect(captions.append, Qt.ConnectionType.DirectConnection)
+    worker.start()
+    worker.finish()
+    worker.stop()
+    return worker, captions
+
+
+def bench_vad(args):
+    # Meeting-like fixture: speech, a long quiet stretch, speech, then background noise.
+    # The same stub decode cost runs with and without the pre-model gate.
+    parts = [
+        render_synthetic("speech", args.speech),
+        np.zeros(int(args.silence * 16000), dtype=np.float32),
+        render_synthetic("speech", args.speech / 2, seed=1),
+        render_synthetic("noise", args.silence / 2, seed=2) * 0.05,
+    ]
+    audio = np.concatenate(parts)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "meeting.wav")
+        write_wav(path, audio)
+        print(f"fixture: {len(audio) / 16000:.0f}s ({2 * args.speech * 0.75:.0f}s speech-like)")
+        for gated in (False, True):
+            model = StubWhisperModel(rtf=args.rtf, overhead=args.overhead)
+            worker, captions = run_pipeline(path, model, vad_gate=gated, warmup_seconds=0)
+            t = worker.transcriber
+            print(f"gate={'on ' if gated else 'off'} decode_calls={t.decode_calls:>3} "
+                  f"model_seconds={t.decode_seconds:6.2f} decoded_audio={t.decoded_audio_seconds:6.1f}s captions={len(captions)}")
+            if gated:
+                print(f"gate report: {t.gate_report()}")
+
+
+def bench_backlog(args):
+    # Live (paced) speech-like source into a stub model slower than real time: compare how
+    # far captions trail live audio and how much is queued under each overload policy.
+    from PyQt6.QtCore import Qt
+    from main import Worker
+    from sources import SyntheticSource
+
+    runs = [("unbounded", dict(max_lag_seconds=None, max_queue_seconds=3600, batch_windows=1))]
+    runs += [(policy, dict(overload_policy=policy)) for policy in ("drop_oldest", "skip_silence", "summary")]
+    print(f"source: {args.seconds:.0f}s paced, stub rtf={args.rtf} overhead={args.overhead}s, max_lag={args.max_lag}s")
+    for name, options in runs:
+        model = StubWhisperModel(rtf=args.rtf, overhead=args.overhead)
+        options = dict(dict(max_lag_seconds=args.max_lag, warmup_seconds=0), **options)
+        source = SyntheticSource("speech", seconds=args.seconds, realtime=True)
+        worker = Worker(source, model=model, batched_model=model, **options)
+        captions = []
+        worker.text_updated.connect(captions.append, Qt.ConnectionType.DirectConnection)
+        worker.start()
+        source.finished.wait()
+        live_end = time.perf_counter()
+        worker.finish()
+        drain = time.perf_counter() - live_end
+        worker.stop()
+        r = worker.transcriber.backlog_report()
+        print(f"{name:<12} max_caption_lag={r['max_caption_lag_seconds']:5.1f}s peak_queue={r['peak_queue_seconds']:5.1f}s "
+              f"dropped={r['dropped_seconds']:5.1f}s (quiet {r['dropped_quiet_seconds']:4.1f}s) drain_after_end={drain:5.1f}s decode_calls={r['decode_calls']:>3} "
+              f"batch_calls={r['batch_calls']:>2} captions={len(captions)}")
+
+
+def bench_quality(args):
+    # Paced source into stub models whose cost follows the ladder (large-v3 slower than real
+    # time): fixed quality vs the adaptive controller. Ladder models "load" in args.load s.
+    from PyQt6.QtCore import Qt
+    from main import Worker
+    from sources import SyntheticSource
+
+    costs = dict(zip(["large-v3", "medium", "small", "base", "tiny"], args.rtfs))
+
+    def factory(model_size, device=None, compute_type=None):
+        time.sleep(args.load)
+        scale = 0.6 if compute_type == "int8" else 1.0
+        return StubWhisperModel(rtf=costs.get(model_size, 0.1) * scale, overhead=args.overhead)
+
+    print(f"source: {args.seconds:.0f}s paced, stub rtf per model {costs}, load {args.load}s, max_lag={args.max_lag}s")
+    for adaptive in (False, True):
+        source = SyntheticSource("speech", seconds=args.seconds, realtime=True)
+        options = dict(quality_options=dict(hold_seconds=args.hold)) if adaptive else {}
+        worker = Worker(source, "large-v3", "cuda", "float16", model_factory=factory, adaptive_quality=adaptive,
+                        warmup_seconds=0, max_lag_seconds=args.max_lag, warmup_decode=False, **options)
+        captions = []
+        worker.text_updated.connect(captions.append, Qt.ConnectionType.DirectConnection)
+        worker.start()
+        worker.finish()
+        worker.stop()
+        t = worker.transcriber
+        r = t.backlog_report()
+        print(f"adaptive={'on ' if adaptive else 'off'} max_caption_lag={r['max_caption_lag_seconds']:5.1f}s "
+              f"dropped={r['dropped_seconds']:5.1f}s overloads={r['overloads']:>2} captions={len(captions)}")
+        if adaptive:
+            report = t.quality_report()
+            for old, new, reason in report["changes"]:
+                print(f"  {old} -> {new} ({reason})")
+            print(f"  final {report['level']}, hold {report['hold_seconds']:.0f}s")
+
+
+class TimedSink:
+    # Forwards source blocks to the real sink and records when each put() started, so the
+    # gaps show how late the capture thread got the GIL back.
+    def __init__(self, sink):
+        self.sink = sink
+        self.stamps = []
+
+    def put(self, samples, block=False, captured_at=None):
+        self.stamps.append(time.perf_counter())
+        self.sink.put(samples, block=block, captured_at=captured_at)
+
+
+def frame_loop(stop, frames, interval=1 / 60, work=0.002):
+    # Stand-in for the Qt paint loop: every frame does `work` seconds of Python (layout,
+    # text shaping under the GIL) and records how long after its due time it finished.
+    due = time.perf_counter()
+    while not stop.is_set():
+        due += interval
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        spin_until = time.perf_counter() + work
+        while time.perf_counter() < spin_until:
+            pass
+        frames.append(time.perf_counter() - due + interval)
+
+
+def bench_engine(args):
+    # Paced source, stub model whose cost is partly GIL-bound Python, and a 60 Hz frame
+    # loop standing in for the UI: capture callback jitter and frame time with the engine
+    # on a thread of this process vs in a worker process (engine.RemoteTranscriber).
+    from engine import RemoteTranscriber
+    from sources import SyntheticSource
+    from transcriber import AudioTranscriber
+
+    print(f"source: {args.seconds:.0f}s paced, stub rtf={args.rtf} overhead={args.overhead}s busy={args.busy:.0%}")
+    print(f"{'engine':<8} {'jitter_p50_ms':>13} {'jitter_p99_ms':>13} {'jitter_max_ms':>13} "
+          f"{'frame_p50_ms':>12} {'frame_p99_ms':>12} {'frame_max_ms':>12} {'late_frames':>11} {'captions':>8}")
+    results = {}
+    for engine in ("thread", "process"):
+        model = StubWhisperModel(rtf=args.rtf, overhead=args.overhead, busy=args.busy)
+        options = dict(model=model, warmup_seconds=0, warmup_decode=False, language_id=False, streaming=args.streaming)
+        if engine == "process":
+            transcriber = RemoteTranscriber(**options)
+        else:
+            transcriber = AudioTranscriber(**options)
+        source = SyntheticSource("speech", seconds=args.seconds, realtime=True)
+        sink = TimedSink(transcriber.audio_queue)
+        source.connect(sink)
+        captions = []
+        transcriber.start(captions.append)
+        if engine == "process":
+            # Don't time the interpreter spawn; the in-process model is ready immediately.
+            deadline = time.monotonic() + 60
+            while transcriber.state != "ready" and time.monotonic() < deadline:
+                time.sleep(0.05)
+        stop, frames = threading.Event(), []
+        ui = threading.Thread(target=frame_loop, args=(stop, frames), daemon=True)
+        ui.start()
+        source.start()
+        source.finished.wait()
+        stop.set()
+        ui.join()
+        transcriber.finish(timeout=60)
+        transcriber.stop()
+        source.stop()
+        if engine == "process":
+            transcriber.close()
+
+        period = source.block_size / source.rate
+        jitter = [abs(b - a - period) * 1000 for a, b in zip(sink.stamps, sink.stamps[1:])]
+        frame_ms = [f * 1000 for f in frames]
+        late = sum(f > 1000 / 60 * 1.5 for f in frame_ms)
+        results[engine] = dict(
+            jitter_p50_ms=percentile(jitter, 50), jitter_p99_ms=percentile(jitter, 99), jitter_max_ms=max(jitter),
+            frame_p50_ms=percentile(frame_ms, 50), frame_p99_ms=percentile(frame_ms, 99), frame_max_ms=max(frame_ms),
+            late_frames=late, frames=len(frame_ms), captions=len(captions),
+        )
+        r = results[engine]
+        print(f"{engine:<8} {r['jitter_p50_ms']:>13.2f} {r['jitter_p99_ms']:>13.2f} {r['jitter_max_ms']:>13.2f} "
+              f"{r['frame_p50_ms']:>12.2f} {r['frame_p99_ms']:>12.2f} {r['frame_max_ms']:>12.2f} "
+              f"{late:>5}/{len(frame_ms):<5} {len(captions):>8}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+def bench_sources(args):
+    # N paced sources on one shared stub model through the InferenceScheduler: caption lag,
+    # scheduler wait and batching per source count, and how much memory each source adds.
+    from scheduler import InferenceScheduler
+    from sources import SyntheticSource
+    from transcriber import AudioTranscriber
+
+    print(f"source: {args.seconds:.0f}s paced speech per stream, stub rtf={args.rtf} overhead={args.overhead}s")
+    print(f"{'streams':>7} {'max_lag_s':>9} {'wait_p50_s':>10} {'wait_max_s':>10} {'calls':>6} {'batched':>7} "
+          f"{'late':>5} {'rss_mb':>7} {'mb/stream':>9}")
+    for count in args.streams:
+        gc.collect()
+        rss_before = rss_bytes()
+        model = StubWhisperModel(rtf=args.rtf, overhead=args.overhead)
+        scheduler = InferenceScheduler(model=model, batched_model=model, warmup_decode=False, max_batch=args.max_batch)
+        wait = metrics.REGISTRY.histogram("scheduler_wait_seconds")
+        waits_before = list(wait.counts)
+        pairs = []
+        for i in range(count):
+            name = f"s{i}"
+            transcriber = AudioTranscriber(model=scheduler.client(name), source_name=name, warmup_seconds=0,
+                                           warmup_decode=False, language_id=False, batch_windows=1)
+            source = SyntheticSource("speech", seconds=args.seconds, realtime=True, seed=i)
+            source.connect(transcriber.audio_queue)
+            pairs.append((source, transcriber))
+        scheduler.start()
+        for source, transcriber in pairs:
+            transcriber.start(None)
+            source.start()
+        with RunSampler({}) as sampler:
+            for source, transcriber in pairs:
+                source.finished.wait()
+            for source, transcriber in pairs:
+                transcriber.finish(timeout=60)
+        for _, transcriber in pairs:
+            transcriber.running = False
+        scheduler.stop()
+        for source, transcriber in pairs:
+            transcriber.stop()
+            source.stop()
+        lag = max(t.backlog_report()["max_caption_lag_seconds"] for _, t in pairs)
+        report = scheduler.report()
+        late = sum(s["late"] for s in report["sources"].values())
+        max_wait = max(s["max_wait_seconds"] for s in report["sources"].values())
+        # p50 of this run's waits only: subtract the buckets earlier runs filled.
+        run_wait = metrics.Histogram("run", buckets=wait.bounds)
+        run_wait.counts = [a - b for a, b in zip(wait.counts, waits_before)]
+        run_wait.count = sum(run_wait.counts)
+        run_wait.max = max_wait
+        rss = (sampler.peak_rss - rss_before) / 2 ** 20
+        print(f"{count:>7} {lag:>9.2f} {run_wait.quantile(0.5):>10.3f} {max_wait:>10.3f} {model.calls:>6} "
+              f"{report['batch_calls']:>7} {late:>5} {rss:>7.1f} {rss / count:>9.2f}")
+
+
+def bench_segments(args):
+    # Paced speech into a lazily decoding stub (a segment every --segment seconds): how long
+    # after capture the first and the average caption text reaches the UI, one caption per
+    # window vs a caption per segment as the decoder yields it.
+    from sources import SyntheticSource
+    from transcriber import AudioTranscriber
+
+    print(f"source: {args.seconds:.0f}s paced speech, {args.window:.0f}s windows, stub rtf={args.rtf} "
+          f"overhead={args.overhead}s, a segment per {args.segment}s")
+    print(f"{'mode':<9} {'captions':>8} {'first_p50_s':>11} {'first_p90_s':>11} {'all_p50_s':>9} {'all_p90_s':>9}")
+    for segment_captions in (False, True):
+        model = StubWhisperModel(rtf=args.rtf, overhead=args.overhead, segment_seconds=args.segment)
+        transcriber = AudioTranscriber(model=model, warmup_seconds=0, warmup_decode=False, language_id=False,
+                                       transcribe_interval=args.window, batch_windows=1,
+                                       segment_captions=segment_captions)
+        source = SyntheticSource("speech", seconds=args.seconds, realtime=True)
+        source.connect(transcriber.audio_queue)
+        latencies, firsts = [], []
+        last_captured = [None]
+
+        def on_caption(caption):
+            latency = time.perf_counter() - caption.captured_at
+            latencies.append(latency)
+            # The first caption of each window: what a reader waits for after speaking.
+            if caption.captured_at != last_captured[0]:
+                last_captured[0] = caption.captured_at
+                firsts.append(latency)
+
+        transcriber.start(None, on_caption)
+        source.start()
+        source.finished.wait()
+        transcriber.finish(timeout=60)
+        transcriber.stop()
+        source.stop()
+        mode = "segment" if segment_captions else "window"
+        print(f"{mode:<9} {len(latencies):>8} {percentile(firsts, 50):>11.2f} {percentile(firsts, 90):>11.2f} "
+              f"{percentile(latencies, 50):>9.2f} {percentile(latencies, 90):>9.2f}")
+
+
+def bench_draft(args):
+    # Paced speech, a slow main model (large-v3 stand-in) alone vs with a fast draft model:
+    # how soon after capture each window's first text is visible (draft partial or final)
+    # and when its final caption lands, and how many main-model passes the confident
+    # drafts skip.
+    from sources import SyntheticSource
+    from transcriber import AudioTranscriber
+
+    print(f"source: {args.seconds:.0f}s paced speech, {args.window:.0f}s windows, main rtf={args.rtf} "
+          f"overhead={args.overhead}s, draft rtf={args.draft_rtf} every {args.draft_interval}s")
+    print(f"{'mode':<6} {'shown_p50_s':>11} {'shown_p90_s':>11} {'final_p50_s':>11} {'final_p90_s':>11} "
+          f"{'main_calls':>10} {'skipped':>7} {'draft_s':>7}")
+    for use_draft in (False, True):
+        main = StubWhisperModel(rtf=args.rtf, overhead=args.overhead)
+        draft = StubWhisperModel(rtf=args.draft_rtf, overhead=args.draft_overhead, avg_logprob=args.draft_logprob)
+        options = dict(draft_model=draft, draft_interval=args.draft_interval,
+                       draft_skip_logprob=args.skip_logprob) if use_draft else {}
+        transcriber = AudioTranscriber(model=main, warmup_seconds=0, warmup_decode=False, language_id=False,
+                                       transcribe_interval=args.window, batch_windows=1, **options)
+        source = SyntheticSource("speech", seconds=args.seconds, realtime=True)
+        source.connect(transcriber.audio_queue)
+        shown, finals = [], []
+        showing = [False]
+
+        def on_caption(caption):
+            # Capture of the newest decoded audio to the caption being sent.
+            if not caption.text:
+                return
+            latency = time.perf_counter() - caption.captured_at
+            if not showing[0]:
+                shown.append(latency)
+            showing[0] = not caption.final
+            if caption.final:
+                finals.append(latency)
+
+        transcriber.start(None, on_caption)
+        source.start()
+        source.finished.wait()
+        transcriber.finish(timeout=120)
+        transcriber.stop()
+        source.stop()
+        report = transcriber.draft_report() or {}
+        mode = "draft" if use_draft else "main"
+        print(f"{mode:<6} {percentile(shown, 50):>11.2f} {percentile(shown, 90):>11.2f} {percentile(finals, 50):>11.2f} "
+              f"{percentile(finals, 90):>11.2f} {main.calls:>10} {report.get('skipped_windows', 0):>7} "
+              f"{report.get('draft_seconds', 0.0):>7.2f}")
+
+
+def bench_cache(args):
+    # A broadcast-like programme of decode windows: unique content with the same ident
+    # every --every windows, each take cut up to --jitter seconds off and with its own
+    # noise. Model calls and seconds with and without the fingerprint result cache.
+    from transcriber import AudioTranscriber
+
+    rng = np.random.default_rng(0)
+    window = int(args.window * 16000)
+    ident = jingle(0, args.window + args.jitter)
+    parts, repeats = [], 0
+    for i in range(args.windows):
+        if i % args.every == 0:
+            start = int(rng.uniform(0, args.jitter) * 16000)
+            part = ident[start:start + window].copy()
+            repeats += i > 0
+        else:
+            part = jingle(1000 + i, args.window)
+        parts.append(part + args.noise * rng.standard_normal(window).astype(np.float32))
+    print(f"programme: {args.windows} x {args.window:.0f}s windows, ident every {args.every} "
+          f"({repeats} repeats), jitter {args.jitter}s, noise {args.noise}")
+    for cached in (False, True):
+        model = StubWhisperModel(rtf=args.rtf, overhead=args.overhead)
+        transcriber = AudioTranscriber(model=model, result_cache=cached, warmup_seconds=0, warmup_decode=False,
+                                       language_id=False, transcribe_interval=args.window, batch_windows=1)
+        captions = []
+        transcriber.start(None, captions.append)
+        for i, part in enumerate(parts):
+            # One window at a time, so every take is cut where the programme put it.
+            transcriber.add_audio(part)
+            deadline = time.time() + 60
+            while len(captions) <= i and time.time() < deadline:
+                time.sleep(0.001)
+        transcriber.finish(timeout=60)
+        transcriber.stop()
+        print(f"cache={'on ' if cached else 'off'} model_calls={model.calls:>3} "
+              f"model_seconds={transcriber.decode_seconds:6.2f} captions={len(captions):>3}")
+        if cached:
+            print(f"cache report: {transcriber.cache_report()}")
+
+
+def bench_broadcast(args):
+    # A caption stream at --rate into a CaptionBroadcaster, with the broadcast.py load test
+    # in a separate process as --clients readers plus --stalled clients that never read.
+    # Reports what publish() costs the transcriber thread, delivery latency, lost events
+    # and which clients were dropped.
+    import subprocess
+
+    from broadcast import CaptionBroadcaster
+    from transcriber import Caption
+
+    broadcaster = CaptionBroadcaster(port=0, max_queue=args.max_queue).start()
+    stop = threading.Event()
+    costs = []
+    text = " ".join(["caption"] * args.words)
+
+    def publish():
+        i = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            broadcaster.publish(Caption(text, i % 5 == 4, i / args.rate, (i + 1) / args.rate, "en"))
+            costs.append(time.perf_counter() - start)
+            i += 1
+            time.sleep(1 / args.rate)
+
+    publisher = threading.Thread(target=publish)
+    publisher.start()
+    try:
+        result = subprocess.run(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "broadcast.py"),
+             "--port", str(broadcaster.port), "--clients", str(args.clients), "--stalled", str(args.stalled),
+             "--seconds", str(args.seconds), "--json"],
+            capture_output=True, text=True, timeout=args.seconds + 60)
+    finally:
+        stop.set()
+        publisher.join()
+        broadcaster.stop()
+    if result.returncode:
+        print(result.stderr, file=sys.stderr)
+        return
+    report = json.loads(result.stdout)
+    print(f"{args.clients} clients + {args.stalled} stalled, {args.rate:.0f} captions/s of {args.words} words, "
+          f"max_queue={args.max_queue}")
+    print(f"publish() p50={percentile(costs, 50) * 1e6:.0f}us p99={percentile(costs, 99) * 1e6:.0f}us "
+          f"max={max(costs) * 1e6:.0f}us")
+    print(f"delivery p50={report['latency_p50_ms']}ms p99={report['latency_p99_ms']}ms max={report['latency_max_ms']}ms; "
+          f"events per client {report['events_min']}-{report['events_max']}, lost {report['lost']}, "
+          f"failed {report['failed']}")
+    print(f"stalled clients dropped: {report['stalled_dropped']}/{args.stalled}; server: {broadcaster.report()}")
+
+
+def bench_store(args):
+    # A long session's captions into a TranscriptStore: cost of add() on the caller (the
+    # transcriber thread), resident memory as the log grows, search latency over the whole
+    # session and mapped export speed.
+    import tempfile
+
+    from store import TranscriptStore
+    from transcriber import Caption
+
+    rng = np.random.default_rng(0)
+    vocabulary = np.array([f"w{i}" for i in range(args.vocabulary)])
+    # Zipf-like word frequencies, as in speech.
+    weights = 1.0 / np.arange(1, args.vocabulary + 1)
+    weights /= weights.sum()
+    print(f"{args.captions} captions of ~{args.words} words, vocabulary {args.vocabulary}, "
+          f"fsync every {args.fsync_interval}s, segment every {args.segment_records} records")
+    print(f"{'captions':>9} {'hours':>6} {'log_mb':>7} {'rss_mb':>7} {'add_p50_us':>10} {'add_p99_us':>10} "
+          f"{'search_p50_ms':>13} {'search_p99_ms':>13}")
+    with tempfile.TemporaryDirectory() as path:
+        store = TranscriptStore(path, fsync_interval=args.fsync_interval, segment_records=args.segment_records)
+        gc.collect()
+        rss_start = rss_bytes(anonymous=True)
+        step = max(1, args.captions // 5)
+        written = 0
+        while written < args.captions:
+            add_us = []
+            for i in range(written, min(written + step, args.captions)):
+                text = " ".join(rng.choice(vocabulary, size=args.words, p=weights))
+                caption = Caption(text, True, i * 3.0, i * 3.0 + 2.8, "en", avg_logprob=-0.3)
+                start = time.perf_counter()
+                store.add(caption)
+                add_us.append((time.perf_counter() - start) * 1e6)
+                if store._queue.qsize() > 1000:
+                    # Faster than any live session; let the writer keep up instead of dropping.
+                    while store._queue.qsize() > 100:
+                        time.sleep(0.001)
+            written = min(written + step, args.captions)
+            while store._queue.qsize():
+                time.sleep(0.01)
+            time.sleep(0.05)
+            search_ms = []
+            for _ in range(200):
+                query = " ".join(rng.choice(vocabulary[:args.vocabulary // 10], size=2))
+                start = time.perf_counter()
+                store.search(query)
+                search_ms.append((time.perf_counter() - start) * 1e3)
+            gc.collect()
+            log_mb = os.path.getsize(os.path.join(path, "captions.log")) / 2 ** 20
+            rss = (rss_bytes(anonymous=True) - rss_start) / 2 ** 20
+            print(f"{written:>9} {written * 3 / 3600:>6.1f} {log_mb:>7.1f} {rss:>7.1f} {percentile(add_us, 50):>10.1f} "
+                  f"{percentile(add_us, 99):>10.1f} {percentile(search_ms, 50):>13.3f} {percentile(search_ms, 99):>13.3f}")
+        start = time.perf_counter()
+        with open(os.devnull, "w") as out:
+            store.export_jsonl(out)
+        export = time.perf_counter() - start
+        report = store.report()
+        store.close()
+        print(f"export jsonl: {written / export:,.0f} records/s; {report}")
+
+
+def bench_ui(args):
+    # CaptionWindow on the Qt offscreen platform under synthetic high-rate captions (mostly
+    # streaming partials, a final every --final-every updates): repaint per update vs
+    # frames coalesced to --fps. Each drawn frame is painted synchronously so its cost is
+    # measured on the GUI thread.
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtCore import Qt, QTimer
+    from PyQt6.QtWidgets import QApplication
+    from transcriber import Caption
+    from ui import CaptionWindow
+
+    app = QApplication.instance() or QApplication([])
+    words = "the quick brown fox jumps over the lazy dog while captions keep streaming in".split()
+    print(f"input: {args.rate} updates/s for {args.seconds:.0f}s, a final every {args.final_every}")
+    print(f"{'mode':<11} {'frames/s':>8} {'paint_p50_ms':>12} {'paint_p99_ms':>12} {'paint_ms/s':>10} {'dropped/s':>9}")
+    for mode, fps in (("per-update", None), ("coalesced", args.fps)):
+        window = CaptionWindow(max_fps=fps)
+        window.show()
+        paints = []
+
+        def frame():
+            start = time.perf_counter()
+            if window.draw_frame():
+                window.caption_area.repaint()
+                paints.append(time.perf_counter() - start)
+
+        if fps:
+            window.frame_timer.timeout.disconnect()
+            window.frame_timer.timeout.connect(frame)
+        else:
+            window._changed = frame
+
+        count = 0
+
+        def feed():
+            nonlocal count
+            count += 1
+            final = count % args.final_every == 0
+            text = " ".join(words[:count % len(words) + 1])
+            window.update_caption(Caption(text, final, captured_at=time.perf_counter()))
+
+        feeder = QTimer()
+        feeder.setTimerType(Qt.TimerType.PreciseTimer)
+        feeder.timeout.connect(feed)
+        feeder.start(max(1, int(1000 / args.rate)))
+        QTimer.singleShot(int(args.seconds * 1000), app.quit)
+        app.exec()
+        feeder.stop()
+        window.close()
+
+        ms = [p * 1000 for p in paints]
+        print(f"{mode:<11} {len(paints) / args.seconds:>8.1f} {percentile(ms, 50):>12.2f} {percentile(ms, 99):>12.2f} "
+              f"{sum(ms) / args.seconds:>10.1f} {window.scrollback.dropped / args.seconds:>9.1f}")
+
+
+def make_fixtures(directory):
+    # Default fixture set, written at 48 kHz stereo so the capture-side resampler does the
+    # same work as on a typical loopback device.
+    from resample import Resampler
+
+    def to_48k(audio):
+        out = Resampler(16000, 48000, 1, max_block=len(audio)).process(np.round(audio * 32767).astype(np.int16))
+        return out.copy()
+
+    meeting = np.concatenate([
+        render_synthetic("speech", 12.0),
+        np.zeros(8 * 16000, dtype=np.float32),
+        render_synthetic("speech", 8.0, seed=1),
+        render_synthetic("noise", 4.0, seed=2) * 0.05,
+    ])
+    fixtures = dict(speech=render_synthetic("speech", 30.0), meeting=meeting)
+    paths = []
+    for name, audio in fixtures.items():
+        path = os.path.join(directory, f"{name}.wav")
+        write_wav(path, to_48k(audio), rate=48000, channels=2)
+        paths.append(path)
+    return paths
+
+
+def rss_bytes(anonymous=False):
+    # anonymous=True leaves out file-backed pages (mapped logs and indexes the OS can drop).
+    try:
+        with open("/proc/self/statm") as f:
+            fields = f.read().split()
+        pages = int(fields[1]) - (int(fields[2]) if anonymous else 0)
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        # ru_maxrss: kilobytes on Linux, bytes on macOS; only a peak, but better than nothing.
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def thread_cpu_seconds(native_id):
+    # utime + stime of one OS thread (Linux /proc); None where unavailable.
+    try:
+        with open(f"/proc/self/task/{native_id}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class RunSampler:
+    # Background sampler for peak RSS and per-thread CPU. Threads are sampled while alive,
+    # so stages that exit before the run ends (the source thread) keep their last reading.
+    def __init__(self, threads, interval=0.02):
+        self.threads = threads
+        self.interval = interval
+        self.peak_rss = rss_bytes()
+        self.cpu = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _sample(self):
+        self.peak_rss = max(self.peak_rss, rss_bytes())
+        for stage, get_thread in self.threads.items():
+            thread = get_thread()
+            if thread is not None and thread.native_id is not None:
+                seconds = thread_cpu_seconds(thread.native_id)
+                if seconds is not None:
+                    self.cpu[stage] = seconds
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def load_model(config, args):
+    if config == "stub":
+        return StubWhisperModel(rtf=args.stub_rtf, overhead=args.stub_overhead)
+    from faster_whisper import WhisperModel
+
+    return WhisperModel(config, device="cpu", compute_type="int8")
+
+
+def run_fixture(path, config, model, args):
+    # One fixture through FileSource -> Worker -> AudioTranscriber. FileSource shares the
+    # AudioSource capture path (resampler, direct write into the backlog) with AudioCapture.
+    from PyQt6.QtCore import Qt
+    from main import Worker
+    from sources import FileSource
+
+    source = FileSource(path, realtime=args.realtime)
+    worker = Worker(source, model=model, streaming=args.streaming, vad_gate=args.vad_gate)
+
+    latencies = []
+    captions = []
+
+    def on_caption(caption):
+        if caption.final:
+            captions.append(caption.text)
+            if caption.captured_at is not None:
+                latencies.append(time.perf_counter() - caption.captured_at)
+
+    worker.caption_updated.connect(on_caption, Qt.ConnectionType.DirectConnection)
+    threads = dict(
+        capture=lambda: source.thread,
+        transcribe=lambda: worker.transcriber.thread,
+    )
+    gc.collect()
+    gc_before = gc.get_stats()[0]["collections"]
+    cpu_before = time.process_time()
+    start = time.perf_counter()
+    with RunSampler(threads) as sampler:
+        worker.start()
+        worker.finish()
+        wall = time.perf_counter() - start
+    worker.stop()
+    cpu_total = time.process_time() - cpu_before
+
+    t = worker.transcriber
+    audio_seconds = t.audio_queue.received_seconds
+    cpu = {stage: round(seconds, 3) for stage, seconds in sampler.cpu.items()}
+    # Model worker threads (CTranslate2) and everything else not owned by a pipeline stage.
+    cpu["other"] = round(max(cpu_total - sum(sampler.cpu.values()), 0.0), 3)
+    # Allocation rate proxy: generation-0 collections fire every gc threshold[0] net
+    # container allocations, so this counts Python objects, not numpy buffers.
+    gen0 = gc.get_stats()[0]["collections"] - gc_before
+    return dict(
+        config=config,
+        fixture=os.path.basename(path),
+        realtime=args.realtime,
+        audio_seconds=round(audio_seconds, 2),
+        wall_seconds=round(wall, 3),
+        rtf=round(wall / audio_seconds, 4) if audio_seconds else None,
+        model_rtf=round(t.decode_seconds / audio_seconds, 4) if audio_seconds else None,
+        decode_calls=t.decode_calls,
+        captions=len(captions),
+        latency_p50=percentile(latencies, 50),
+        latency_p90=percentile(latencies, 90),
+        latency_p99=percentile(latencies, 99),
+        peak_rss_mb=round(sampler.peak_rss / 2**20, 1),
+        allocs_per_s=round(gen0 * gc.get_threshold()[0] / wall, 1),
+        cpu_seconds=cpu,
+    )
+
+
+# Lower is better for all of these; latency is only compared when both sides have it.
+COMPARED = ("rtf", "model_rtf", "latency_p50", "latency_p90", "peak_rss_mb", "allocs_per_s")
+
+
+def compare(results, baseline, tolerance):
+    base = {(r["config"], r["fixture"], r["realtime"]): r for r in baseline["runs"]}
+    regressions = []
+    for run in results["runs"]:
+        old = base.get((run["config"], run["fixture"], run["realtime"]))
+        if old is None:
+            continue
+        for key in COMPARED:
+            new_value, old_value = run.get(key), old.get(key)
+            if new_value is None or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            flag = "REGRESSION" if change > tolerance else ""
+            print(f"  {run['config']:<6} {run['fixture']:<14} {key:<13} {old_value:>10.4g} -> {new_value:>10.4g} "
+                  f"{change:+7.1%} {flag}")
+            if flag:
+                regressions.append((run["config"], run["fixture"], key))
+    return regressions
+
+
+def bench_pipeline(args):
+    # End-to-end suite: every fixture through the real pipeline with a deterministic stub
+    # model (pipeline overhead only) and/or a small faster-whisper model on CPU int8.
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = args.fixtures or make_fixtures(tmp)
+        results = dict(
+            meta=dict(
+                python=platform.python_version(),
+                platform=platform.platform(),
+                cpus=os.cpu_count(),
+                numpy=np.__version__,
+                stub_rtf=args.stub_rtf,
+                stub_overhead=args.stub_overhead,
+                streaming=args.streaming,
+                vad_gate=args.vad_gate,
+                ts=time.time(),
+            ),
+            runs=[],
+        )
+        print(f"{'config':<6} {'fixture':<14} {'audio_s':>7} {'rtf':>7} {'model_rtf':>9} {'p50_s':>6} {'p90_s':>6} "
+              f"{'rss_mb':>7} {'allocs/s':>9}  cpu_s")
+        for config in args.configs:
+            try:
+                # Loaded once per config; load time is not part of any run.
+                model = load_model(config, args)
+            except Exception as e:
+                print(f"{config:<6} skipped, model not available: {str(e).splitlines()[0]}")
+                continue
+            for path in paths:
+                run = run_fixture(path, config, model, args)
+                results["runs"].append(run)
+
+                def fmt(value):
+                    return f"{value:6.2f}" if value is not None else f"{'-':>6}"
+                print(f"{config:<6} {run['fixture']:<14} {run['audio_seconds']:>7.1f} {run['rtf']:>7.3f} "
+                      f"{run['model_rtf']:>9.3f} {fmt(run['latency_p50'])} {fmt(run['latency_p90'])} "
+                      f"{run['peak_rss_mb']:>7.1f} {run['allocs_per_s']:>9.0f}  {run['cpu_seconds']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"wrote {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"compared with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s)")
+            sys.exit(1)
+
+
+def bench_startup(args):
+    # Fresh interpreter per run so import costs count: launch -> window visible -> model
+    # ready -> first caption. The launch timestamp is taken just before spawning.
+    import subprocess
+
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    here = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    print(f"{'model':<8} {'mode':<8} {'window_s':>8} {'ready_s':>8} {'first_caption_s':>15}")
+    for model in args.models:
+        for headless in (False, True):
+            cmd = [sys.executable, os.path.join(here, "benchmark.py"), "startup-child", "--model", model,
+                   "--synthetic", "speech", "--startup-report", "--device", args.device]
+            if headless:
+                cmd.append("--headless")
+            env["CAPTIONS_LAUNCH_TS"] = repr(time.time())
+            proc = subprocess.run(cmd, env=env, capture_output=True, text=True, timeout=args.timeout)
+            report = None
+            for line in proc.stderr.splitlines():
+                if line.startswith('{"startup"'):
+                    report = json.loads(line)
+            mode = "headless" if headless else "window"
+            if report is None:
+                print(f"{model:<8} {mode:<8} failed: {(proc.stderr.strip().splitlines() or ['no output'])[-1]}")
+                continue
+            marks, timings = report["startup"], report["transcriber"]
+            # Transcriber timings count from its construction; anchor them on the first caption.
+            ready = marks["first_caption"] - timings["first_caption"] + timings["ready"]
+            runs.append(dict(model=model, mode=mode, ready=round(ready, 3), **marks, transcriber=timings))
+            window = marks.get("window_visible")
+            print(f"{model:<8} {mode:<8} {window if window is not None else '-':>8} {ready:>8.2f} {marks['first_caption']:>15.2f}")
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import faster_whisper"], capture_output=True)
+    print(f"(deferred off the startup path: 'import faster_whisper' alone takes {time.perf_counter() - start:.2f}s)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(dict(runs=runs), f, indent=2)
+
+
+def startup_child(argv):
+    # Runs main.run() like a normal launch; "stub" swaps in the stub model.
+    import main as app
+
+    args = app.parse_args(argv)
+    app.run(args, model=StubWhisperModel() if args.model == "stub" else None)
+
+
+def main():
+    if sys.argv[1:2] == ["startup-child"]:
+        startup_child(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the capture/transcribe hot paths.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ring = sub.add_parser("ring", help="window accumulation cost per chunk")
+    ring.add_argument("--chunk", type=int, default=1024)
+    ring.add_argument("--windows", type=float, nargs="+", default=[3, 10, 30, 60, 120])
+    ring.add_argument("--repeat", type=int, default=5)
+    ring.set_defaults(func=bench_ring)
+
+    resample = sub.add_parser("resample", help="capture callback conversion cost and fidelity")
+    resample.add_argument("--rates", type=int, nargs="+", default=[48000, 44100])
+    resample.add_argument("--channels", type=int, default=2)
+    resample.add_argument("--block", type=int, default=1024)
+    resample.add_argument("--seconds", type=float, default=4.0)
+    resample.set_defaults(func=bench_resample)
+
+    vad = sub.add_parser("vad", help="model time saved by the pre-model voice activity gate")
+    vad.add_argument("--speech", type=float, default=20.0, help="seconds of the first speech section")
+    vad.add_argument("--silence", type=float, default=40.0, help="seconds of the quiet stretch")
+    vad.add_argument("--rtf", type=float, default=0.05, help="stub model seconds per audio second")
+    vad.add_argument("--overhead", type=float, default=0.02, help="stub model fixed cost per call")
+    vad.set_defaults(func=bench_vad)
+
+    backlog = sub.add_parser("backlog", help="caption lag and queue growth under overload policies")
+    backlog.add_argument("--seconds", type=float, default=30.0, help="length of the paced source")
+    backlog.add_argument("--rtf", type=float, default=1.3, help="stub model seconds per audio second")
+    backlog.add_argument("--overhead", type=float, default=0.3, help="stub model fixed cost per call")
+    backlog.add_argument("--max-lag", type=float, default=6.0)
+    backlog.set_defaults(func=bench_backlog)
+
+    quality = sub.add_parser("quality", help="caption lag with fixed vs adaptive model/beam quality")
+    quality.add_argument("--seconds", type=float, default=60.0, help="length of the paced source")
+    quality.add_argument("--rtfs", type=float, nargs="+", default=[1.4, 0.7, 0.35],
+                         help="stub seconds per audio second for large-v3, medium, small, ...")
+    quality.add_argument("--overhead", type=float, default=0.1, help="stub model fixed cost per call")
+    quality.add_argument("--load", type=float, default=2.0, help="seconds each ladder model takes to load")
+    quality.add_argument("--hold", type=float, default=10.0, help="headroom needed before stepping back up")
+    quality.add_argument("--max-lag", type=float, default=20.0)
+    quality.set_defaults(func=bench_quality)
+
+    pipeline = sub.add_parser("pipeline", help="end-to-end RTF, latency, memory and CPU per stage on WAV fixtures")
+    pipeline.add_argument("fixtures", nargs="*", help="WAV files to replay (default: generated speech/meeting fixtures)")
+    pipeline.add_argument("--configs", nargs="+", default=["stub", "tiny"],
+                          help="'stub' and/or faster-whisper model sizes run on CPU int8")
+    pipeline.add_argument("--stub-rtf", type=float, default=0.05, help="stub model seconds per audio second")
+    pipeline.add_argument("--stub-overhead", type=float, default=0.02, help="stub model fixed cost per call")
+    pipeline.add_argument("--realtime", action="store_true", help="pace fixtures in real time (live latency) instead of max throughput")
+    pipeline.add_argument("--streaming", action="store_true")
+    pipeline.add_argument("--vad-gate", action="store_true")
+    pipeline.add_argument("--output", help="write results JSON here")
+    pipeline.add_argument("--baseline", help="results JSON to compare against; exits 1 on regressions")
+    pipeline.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown before flagging")
+    pipeline.set_defaults(func=bench_pipeline)
+
+    engine = sub.add_parser("engine", help="capture jitter and UI frame time, engine in-process vs worker process")
+    engine.add_argument("--seconds", type=float, default=20.0, help="length of the paced source")
+    engine.add_argument("--rtf", type=float, default=0.3, help="stub model seconds per audio second")
+    engine.add_argument("--overhead", type=float, default=0.05, help="stub model fixed cost per call")
+    engine.add_argument("--busy", type=float, default=0.5, help="fraction of stub cost spent holding the GIL")
+    engine.add_argument("--streaming", action="store_true")
+    engine.add_argument("--output", help="write results JSON here")
+    engine.set_defaults(func=bench_engine)
+
+    sources = sub.add_parser("sources", help="several paced sources on one shared model via the inference scheduler")
+    sources.add_argument("--streams", type=int, nargs="+", default=[1, 2, 4, 8])
+    sources.add_argument("--seconds", type=float, default=15.0, help="length of each paced source")
+    sources.add_argument("--rtf", type=float, default=0.05, help="stub model seconds per audio second")
+    sources.add_argument("--overhead", type=float, default=0.1, help="stub model fixed cost per call")
+    sources.add_argument("--max-batch", type=int, default=8)
+    sources.set_defaults(func=bench_sources)
+
+    segments = sub.add_parser("segments", help="time to first caption, one caption per window vs per decoded segment")
+    segments.add_argument("--seconds", type=float, default=30.0, help="length of the paced source")
+    segments.add_argument("--window", type=float, default=6.0, help="seconds per decode window")
+    segments.add_argument("--segment", type=float, default=2.0, help="seconds of audio per stub segment")
+    segments.add_argument("--rtf", type=float, default=0.3, help="stub model seconds per audio second")
+    segments.add_argument("--overhead", type=float, default=0.1, help="stub model fixed cost per call")
+    segments.set_defaults(func=bench_segments)
+
+    draft = sub.add_parser("draft", help="time to first visible text and final caption, main model alone vs with a draft model")
+    draft.add_argument("--seconds", type=float, default=30.0, help="length of the paced source")
+    draft.add_argument("--window", type=float, default=6.0, help="seconds per main-model window")
+    draft.add_argument("--rtf", type=float, default=0.5, help="main stub seconds per audio second")
+    draft.add_argument("--overhead", type=float, default=0.3, help="main stub fixed cost per call")
+    draft.add_argument("--draft-rtf", type=float, default=0.03, help="draft stub seconds per audio second")
+    draft.add_argument("--draft-overhead", type=float, default=0.02, help="draft stub fixed cost per call")
+    draft.add_argument("--draft-interval", type=float, default=1.0)
+    draft.add_argument("--draft-logprob", type=float, default=-0.4, help="avg_logprob of the draft stub's segments")
+    draft.add_argument("--skip-logprob", type=float, default=-0.25, help="draft_skip_logprob of the transcriber")
+    draft.set_defaults(func=bench_draft)
+
+    cache = sub.add_parser("cache", help="model calls saved by the fingerprint result cache on repeated content")
+    cache.add_argument("--windows", type=int, default=60)
+    cache.add_argument("--window", type=float, default=6.0, help="seconds per decode window")
+    cache.add_argument("--every", type=int, default=5, help="the ident fills every Nth window")
+    cache.add_argument("--jitter", type=float, default=0.3, help="how far each ident take is cut off, seconds")
+    cache.add_argument("--noise", type=float, default=0.003, help="noise level added to every window")
+    cache.add_argument("--rtf", type=float, default=0.1, help="stub model seconds per audio second")
+    cache.add_argument("--overhead", type=float, default=0.1, help="stub model fixed cost per call")
+    cache.set_defaults(func=bench_cache)
+
+    broadcast = sub.add_parser("broadcast", help="caption fan-out to many WebSocket/SSE clients, with stalled clients")
+    broadcast.add_argument("--clients", type=int, default=300, help="reading clients (half SSE, half WebSocket)")
+    broadcast.add_argument("--stalled", type=int, default=4, help="clients that connect and never read")
+    broadcast.add_argument("--seconds", type=float, default=10.0)
+    broadcast.add_argument("--rate", type=float, default=50.0, help="caption updates per second")
+    broadcast.add_argument("--words", type=int, default=40, help="words per caption")
+    broadcast.add_argument("--max-queue", type=int, default=64, help="per-client queue of the server")
+    broadcast.set_defaults(func=bench_broadcast)
+
+    store = sub.add_parser("store", help="transcript store add() cost, memory, search latency and export over a long session")
+    store.add_argument("--captions", type=int, default=100000, help="captions to write (one per 3 s of session)")
+    store.add_argument("--words", type=int, default=12, help="words per caption")
+    store.add_argument("--vocabulary", type=int, default=20000)
+    store.add_argument("--fsync-interval", type=float, default=1.0)
+    store.add_argument("--segment-records", type=int, default=2048)
+    store.set_defaults(func=bench_store)
+
+    ui = sub.add_parser("ui", help="caption window paint cost and dropped updates under high-rate captions (offscreen Qt)")
+    ui.add_argument("--rate", type=float, default=200.0, help="caption updates per second")
+    ui.add_argument("--seconds", type=float, default=5.0)
+    ui.add_argument("--fps", type=int, default=20, help="frame rate cap of the coalesced window")
+    ui.add_argument("--final-every", type=int, default=20, help="every Nth update is a final caption")
+    ui.set_defaults(func=bench_ui)
+
+    startup = sub.add_parser("startup", help="time to window visible and to first caption in a fresh process")
+    startup.add_argument("--models", nargs="+", default=["stub"], help="'stub' and/or model sizes (downloaded/cached)")
+    startup.add_argument("--device", default="cpu")
+    startup.add_argument("--timeout", type=float, default=300.0)
+    startup.add_argument("--output", help="write results JSON here")
+    startup.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
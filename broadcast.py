@@ -0,0 +1,433 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+import metrics
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC11B3F"
+_MAX_REQUEST = 8192
+_MAX_CLIENT_FRAME = 1 << 16
+
+OVERLAY_HTML = b"""<!doctype html>
+<html><head><meta charset="utf-8"><title>Captions</title>
+<style>
+body { margin: 0; background: transparent; font: 32px sans-serif; color: #fff;
+       text-shadow: 0 0 4px #000, 0 0 4px #000; }
+#captions { position: fixed; bottom: 24px; left: 24px; right: 24px; }
+.partial { opacity: 0.6; font-style: italic; }
+</style></head>
+<body><div id="captions"><div id="final"></div><div id="partial" class="partial"></div></div>
+<script>
+const lines = [];
+const events = new EventSource("/events");
+events.addEventListener("caption", (e) => {
+  const c = JSON.parse(e.data);
+  if (c.final) {
+    if (c.text) { lines.push(c.text); lines.splice(0, lines.length - 2); }
+    document.getElementById("final").textContent = lines.join(" ");
+    document.getElementById("partial").textContent = "";
+  } else {
+    document.getElementById("partial").textContent = c.text;
+  }
+});
+</script></body></html>
+"""
+
+
+def ws_frame(payload, opcode=0x1):
+    # One unmasked, unfragmented server frame (text by default).
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return header + payload
+
+
+async def read_ws_frame(reader, max_size=_MAX_CLIENT_FRAME):
+    # (opcode, payload) of the next frame; client frames are masked, server frames not.
+    b1, b2 = await reader.readexactly(2)
+    n = b2 & 0x7F
+    if n == 126:
+        (n,) = struct.unpack("!H", await reader.readexactly(2))
+    elif n == 127:
+        (n,) = struct.unpack("!Q", await reader.readexactly(8))
+    if n > max_size:
+        raise ValueError(f"WebSocket frame of {n} bytes")
+    mask = await reader.readexactly(4) if b2 & 0x80 else None
+    payload = await reader.readexactly(n)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return b1 & 0x0F, payload
+
+
+class _Client:
+    __slots__ = ("kind", "pending", "wake", "task", "writer", "sent")
+
+    def __init__(self, kind, writer):
+        self.kind = kind
+        # Encoded events waiting for this client's socket; only used once it falls behind.
+        self.pending = deque()
+        self.wake = asyncio.Event()
+        self.task = asyncio.current_task()
+        self.writer = writer
+        self.sent = 0
+
+
+class CaptionBroadcaster:
+    # Local caption fan-out: WebSocket (any path with an Upgrade) and Server-Sent Events
+    # (/events) clients each get every caption as a JSON event, and / serves a minimal
+    # browser overlay (e.g. an OBS browser source). The server runs on its own asyncio
+    # loop thread; publish() only hands the caption over to it, so the transcriber never
+    # waits on a client. Events go straight to a client's socket while it keeps up (its
+    # transport holds less than write_buffer bytes), otherwise into its queue of up to
+    # max_queue events; a client that falls that far behind is disconnected (it can reconnect and gets the last `replay` final
+    # captions again). Idle connections get a keepalive every `keepalive` seconds.
+    def __init__(self, port=8765, host="127.0.0.1", max_queue=256, replay=10, keepalive=15.0,
+                 write_buffer=64 * 1024):
+        self.host = host
+        self.port = int(port)
+        self.max_queue = int(max_queue)
+        self.keepalive = float(keepalive)
+        self.write_buffer = int(write_buffer)
+        self._recent = deque(maxlen=min(int(replay), self.max_queue))
+        self._clients = set()
+        self._seq = 0
+        self._loop = None
+        self._server = None
+        self.thread = None
+        self.published = 0
+        self.connected = 0
+        self.dropped = 0
+        registry = metrics.REGISTRY
+        registry.gauge("broadcast_clients", "Connected caption broadcast clients", fn=lambda b: len(b._clients),
+                       owner=self)
+        self._c_events = registry.counter("broadcast_events_total", "Captions published to the broadcast server")
+        self._c_dropped = registry.counter("broadcast_clients_dropped_total",
+                                           "Broadcast clients disconnected for falling max_queue events behind")
+
+    def start(self):
+        # Binds before returning (port=0 picks a free port, see self.port).
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, limit=_MAX_REQUEST))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.thread = threading.Thread(target=self._loop.run_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        self.thread.join()
+        loop.close()
+
+    async def _shutdown(self):
+        self._server.close()
+        for client in list(self._clients):
+            client.task.cancel()
+        await asyncio.gather(*(c.task for c in list(self._clients)), return_exceptions=True)
+
+    def publish(self, caption):
+        # Any thread; never blocks.
+        loop = self._loop
+        if loop is None:
+            return
+        self.published += 1
+        self._c_events.inc()
+        try:
+            loop.call_soon_threadsafe(self._fan_out, caption, time.time())
+        except RuntimeError:
+            # Stopped meanwhile.
+            pass
+
+    def _fan_out(self, caption, sent):
+        self._seq += 1
+        event = dict(
+            seq=self._seq, text=caption.text, final=caption.final, start=round(caption.start, 3),
+            end=round(caption.end, 3), language=caption.language, source=caption.source,
+            avg_logprob=caption.avg_logprob, sent=sent,
+        )
+        # Encoded once for all clients of each kind.
+        encoded = self._encode(event)
+        if caption.final and caption.text:
+            # Replayed to clients that connect later, marked as such.
+            self._recent.append(self._encode(dict(event, replay=True)))
+        for client in list(self._clients):
+            if not client.pending and client.writer.transport.get_write_buffer_size() < self.write_buffer:
+                # Keeping up: no task switch per client and event.
+                client.writer.write(encoded[client.kind])
+                client.sent += 1
+            elif len(client.pending) >= self.max_queue:
+                self._drop(client)
+            else:
+                client.pending.append(encoded)
+                client.wake.set()
+
+    def _encode(self, event):
+        data = json.dumps(event).encode("utf-8")
+        return dict(ws=ws_frame(data), sse=b"id: %d\nevent: caption\ndata: %s\n\n" % (event["seq"], data))
+
+    def _drop(self, client):
+        self._clients.discard(client)
+        self.dropped += 1
+        self._c_dropped.inc()
+        client.writer.transport.abort()
+        client.task.cancel()
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5.0)
+            lines = request.decode("latin-1").split("\r\n")
+            method, path = lines[0].split(" ")[:2]
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError,
+                ConnectionError):
+            writer.close()
+            return
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        path = path.split("?")[0]
+        try:
+            if method != "GET":
+                await self._respond(writer, "405 Method Not Allowed", b"", "text/plain")
+            elif headers.get("upgrade", "").lower() == "websocket" and "sec-websocket-key" in headers:
+                # Browsers send Origin on WebSocket upgrades and do not apply CORS to them,
+                # so any page could otherwise read the captions; only the overlay's own
+                # origin (or a non-browser client without one) may connect.
+                if "origin" in headers and headers["origin"] not in self._origins():
+                    await self._respond(writer, "403 Forbidden", b"origin not allowed\n", "text/plain")
+                    return
+                accept = base64.b64encode(
+                    hashlib.sha1((headers["sec-websocket-key"] + _WS_GUID).encode("ascii")).digest()).decode("ascii")
+                writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                              f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode("ascii"))
+                await self._serve("ws", reader, writer)
+            elif path == "/events":
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                             b"Connection: keep-alive\r\n\r\n")
+                await self._serve("sse", reader, writer)
+            elif path == "/":
+                await self._respond(writer, "200 OK", OVERLAY_HTML, "text/html; charset=utf-8")
+            else:
+                await self._respond(writer, "404 Not Found", b"not found\n", "text/plain")
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    def _origins(self):
+        return {f"http://127.0.0.1:{self.port}", f"http://localhost:{self.port}"}
+
+    async def _respond(self, writer, status, body, content_type):
+        writer.write((f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                      "Connection: close\r\n\r\n").encode("ascii") + body)
+        await writer.drain()
+
+    async def _serve(self, kind, reader, writer):
+        # Writes the client's queue whenever it has one; the bounded transport buffer makes
+        # a stalled reader show up as a growing queue rather than as memory.
+        writer.transport.set_write_buffer_limits(high=self.write_buffer)
+        # Likewise in the kernel, which would otherwise grow the socket buffer to megabytes.
+        writer.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.write_buffer)
+        client = _Client(kind, writer)
+        client.pending.extend(self._recent)
+        client.wake.set()
+        self._clients.add(client)
+        self.connected += 1
+        listener = asyncio.ensure_future(self._listen(kind, reader, writer))
+        # The client going away ends this task wherever it is waiting.
+        listener.add_done_callback(lambda _: client.task.cancel())
+        try:
+            while True:
+                sent = client.sent
+                try:
+                    await asyncio.wait_for(client.wake.wait(), self.keepalive)
+                except asyncio.TimeoutError:
+                    if client.sent == sent:
+                        writer.write(ws_frame(b"", 0x9) if kind == "ws" else b": keepalive\n\n")
+                client.wake.clear()
+                while client.pending:
+                    await writer.drain()
+                    writer.write(client.pending.popleft()[kind])
+                    client.sent += 1
+                await writer.drain()
+        finally:
+            self._clients.discard(client)
+            listener.cancel()
+
+    async def _listen(self, kind, reader, writer):
+        # Returns when the client goes away. SSE clients never send anything; WebSocket
+        # clients may ping or close.
+        try:
+            if kind == "sse":
+                while await reader.read(1024):
+                    pass
+                return
+            while True:
+                opcode, payload = await read_ws_frame(reader)
+                if opcode == 0x8:
+                    writer.write(ws_frame(payload[:2], 0x8))
+                    return
+                if opcode == 0x9:
+                    writer.write(ws_frame(payload, 0xA))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            return
+
+    def report(self):
+        return dict(clients=len(self._clients), connected=self.connected, published=self.published,
+                    dropped_clients=self.dropped)
+
+
+async def connect(host, port, kind, recv_buffer=None, origin=None):
+    # A load-test client: connected socket past the handshake, as (reader, writer).
+    # origin: sent as the Origin header, the way a browser page would.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if recv_buffer:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, (host, port))
+    # A small stream limit too, or asyncio would keep reading into its own buffer.
+    reader, writer = await asyncio.open_connection(sock=sock, limit=recv_buffer or 1 << 20)
+    extra = f"Origin: {origin}\r\n" if origin else ""
+    if kind == "ws":
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        writer.write((f"GET /ws HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n{extra}\r\n").encode("ascii"))
+    else:
+        writer.write((f"GET /events HTTP/1.1\r\nHost: {host}:{port}\r\nAccept: text/event-stream\r\n{extra}"
+                      "\r\n").encode("ascii"))
+    await writer.drain()
+    status = await reader.readuntil(b"\r\n\r\n")
+    if not status.startswith(b"HTTP/1.1 101" if kind == "ws" else b"HTTP/1.1 200"):
+        raise ConnectionError(status.split(b"\r\n")[0].decode("latin-1"))
+    return reader, writer
+
+
+async def read_events(reader, kind):
+    # Caption events (dicts) from a connected client until the server closes it.
+    while True:
+        if kind == "ws":
+            opcode, payload = await read_ws_frame(reader, max_size=1 << 20)
+            if opcode == 0x8:
+                return
+            if opcode != 0x1:
+                continue
+            yield json.loads(payload)
+        else:
+            block = await reader.readuntil(b"\n\n")
+            for line in block.split(b"\n"):
+                if line.startswith(b"data: "):
+                    yield json.loads(line[6:])
+
+
+async def _reader_client(host, port, kind, seconds, stats):
+    try:
+        reader, writer = await connect(host, port, kind)
+    except (OSError, asyncio.IncompleteReadError) as e:
+        stats["failed"].append(str(e))
+        return
+    seqs, latencies = [], stats["latencies"]
+
+    async def consume():
+        async for event in read_events(reader, kind):
+            if event.get("replay"):
+                continue
+            latencies.append(time.time() - event["sent"])
+            seqs.append(event["seq"])
+
+    try:
+        await asyncio.wait_for(consume(), seconds)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    writer.close()
+    stats["received"].append(len(seqs))
+    if seqs:
+        stats["lost"] += seqs[-1] - seqs[0] + 1 - len(set(seqs))
+
+
+async def _stalled_client(host, port, kind, seconds, stats):
+    # Connects with a tiny receive buffer and never reads: the server must drop it.
+    try:
+        reader, writer = await connect(host, port, kind, recv_buffer=4096)
+    except (OSError, asyncio.IncompleteReadError) as e:
+        stats["failed"].append(str(e))
+        return
+    await asyncio.sleep(seconds)
+    # Whatever made it into our buffers, then either EOF (dropped) or still open.
+
+    async def drain():
+        while await reader.read(1 << 16):
+            pass
+
+    try:
+        await asyncio.wait_for(drain(), 2.0)
+        stats["stalled_dropped"] += 1
+    except asyncio.TimeoutError:
+        pass
+    except ConnectionError:
+        stats["stalled_dropped"] += 1
+    writer.close()
+
+
+def _percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+async def load_test(host="127.0.0.1", port=8765, clients=200, seconds=10.0, stalled=0, sse_share=0.5):
+    # clients readers (sse_share of them SSE, the rest WebSocket) plus `stalled` clients
+    # that never read, all for `seconds`. Latency is publish() to the client parsing the
+    # event, on the wall clock, so run it on the capture machine.
+    stats = dict(latencies=[], received=[], lost=0, failed=[], stalled_dropped=0)
+    n_sse = int(round(clients * sse_share))
+    tasks = [_reader_client(host, port, "sse" if i < n_sse else "ws", seconds, stats) for i in range(clients)]
+    tasks += [_stalled_client(host, port, "ws" if i % 2 else "sse", seconds, stats) for i in range(stalled)]
+    await asyncio.gather(*tasks)
+    latencies = stats["latencies"]
+    return dict(
+        clients=clients, stalled=stalled, failed=len(stats["failed"]),
+        events_min=min(stats["received"], default=0), events_max=max(stats["received"], default=0),
+        lost=stats["lost"], stalled_dropped=stats["stalled_dropped"],
+        latency_p50_ms=round(_percentile(latencies, 50) * 1000, 2),
+        latency_p99_ms=round(_percentile(latencies, 99) * 1000, 2),
+        latency_max_ms=round(max(latencies, default=float("nan")) * 1000, 2),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a caption broadcast server started with main.py --broadcast-port.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=200, help="reading clients")
+    parser.add_argument("--stalled", type=int, default=0, help="extra clients that never read")
+    parser.add_argument("--sse-share", type=float, default=0.5, help="fraction of the reading clients using SSE")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    report = asyncio.run(load_test(args.host, args.port, args.clients, args.seconds, args.stalled, args.sse_share))
+    print(json.dumps(report) if args.json else report)
+    if report["failed"]:
+        print(f"{report['failed']} clients could not connect", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
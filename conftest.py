@@ -0,0 +1,106 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+
+class FakeWhisperModel:
+    # Shared stand-in for WhisperModel: one segment per call, records the kwargs it was
+    # called with. text is formatted with the window's seconds and its peak level in
+    # tenths (" heard {seconds:.1f}s", " level{level}"). Module-level and picklable, so
+    # it also works as model= for the engine worker process.
+    def __init__(self, text=" heard {seconds:.1f}s", language="en", probability=0.99):
+        self.text = text
+        self.language = language
+        self.probability = probability
+        self.calls = []
+
+    def transcribe(self, audio, **kwargs):
+        self.calls.append(kwargs)
+        seconds = len(audio) / 16000
+        level = int(round(float(np.abs(audio).max()) * 10)) if len(audio) else 0
+        segment = SimpleNamespace(text=self.text.format(seconds=seconds, level=level), start=0.0, end=seconds, words=None)
+        return iter([segment]), SimpleNamespace(language=self.language, language_probability=self.probability)
+
+
+class StubWhisperModel:
+    # Deterministic stand-in for WhisperModel: costs `rtf` seconds per audio second plus a
+    # fixed overhead, and "hears" words only where the audio has energy. A `busy` fraction
+    # of the cost is spent in Python holding the GIL (segment iteration, filtering) instead
+    # of sleeping like native code. With segment_seconds it decodes lazily like
+    # faster-whisper: one segment per segment_seconds of audio, each costing its share
+    # when the generator reaches it. avg_logprob is what every segment reports.
+    def __init__(self, rtf=0.05, overhead=0.0, busy=0.0, segment_seconds=None, avg_logprob=-0.2):
+        self.rtf = rtf
+        self.overhead = overhead
+        self.busy = busy
+        self.segment_seconds = segment_seconds
+        self.avg_logprob = avg_logprob
+        self.calls = 0
+        self.yielded = 0
+
+    def _spend(self, cost):
+        spin_until = time.perf_counter() + cost * self.busy
+        while time.perf_counter() < spin_until:
+            pass
+        time.sleep(cost * (1 - self.busy))
+
+    def transcribe(self, audio, clip_timestamps=None, **kwargs):
+        # With clip_timestamps (sample offsets) it behaves like BatchedInferencePipeline: one
+        # call, one fixed overhead, a segment per clip, times in seconds.
+        self.calls += 1
+        duration = len(audio) / 16000
+        lazy = self.segment_seconds and not clip_timestamps
+        self._spend(self.overhead + (0 if lazy else self.rtf * duration))
+
+        segments = []
+        for clip in clip_timestamps or [dict(start=0, end=len(audio))]:
+            offset = clip["start"] / 16000
+            groups = {}
+            clip_audio = audio[clip["start"]:clip["end"]]
+            frames = clip_audio[:len(clip_audio) // 4800 * 4800].reshape(-1, 4800)
+            for i, frame in enumerate(frames):
+                if np.sqrt(np.mean(frame * frame)) > 1e-3:
+                    start = offset + i * 0.3
+                    group = int(start // self.segment_seconds) if lazy else 0
+                    groups.setdefault(group, []).append(
+                        SimpleNamespace(start=start, end=start + 0.25, word=f" w{i}", probability=0.9))
+            for words in groups.values():
+                segments.append(SimpleNamespace(
+                    id=len(segments) + 1, start=words[0].start, end=words[-1].end, text="".join(w.word for w in words),
+                    avg_logprob=self.avg_logprob, no_speech_prob=0.01, compression_ratio=1.2,
+                    words=words if kwargs.get("word_timestamps") else None,
+                ))
+        info = SimpleNamespace(language="en", language_probability=0.99, duration=duration)
+        if lazy:
+            return self._lazy(segments, duration), info
+        return iter(segments), info
+
+    def _lazy(self, segments, duration):
+        done = 0.0
+        for segment in segments:
+            end = min(duration, (int(segment.start // self.segment_seconds) + 1) * self.segment_seconds)
+            self._spend(self.rtf * (end - done))
+            done = end
+            self.yielded += 1
+            yield segment
+        self._spend(self.rtf * (duration - done))
+
+    def detect_language(self, audio, **kwargs):
+        # Language-token pass: just the fixed overhead.
+        time.sleep(self.overhead)
+        return "en", 0.99, [("en", 0.99), ("de", 0.005)]
+
+
+def jingle(seed, seconds, rate=16000):
+    # A tune of random 200 ms harmonic notes: stands in for a station ident, an ad or hold
+    # music; the same seed is the same tune.
+    rng = np.random.default_rng(seed)
+    out = np.zeros(int(seconds * rate), dtype=np.float32)
+    note = rate // 5
+    for i in range(0, len(out), note):
+        t = np.arange(min(note, len(out) - i)) / rate
+        envelope = np.minimum(1.0, np.minimum(t, t[::-1]) * 50)
+        f = rng.uniform(150, 1500)
+        out[i:i + len(t)] = 0.2 * envelope * sum(np.sin(2 * np.pi * k * f * t) / k for k in (1, 2, 3))
+    return out
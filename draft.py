@@ -0,0 +1,105 @@
+import string
+
+import metrics
+
+_PUNCTUATION = str.maketrans("", "", string.punctuation)
+
+
+def words(text):
+    return text.lower().translate(_PUNCTUATION).split()
+
+
+def word_edits(reference, hypothesis):
+    # Word-level Levenshtein distance (substitutions, insertions, deletions).
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref in enumerate(reference, 1):
+        current = [i]
+        for j, hyp in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref != hyp)))
+        previous = current
+    return previous[-1]
+
+
+class DraftWindow:
+    # Provisional text of the open fixed window, one draft decode of new audio at a time.
+    # confident: every draft segment so far reached skip_logprob (None never skips), so the
+    # main model's pass over the window can be skipped.
+    def __init__(self, skip_logprob=-0.25):
+        self.skip_logprob = None if skip_logprob is None else float(skip_logprob)
+        self.clear()
+
+    def clear(self):
+        self.texts = []
+        self.logprobs = []
+        self.language = None
+        self.decodes = 0
+
+    def add(self, segments, language=None):
+        self.decodes += 1
+        self.language = language or self.language
+        for segment in segments:
+            self.texts.append(segment.text.strip())
+            self.logprobs.append(getattr(segment, "avg_logprob", None))
+
+    @property
+    def text(self):
+        return " ".join(t for t in self.texts if t)
+
+    @property
+    def avg_logprob(self):
+        known = [p for p in self.logprobs if p is not None]
+        return sum(known) / len(known) if known else None
+
+    @property
+    def confident(self):
+        if self.skip_logprob is None or not self.texts:
+            return False
+        return all(p is not None and p >= self.skip_logprob for p in self.logprobs)
+
+
+class DraftStats:
+    # How well the draft predicts the refined text: word edits between the two over the
+    # refined words (a WER of the draft against the main model), plus how many windows
+    # kept their draft without a main-model pass.
+    def __init__(self):
+        self.draft_calls = 0
+        self.draft_seconds = 0.0
+        self.refined = 0
+        self.skipped = 0
+        self.edits = 0
+        self.refined_words = 0
+        registry = metrics.REGISTRY
+        self._h_draft = registry.histogram("draft_inference_seconds", "Draft model transcribe() wall time per call")
+        self._h_diff = registry.histogram(
+            "draft_word_diff_rate", "Word edits from draft to refined text per refined word", metrics.RATIO_BUCKETS)
+        self._c_skipped = registry.counter("refine_skipped_total", "Windows whose confident draft became the final caption")
+
+    def drafted(self, seconds):
+        self.draft_calls += 1
+        self.draft_seconds += seconds
+        self._h_draft.observe(seconds)
+
+    def compare(self, draft_text, refined_text):
+        draft, refined = words(draft_text), words(refined_text)
+        edits = word_edits(refined, draft)
+        self.refined += 1
+        self.edits += edits
+        self.refined_words += len(refined)
+        if refined:
+            self._h_diff.observe(edits / len(refined))
+        return edits
+
+    def skip(self):
+        self.skipped += 1
+        self._c_skipped.inc()
+
+    def report(self):
+        windows = self.refined + self.skipped
+        return dict(
+            draft_calls=self.draft_calls,
+            draft_seconds=round(self.draft_seconds, 3),
+            refined_windows=self.refined,
+            skipped_windows=self.skipped,
+            skip_rate=round(self.skipped / windows, 3) if windows else 0.0,
+            word_diff_rate=round(self.edits / self.refined_words, 3) if self.refined_words else None,
+        )
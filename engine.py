@@ -0,0 +1,543 @@
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import metrics
+
+# Header slots (int64) of the shared ring. Each one has a single writer: the producer
+# (capture side), the consumer (engine process) or, for _CLOSED, the owning process.
+(_WRITE, _CHUNKS, _TRUNCATED, _BLOCKING, _READ, _READ_CHUNK, _DROPPED, _CLOSED) = range(8)
+_HEADER_BYTES = 128
+
+
+class SharedAudioRing:
+    # Single-producer/single-consumer audio ring in multiprocessing.shared_memory, for an
+    # engine running in another process. Same idea as backlog.AudioBacklog: the capture
+    # side writes samples into a mirrored float32 array and publishes (start, end,
+    # captured_at) in a fixed table of chunk slots, then bumps the counters; the reader
+    # gets a view and advances its own counters when done. Only the 64-bit header
+    # counters are shared state, each written by one side, after the data it publishes.
+    #
+    # The producer never waits on a live source: if the reader falls more than
+    # max_seconds behind (or is being restarted), the oldest audio is overwritten and the
+    # reader skips past it, counting it as dropped. Positions are stream samples, so the
+    # engine keeps source timestamps across a gap. captured_at is perf_counter, which is
+    # one system-wide monotonic clock on Linux, Windows and macOS.
+    #
+    # There are no cross-process wake-ups: a multiprocessing Event/Condition can block the
+    # setter on a peer that died while waiting, which must never happen on the capture
+    # callback. The reader polls the header every poll_interval instead (a few ms of
+    # latency on a window of seconds); a blocked producer (unpaced source) does the same.
+    #
+    # The ring pickles by name, so passing it to a multiprocessing.Process attaches the
+    # child to the same memory.
+    def __init__(self, sample_rate=16000, max_seconds=30.0, slots=8192, poll_interval=0.005, *, _attach=None):
+        self.sample_rate = sample_rate
+        self.poll_interval = float(poll_interval)
+        self.max_samples = int(max_seconds * sample_rate)
+        # 2 s of slack so the chunk being read isn't overwritten while it's copied out.
+        self.capacity = self.max_samples + 2 * sample_rate
+        self.slots = int(slots)
+        size = _HEADER_BYTES + self.slots * 24 + 2 * self.capacity * 4
+        if _attach is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=_attach)
+            self._owner = False
+        # Local to this process: lets wake() cut the reader's poll short.
+        self._wake = threading.Event()
+        buf = self.shm.buf
+        self._header = np.ndarray(_HEADER_BYTES // 8, np.int64, buf, 0)
+        offset = _HEADER_BYTES
+        self._starts = np.ndarray(self.slots, np.int64, buf, offset)
+        self._ends = np.ndarray(self.slots, np.int64, buf, offset + self.slots * 8)
+        self._stamps = np.ndarray(self.slots, np.float64, buf, offset + self.slots * 16)
+        self._data = np.ndarray(2 * self.capacity, np.float32, buf, offset + self.slots * 24)
+        if _attach is None:
+            self._header[:] = 0
+        self.peak = 0
+
+    def __reduce__(self):
+        return _attach_ring, (self.shm.name, self.sample_rate, self.max_samples / self.sample_rate,
+                              self.slots, self.poll_interval)
+
+    def _queued(self):
+        return int(self._header[_WRITE] - self._header[_READ])
+
+    def __len__(self):
+        return min(self._queued(), self.max_samples)
+
+    @property
+    def seconds(self):
+        return len(self) / self.sample_rate
+
+    @property
+    def received(self):
+        return int(self._header[_WRITE])
+
+    @property
+    def dropped(self):
+        h = self._header
+        return int(h[_DROPPED] + h[_TRUNCATED]) + max(self._queued() - self.max_samples, 0)
+
+    @property
+    def dropped_seconds(self):
+        return self.dropped / self.sample_rate
+
+    @property
+    def blocking(self):
+        # Whether the producer waits for room (unpaced source); the reader passes it on.
+        return bool(self._header[_BLOCKING])
+
+    @property
+    def closed(self):
+        return bool(self._header[_CLOSED])
+
+    # --- producer -----------------------------------------------------------------------
+
+    def put(self, samples, block=False, captured_at=None):
+        # Same contract as AudioBacklog.put, so a source can connect() to either.
+        h = self._header
+        n = len(samples)
+        if n == 0 or self.closed:
+            return
+        if n > self.max_samples:
+            h[_TRUNCATED] += n - self.max_samples
+            samples = samples[-self.max_samples:]
+            n = self.max_samples
+        h[_BLOCKING] = block
+        if block:
+            self._wait_for_space(n)
+
+        cap = self.capacity
+        start = int(h[_WRITE])
+        at = start % cap
+        first = min(n, cap - at)
+        data = self._data
+        data[at:at + first] = samples[:first]
+        data[at + cap:at + cap + first] = samples[:first]
+        if n > first:
+            data[:n - first] = samples[first:]
+            data[cap:cap + n - first] = samples[first:]
+        chunk = int(h[_CHUNKS])
+        slot = chunk % self.slots
+        self._starts[slot] = start
+        self._ends[slot] = start + n
+        self._stamps[slot] = np.nan if captured_at is None else captured_at
+        # Publish: chunk table first, then the counters the reader polls.
+        h[_WRITE] = start + n
+        h[_CHUNKS] = chunk + 1
+        self.peak = max(self.peak, len(self))
+
+    def _fits(self, n):
+        h = self._header
+        return self._queued() + n <= self.max_samples and h[_CHUNKS] - h[_READ_CHUNK] < self.slots
+
+    def _wait_for_space(self, n):
+        # Unpaced sources only; a live capture callback never gets here.
+        while not self.closed and not self._fits(n):
+            time.sleep(self.poll_interval)
+
+    # --- consumer -----------------------------------------------------------------------
+
+    def get(self, timeout=None):
+        # (stream_pos, samples, captured_at) like AudioBacklog.get; samples is a view that
+        # stays valid until release(), which must follow every successful get().
+        h = self._header
+        if h[_READ_CHUNK] == h[_CHUNKS]:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            self._wake.clear()
+            while h[_READ_CHUNK] == h[_CHUNKS] and not self.closed:
+                wait = self.poll_interval
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        break
+                if self._wake.wait(wait):
+                    break
+            if h[_READ_CHUNK] == h[_CHUNKS]:
+                raise queue.Empty
+        chunk = int(h[_READ_CHUNK])
+        behind = int(h[_CHUNKS]) - chunk
+        if behind > self.slots:
+            # Lapped in the chunk table: those slots were reused, their audio is gone.
+            chunk += behind - self.slots
+        oldest = int(h[_WRITE]) - self.max_samples
+        while True:
+            slot = chunk % self.slots
+            start, end, stamp = int(self._starts[slot]), int(self._ends[slot]), float(self._stamps[slot])
+            if end > oldest or chunk + 1 == h[_CHUNKS]:
+                break
+            # Overwritten (or about to be) by a producer that ran max_samples ahead.
+            chunk += 1
+        start = max(start, min(oldest, end))
+        # Everything between the last chunk read and this one is gone.
+        h[_DROPPED] += start - h[_READ]
+        self._pending = (chunk + 1, end)
+        at = start % self.capacity
+        return start, self._data[at:at + end - start], None if np.isnan(stamp) else stamp
+
+    def release(self):
+        h = self._header
+        chunk, end = self._pending
+        h[_READ] = end
+        h[_READ_CHUNK] = chunk
+
+    def wake(self):
+        # Only reaches a reader in this process (the engine's own shutdown).
+        self._wake.set()
+
+    def close(self):
+        self._header[_CLOSED] = 1
+        self._wake.set()
+
+    def reopen(self):
+        # A fresh reader resumes where the last one released.
+        self._header[_CLOSED] = 0
+
+    @property
+    def closed_memory(self):
+        return self._header is None
+
+    def release_memory(self):
+        # The arrays are views into the segment; drop them before closing it.
+        if self._header is None:
+            return
+        self._header = self._starts = self._ends = self._stamps = self._data = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+def _attach_ring(name, sample_rate, max_seconds, slots, poll_interval):
+    return SharedAudioRing(sample_rate, max_seconds, slots, poll_interval, _attach=name)
+
+
+def _engine_main(conn, ring, options):
+    # Child process: an ordinary AudioTranscriber fed from the shared ring. A reader
+    # thread copies each chunk into the transcriber's own queue (overload policies apply
+    # there as usual); the main thread answers control messages, so heartbeats keep
+    # coming while the model loads or decodes.
+    from transcriber import AudioTranscriber
+
+    send_lock = threading.Lock()
+
+    def send(*message):
+        with send_lock:
+            try:
+                conn.send(message)
+            except (OSError, ValueError):
+                pass
+
+    transcriber = AudioTranscriber(**options)
+    finishing = threading.Event()
+    stopping = threading.Event()
+
+    def read():
+        while not stopping.is_set():
+            try:
+                stream_pos, samples, captured_at = ring.get(timeout=0.5)
+            except queue.Empty:
+                if finishing.is_set() and not stopping.is_set():
+                    finishing.clear()
+                    send("done", transcriber.finish())
+                continue
+            transcriber.add_audio(samples, block=ring.blocking, captured_at=captured_at, stream_pos=stream_pos)
+            ring.release()
+
+    transcriber.start(lambda text: send("text", text), lambda caption: send("caption", caption),
+                      lambda state, detail: send("state", state, detail))
+    reader = threading.Thread(target=read)
+    reader.daemon = True
+    reader.start()
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            # Parent is gone.
+            break
+        kind = message[0]
+        if kind == "ping":
+            send("pong", message[1])
+            # This process's latency histograms etc., for the parent's exporters.
+            send("metrics", metrics.REGISTRY.state())
+        elif kind == "finish":
+            finishing.set()
+            ring.wake()
+        elif kind == "report":
+            send("report", _report(transcriber))
+        elif kind == "stop":
+            break
+    stopping.set()
+    ring.wake()
+    transcriber.stop()
+    reader.join(2.0)
+    send("metrics", metrics.REGISTRY.state())
+    send("report", _report(transcriber))
+    conn.close()
+
+
+def _report(transcriber):
+    return dict(
+        backlog=transcriber.backlog_report(),
+        gate=transcriber.gate_report(),
+        language=transcriber.language_report(),
+        quality=transcriber.quality_report(),
+        draft=transcriber.draft_report(),
+        cache=transcriber.cache_report(),
+        timings=dict(transcriber.timings),
+        state=transcriber.state,
+    )
+
+
+class RemoteTranscriber:
+    # AudioTranscriber interface with the engine in a worker process. Audio goes through
+    # a SharedAudioRing (audio_queue, what the source connects to); only captions, state,
+    # heartbeats and reports cross the pipe. The worker is pinged every
+    # heartbeat_interval; if it exits or misses heartbeat_timeout it is killed and a new
+    # one started on the same ring, with capture running throughout. Audio captured in
+    # the meantime waits in the ring (up to queue_seconds); the window the old worker was
+    # decoding is lost. Restarts back off from restart_delay up to max_restart_delay
+    # until a worker reports "ready". A model that fails to load is not retried.
+    #
+    # Options must pickle (no lambdas as model_factory; a stand-in model= must be a
+    # module-level class). The worker records into its own metrics registry and sends it
+    # with every heartbeat; it is merged into this process's registry, so the exporters
+    # see the inference and latency series as with the in-process engine.
+    def __init__(
+        self,
+        model_size="small",
+        device="cuda",
+        compute_type="float16",
+        *,
+        queue_seconds=30.0,
+        heartbeat_interval=1.0,
+        heartbeat_timeout=10.0,
+        startup_timeout=60.0,
+        restart_delay=0.5,
+        max_restart_delay=30.0,
+        **options,
+    ):
+        self._context = multiprocessing.get_context("spawn")
+        self.sample_rate = 16000
+        self.audio_queue = SharedAudioRing(self.sample_rate, queue_seconds)
+        self._options = dict(options, model_size=model_size, device=device, compute_type=compute_type)
+        self.heartbeat_interval = float(heartbeat_interval)
+        self.heartbeat_timeout = float(heartbeat_timeout)
+        # Allowance for spawning the interpreter and imports, before the first heartbeat.
+        self.startup_timeout = float(startup_timeout)
+        self.restart_delay = float(restart_delay)
+        self.max_restart_delay = float(max_restart_delay)
+
+        self.callback = None
+        self.on_caption = None
+        self.on_state = None
+        self.state = "idle"
+        self.running = False
+        self.process = None
+        self._conn = None
+        self.thread = None
+        self._delay = self.restart_delay
+        self._failed = False
+        self._finishing = False
+        self.done = threading.Event()
+        self._report = {}
+        self._report_ready = threading.Event()
+        self._last_pong = 0.0
+        self._last_ping = 0.0
+        self._answered = False
+        self._ring_dropped_seconds = 0.0
+        self._remote_metrics = None
+        self.restarts = 0
+        self.restart_reasons = []
+
+        registry = metrics.REGISTRY
+        self._h_heartbeat = registry.histogram("engine_heartbeat_seconds", "Engine process ping round trip")
+        self._c_restarts = registry.counter("engine_restarts_total", "Engine process restarts")
+        registry.gauge("engine_queue_seconds", "Audio in the shared ring waiting for the engine process",
+                       fn=lambda e: e.audio_queue.seconds, owner=self)
+        registry.gauge("engine_dropped_seconds", "Audio the shared ring overwrote before the engine read it",
+                       fn=lambda e: e.audio_queue.dropped_seconds, owner=self)
+
+    def start(self, callback, on_caption=None, on_state=None):
+        self.callback = callback
+        self.on_caption = on_caption
+        self.on_state = on_state
+        self.running = True
+        self._spawn()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        # Ask for a final report on the way out; kill the worker if it doesn't exit.
+        self.running = False
+        self.audio_queue.close()
+        if self.thread:
+            self.thread.join()
+        if self.process is not None:
+            self._report_ready.clear()
+            self._send("stop")
+            self._wait_report(2.0)
+            self.process.join(5.0)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+            self._conn.close()
+            self.process = None
+
+    def close(self):
+        # Free the shared memory; after stop() and once the source no longer writes to it.
+        self._ring_dropped_seconds = self.audio_queue.dropped_seconds
+        self.audio_queue.release_memory()
+
+    def add_audio(self, audio_chunk, block=False, captured_at=None):
+        self.audio_queue.put(audio_chunk, block=block, captured_at=captured_at)
+
+    @property
+    def lag_seconds(self):
+        return self.audio_queue.seconds
+
+    def finish(self, timeout=None):
+        self._finishing = True
+        self._send("finish")
+        return self.done.wait(timeout)
+
+    def _spawn(self):
+        self.audio_queue.reopen()
+        parent, child = self._context.Pipe()
+        self.process = self._context.Process(target=_engine_main, args=(child, self.audio_queue, self._options),
+                                             name="caption-engine", daemon=True)
+        self.process.start()
+        child.close()
+        self._conn = parent
+        self._answered = False
+        self._remote_metrics = None
+        self._last_pong = self._last_ping = time.monotonic()
+        if self._finishing:
+            self._send("finish")
+
+    def _send(self, *message):
+        try:
+            self._conn.send(message)
+        except (OSError, ValueError):
+            pass
+
+    def _run(self):
+        while self.running:
+            self._drain(self.heartbeat_interval / 4)
+            now = time.monotonic()
+            if now - self._last_ping >= self.heartbeat_interval:
+                self._last_ping = now
+                self._send("ping", time.perf_counter())
+            if self._failed or not self.running:
+                continue
+            if not self.process.is_alive():
+                self._restart(f"exit code {self.process.exitcode}")
+            elif now - self._last_pong > (self.heartbeat_timeout if self._answered else self.startup_timeout):
+                self._restart(f"no heartbeat for {now - self._last_pong:.1f}s")
+
+    def _drain(self, timeout):
+        # Handle whatever the worker sent within timeout seconds.
+        try:
+            if not self._conn.poll(timeout):
+                return
+            while self._conn.poll():
+                self._handle(self._conn.recv())
+        except (EOFError, OSError):
+            # Worker died; _run notices on its next pass.
+            time.sleep(timeout)
+
+    def _handle(self, message):
+        kind = message[0]
+        if kind == "pong":
+            self._last_pong = time.monotonic()
+            self._answered = True
+            self._h_heartbeat.observe(time.perf_counter() - message[1])
+        elif kind == "metrics":
+            metrics.REGISTRY.merge(message[1], self._remote_metrics)
+            self._remote_metrics = message[1]
+        elif kind == "text":
+            if self.callback:
+                self.callback(message[1])
+        elif kind == "caption":
+            if self.on_caption:
+                self.on_caption(message[1])
+        elif kind == "state":
+            _, state, detail = message
+            self.state = state
+            if state == "ready":
+                self._delay = self.restart_delay
+            elif state == "error":
+                # Loading failed; a new process would fail the same way.
+                self._failed = True
+            if self.on_state:
+                self.on_state(state, detail)
+        elif kind == "done":
+            self.done.set()
+        elif kind == "report":
+            self._report = message[1]
+            self._report_ready.set()
+
+    def _restart(self, reason):
+        print(f"Caption engine restarting ({reason})")
+        self.restarts += 1
+        self.restart_reasons.append(reason)
+        self._c_restarts.inc()
+        if self.on_state:
+            self.on_state("restarting", f"Engine restarting: {reason}")
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self._conn.close()
+        time.sleep(self._delay)
+        self._delay = min(self._delay * 2, self.max_restart_delay)
+        if self.running:
+            self._spawn()
+
+    def _fetch_report(self, timeout=2.0):
+        # Live report while the worker runs; the last one it sent after it stopped.
+        if self.running and self.process is not None and self.process.is_alive():
+            self._report_ready.clear()
+            self._send("report")
+            self._wait_report(timeout)
+        return self._report
+
+    def _wait_report(self, timeout):
+        if self.running and threading.current_thread() is not self.thread:
+            self._report_ready.wait(timeout)
+            return
+        # Nobody else is reading the pipe (stopped, or asked from inside a callback).
+        deadline = time.monotonic() + timeout
+        while not self._report_ready.is_set() and time.monotonic() < deadline:
+            self._drain(0.05)
+
+    @property
+    def timings(self):
+        return self._fetch_report().get("timings", {})
+
+    def backlog_report(self):
+        report = dict(self._fetch_report().get("backlog") or {})
+        dropped = self._ring_dropped_seconds if self.audio_queue.closed_memory else self.audio_queue.dropped_seconds
+        report.update(engine_restarts=self.restarts, ring_dropped_seconds=round(dropped, 2))
+        return report
+
+    def gate_report(self):
+        return self._fetch_report().get("gate")
+
+    def language_report(self):
+        return self._fetch_report().get("language")
+
+    def quality_report(self):
+        return self._fetch_report().get("quality")
+
+    def draft_report(self):
+        return self._fetch_report().get("draft")
+
+    def cache_report(self):
+        return self._fetch_report().get("cache")
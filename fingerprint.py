@@ -0,0 +1,240 @@
+import json
+import os
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+import numpy as np
+
+import metrics
+
+# Spectrogram for the peaks: 32 ms frames every 16 ms at 16 kHz, 125 Hz - 6.25 kHz.
+N_FFT = 512
+HOP = 256
+MIN_BIN = 4
+MAX_BIN = 200
+_WINDOW = np.hanning(N_FFT).astype(np.float32)
+
+
+def _max_filter(a, size, axis):
+    pad = [(0, 0)] * a.ndim
+    pad[axis] = (size // 2, size // 2)
+    padded = np.pad(a, pad, constant_values=-np.inf)
+    return np.lib.stride_tricks.sliding_window_view(padded, size, axis=axis).max(axis=-1)
+
+
+def peaks(audio, sample_rate=16000, peaks_per_second=20, floor_db=-70.0):
+    # Spectral peaks (frame, bin): local maxima over ~±80 ms and ±300 Hz, the strongest
+    # peaks_per_second of them. Landmarks like these survive level changes, mixing noise
+    # and codecs far better than the samples do.
+    if len(audio) < N_FFT:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+    frames = np.lib.stride_tricks.sliding_window_view(audio, N_FFT)[::HOP]
+    spectrum = np.abs(np.fft.rfft(frames * _WINDOW, axis=1))[:, MIN_BIN:MAX_BIN]
+    db = 20.0 * np.log10(spectrum + 1e-10)
+    # Rises in level rather than level: a held tone is a ridge whose maximum wanders
+    # with the noise, its onset is one sharp point.
+    # Against the loudest of the previous three frames, so noise flicker doesn't count.
+    before = _max_filter(np.pad(db, ((3, 0), (0, 0)), constant_values=np.inf)[:-1], 3, 0)[1:len(db) + 1]
+    rise = np.maximum(db - before, 0.0)
+    loud = db > max(floor_db, float(db.max()) - 40.0)
+    local = _max_filter(_max_filter(rise, 11, 0), 19, 1)
+    t, f = np.nonzero((rise == local) & (rise > 10.0) & loud)
+    keep = max(1, int(peaks_per_second * len(audio) / sample_rate))
+    if len(t) > keep:
+        strongest = np.argsort(rise[t, f])[::-1][:keep]
+        t, f = t[strongest], f[strongest]
+    order = np.lexsort((f, t))
+    return t[order].astype(np.int32), (f[order] + MIN_BIN).astype(np.int32)
+
+
+def fingerprint(audio, sample_rate=16000, fan_out=3, max_dt=63, max_df=63):
+    # Landmark hashes: each peak paired with the next fan_out peaks in a zone after it,
+    # hash = (bin1, bin2, frame delta) packed in 24 bits. Returns (hashes, anchor frames).
+    t, f = peaks(audio, sample_rate)
+    hashes, times = [], []
+    for i in range(len(t)):
+        paired = 0
+        for j in range(i + 1, len(t)):
+            dt = t[j] - t[i]
+            if dt > max_dt:
+                break
+            if dt == 0 or abs(f[j] - f[i]) > max_df:
+                continue
+            hashes.append((int(f[i]) << 15) | (int(f[j]) << 6) | int(dt))
+            times.append(int(t[i]))
+            paired += 1
+            if paired == fan_out:
+                break
+    return np.array(hashes, dtype=np.uint32), np.array(times, dtype=np.int32)
+
+
+def _neighbours(h):
+    f1, f2, dt = h >> 15, (h >> 6) & 0x1FF, h & 0x3F
+    return [((f1 + a) << 15) | ((f2 + b) << 6) | (dt + c)
+            for a in (-1, 0, 1) for b in (-1, 0, 1) for c in (-1, 0, 1) if 0 < dt + c < 64]
+
+
+class _Entry:
+    __slots__ = ("key", "hashes", "times", "duration", "segments", "language", "cost")
+
+    def __init__(self, key, hashes, times, duration, segments, language, cost):
+        self.key = key
+        self.hashes = hashes
+        self.times = times
+        self.duration = duration
+        # [(start, end, text, avg_logprob, no_speech_prob)] in window seconds.
+        self.segments = segments
+        self.language = language
+        # Decode seconds this entry stands for; what a hit saves.
+        self.cost = cost
+
+
+class ResultCache:
+    # Decoded windows keyed by audio fingerprint plus (model, task). A lookup
+    # votes over the (entry, time offset) pairs its hashes share with cached windows, so a
+    # repeat is found even when the window cut falls up to max_offset_seconds earlier or
+    # later; the cached segments come back shifted into the new window. A forced language
+    # only matches entries decoded in that language. LRU over
+    # max_entries. With path, entries are loaded at start and saved by save().
+    def __init__(self, max_entries=256, min_hashes=20, min_ratio=0.3, max_offset_seconds=0.5, path=None,
+                 sample_rate=16000):
+        self.max_entries = int(max_entries)
+        self.min_hashes = int(min_hashes)
+        self.min_ratio = float(min_ratio)
+        self.sample_rate = sample_rate
+        self.max_offset = int(round(max_offset_seconds * sample_rate / HOP))
+        self.path = path
+        self._entries = OrderedDict()
+        self._next_id = 0
+        # hash -> [(entry id, anchor frame)]
+        self._index = defaultdict(list)
+        self.lookups = 0
+        self.hits = 0
+        self.saved_seconds = 0.0
+        self.fingerprint_seconds = 0.0
+        registry = metrics.REGISTRY
+        self._c_lookups = registry.counter("result_cache_lookups_total", "Windows looked up in the fingerprint cache")
+        self._c_hits = registry.counter("result_cache_hits_total", "Windows answered from the fingerprint cache")
+        self._c_saved = registry.counter("result_cache_saved_seconds_total", "Decode seconds the cache hits stood for")
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def fingerprint(self, audio):
+        start = time.perf_counter()
+        result = fingerprint(audio, self.sample_rate)
+        self.fingerprint_seconds += time.perf_counter() - start
+        return result
+
+    def get(self, fp, key, duration, language=None):
+        # (segments, language) shifted into this window, or None.
+        hashes, times = fp
+        self.lookups += 1
+        self._c_lookups.inc()
+        if len(hashes) < self.min_hashes:
+            return None
+        votes = Counter()
+        index = self._index
+        for h, t in zip(hashes.tolist(), times.tolist()):
+            # Peaks move by a bin or a frame between takes of the same audio; each query
+            # hash also tries its neighbours and votes once per (entry, offset).
+            matched = set()
+            for variant in _neighbours(h):
+                for entry_id, cached_t in index.get(variant, ()):
+                    offset = cached_t - t
+                    if abs(offset) <= self.max_offset:
+                        matched.add((entry_id, offset))
+            votes.update(matched)
+        best, best_score = None, 0
+        for (entry_id, offset), _ in votes.most_common(8):
+            # Peaks land on neighbouring frames when the cut moves by a fraction of a hop.
+            score = sum(votes.get((entry_id, offset + d), 0) for d in (-1, 0, 1))
+            entry = self._entries[entry_id]
+            if entry.key == key and language in (None, entry.language) and score > best_score:
+                best, best_score = (entry_id, offset), score
+        if best is None or best_score < max(self.min_hashes, self.min_ratio * len(hashes)):
+            return None
+        entry_id, offset = best
+        entry = self._entries[entry_id]
+        shift = offset * HOP / self.sample_rate
+        if abs(entry.duration - duration) > self.max_offset * HOP / self.sample_rate + 0.05:
+            return None
+        self._entries.move_to_end(entry_id)
+        self.hits += 1
+        self.saved_seconds += entry.cost
+        self._c_hits.inc()
+        self._c_saved.inc(entry.cost)
+        segments = [
+            (min(max(start - shift, 0.0), duration), min(max(end - shift, 0.0), duration), text, logprob, no_speech)
+            for start, end, text, logprob, no_speech in entry.segments
+        ]
+        return segments, entry.language
+
+    def put(self, fp, key, duration, segments, language, cost):
+        hashes, times = fp
+        if len(hashes) < self.min_hashes:
+            return
+        self._add(_Entry(key, hashes, times, duration, segments, language, cost))
+        while len(self._entries) > self.max_entries:
+            self._evict()
+
+    def _add(self, entry):
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        for h, t in zip(entry.hashes.tolist(), entry.times.tolist()):
+            self._index[h].append((entry_id, t))
+
+    def _evict(self):
+        entry_id, entry = self._entries.popitem(last=False)
+        for h in set(entry.hashes.tolist()):
+            postings = [p for p in self._index[h] if p[0] != entry_id]
+            if postings:
+                self._index[h] = postings
+            else:
+                del self._index[h]
+
+    def save(self, path=None):
+        # One .npz: all hashes/times back to back plus the entries' metadata as JSON.
+        path = path or self.path
+        if not path:
+            return
+        entries = list(self._entries.values())
+        meta = [dict(key=list(e.key), duration=e.duration, segments=e.segments, language=e.language, cost=e.cost,
+                     n=len(e.hashes)) for e in entries]
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            hashes=np.concatenate([e.hashes for e in entries]) if entries else np.empty(0, dtype=np.uint32),
+            times=np.concatenate([e.times for e in entries]) if entries else np.empty(0, dtype=np.int32),
+            meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+        )
+        os.replace(tmp, path)
+
+    def _load(self, path):
+        try:
+            with np.load(path) as data:
+                meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+                hashes, times = data["hashes"], data["times"]
+        except Exception as e:
+            print(f"Result cache: could not load {path}: {e}")
+            return
+        # Oldest first, as saved; only the newest max_entries fit.
+        pos = 0
+        skip = max(len(meta) - self.max_entries, 0)
+        for i, m in enumerate(meta):
+            n = m["n"]
+            if i >= skip:
+                segments = [tuple(s) for s in m["segments"]]
+                self._add(_Entry(tuple(m["key"]), hashes[pos:pos + n].copy(), times[pos:pos + n].copy(),
+                                 m["duration"], segments, m["language"], m["cost"]))
+            pos += n
+
+    def report(self):
+        return dict(
+            entries=len(self._entries),
+            lookups=self.lookups,
+            hits=self.hits,
+            hit_rate=round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            saved_seconds=round(self.saved_seconds, 3),
+            fingerprint_seconds=round(self.fingerprint_seconds, 3),
+        )
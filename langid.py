@@ -0,0 +1,210 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+import metrics
+
+
+def supports_language_id(model):
+    return callable(getattr(model, "detect_language", None))
+
+
+def detect_language(model, audio):
+    # Encoder plus one language-token step (WhisperModel.detect_language); no decoding.
+    # Returns {language: probability}.
+    language, probability, all_probs = model.detect_language(audio)
+    return dict(all_probs) if all_probs else {language: probability}
+
+
+def speech_window(audio, sample_rate=16000, window_seconds=6.0, frame_ms=30, min_speech_seconds=1.5):
+    # The window_seconds stretch with the most speech-like frames (energy well above the
+    # quietest frames), or None if it holds less than min_speech_seconds of speech.
+    frame = int(sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return None
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    # Well above the quietest frames, or near the loudest if there is no quiet part at all.
+    threshold = max(-50.0, min(np.percentile(energy_db, 10) + 10.0, energy_db.max() - 3.0))
+    speech = (energy_db >= threshold).astype(np.int32)
+    width = min(n_frames, max(1, int(window_seconds * 1000 / frame_ms)))
+    counts = np.convolve(speech, np.ones(width, dtype=np.int32), mode="valid")
+    start = int(np.argmax(counts))
+    if counts[start] * frame_ms / 1000 < min_speech_seconds:
+        return None
+    return audio[start * frame:(start + width) * frame]
+
+
+class LanguagePosterior:
+    # Running posterior over languages. Each detection multiplies in its distribution
+    # (added in log space) after the previous evidence is flattened by `decay`, so old
+    # detections fade and a real switch wins after a couple of confident hits, while a
+    # single stray one does not. A language locks once its posterior reaches
+    # lock_threshold and stays locked until another one does. Mass a detection leaves
+    # unassigned goes to an "other" entry, so a lone 0.6 guess never reads as certain.
+    OTHER = "_other"
+
+    def __init__(self, lock_threshold=0.80, decay=0.7, floor=1e-4):
+        self.lock_threshold = float(lock_threshold)
+        self.decay = float(decay)
+        self.floor = float(floor)
+        self._log = {}
+        self.locked = None
+        self.updates = 0
+
+    def update(self, probs):
+        # probs: {language: probability} from one detection. Returns the locked language.
+        probs = {k: v for k, v in probs.items() if k and k != self.OTHER}
+        if not probs:
+            return self.locked
+        languages = set(self._log) | set(probs) | {self.OTHER}
+        # Languages the detector didn't list share whatever mass it left over.
+        missing = languages - set(probs)
+        rest = max(1.0 - sum(probs.values()), 0.0) / len(missing)
+        for language in languages:
+            p = probs.get(language, rest)
+            self._log[language] = self.decay * self._log.get(language, 0.0) + math.log(max(p, self.floor))
+        self.updates += 1
+        language, probability = self.best()
+        if probability >= self.lock_threshold:
+            self.locked = language
+        return self.locked
+
+    def posterior(self):
+        if not self._log:
+            return {}
+        top = max(self._log.values())
+        weights = {k: math.exp(v - top) for k, v in self._log.items()}
+        total = sum(weights.values())
+        return {k: w / total for k, w in weights.items()}
+
+    def best(self):
+        posterior = self.posterior()
+        posterior.pop(self.OTHER, None)
+        if not posterior:
+            return None, 0.0
+        language = max(posterior, key=posterior.get)
+        return language, posterior[language]
+
+
+class LanguageIdentifier:
+    # Language ID as its own stage: every interval_seconds of audio the transcriber offers
+    # its newest audio, the most speech-dense sub-window is copied out, and a background
+    # thread runs only the language-token pass on it (with the main model, or a separate
+    # small one) while the main decode goes on. Results feed a LanguagePosterior;
+    # on_lock(language, probability) fires whenever the locked language changes.
+    def __init__(
+        self,
+        model=None,
+        *,
+        load=None,
+        sample_rate=16000,
+        lock_threshold=0.80,
+        decay=0.7,
+        interval_seconds=4.0,
+        locked_interval_seconds=15.0,
+        window_seconds=6.0,
+        min_speech_seconds=1.5,
+        on_lock=None,
+    ):
+        # load() builds the model on the identifier thread (a separate LID model), so
+        # loading it never delays the main model.
+        self.model = model
+        self._load = load
+        self.sample_rate = sample_rate
+        self.posterior = LanguagePosterior(lock_threshold, decay)
+        self.interval = int(interval_seconds * sample_rate)
+        self.locked_interval = int(locked_interval_seconds * sample_rate)
+        self.window_seconds = float(window_seconds)
+        self.min_speech_seconds = float(min_speech_seconds)
+        self.on_lock = on_lock
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = None
+        self._next_at = 0
+        self.running = False
+        self.thread = None
+        self.detections = 0
+        self.skipped = 0
+        self.seconds = 0.0
+        self._h_seconds = metrics.REGISTRY.histogram("language_id_seconds", "Language-ID pass wall time")
+
+    @property
+    def locked(self):
+        return self.posterior.locked
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+        if self.thread:
+            self.thread.join()
+
+    def due(self, stream_pos):
+        # Cheap check the transcriber makes per chunk before handing over any audio.
+        return self.running and stream_pos >= self._next_at
+
+    def offer(self, audio, stream_pos):
+        # audio: the newest buffered samples (may be a view; only the chosen stretch is
+        # copied). Returns True if a detection was queued.
+        step = self.locked_interval if self.locked else self.interval
+        window = speech_window(audio, self.sample_rate, self.window_seconds, min_speech_seconds=self.min_speech_seconds)
+        if window is None:
+            # Not enough speech yet; look again after a short while.
+            self._next_at = stream_pos + self.sample_rate
+            return False
+        self._next_at = stream_pos + step
+        with self._lock:
+            if self._pending is not None:
+                self.skipped += 1
+            # Latest audio wins; a detection still waiting is simply replaced.
+            self._pending = np.array(window, dtype=np.float32)
+        self._wake.set()
+        return True
+
+    def observe(self, probs):
+        # Evidence from elsewhere (e.g. the detection transcribe() did on its own).
+        with self._lock:
+            before = self.posterior.locked
+            locked = self.posterior.update(probs)
+        self._notify(before, locked)
+
+    def _run(self):
+        if self.model is None:
+            try:
+                self.model = self._load()
+            except Exception as e:
+                print(f"Could not load the language-ID model: {e}")
+                self.running = False
+                return
+        while self.running:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                audio, self._pending = self._pending, None
+            if audio is None:
+                continue
+            start = time.perf_counter()
+            try:
+                probs = detect_language(self.model, audio)
+            except Exception as e:
+                print(f"Language ID failed: {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            self.detections += 1
+            self.seconds += elapsed
+            self._h_seconds.observe(elapsed)
+            self.observe(probs)
+
+    def _notify(self, before, locked):
+        if locked != before and self.on_lock:
+            self.on_lock(locked, self.posterior.posterior().get(locked, 0.0))
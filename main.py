@@ -1,9 +1,14 @@
 import sys
 import os
 import time
-import threading
+
+# Startup timings are measured from here (or from the launcher's timestamp, if given).
+LAUNCHED_AT = float(os.environ.get("CAPTIONS_LAUNCH_TS", time.time()))
+
+import json
+import argparse
 from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtCore import QObject, Qt, QTimer, pyqtSignal
 
 # Add NVIDIA library paths for Windows
 def setup_nvidia_paths():
@@ -23,63 +28,404 @@ def setup_nvidia_paths():
 setup_nvidia_paths()
 
 from ui import CaptionWindow
-from audio import AudioCapture
+from audio import AudioCapture, MicrophoneCapture
+from sources import FileSource, PipeSource, SyntheticSource
 from transcriber import AudioTranscriber
+from engine import RemoteTranscriber
+from scheduler import InferenceScheduler
+from store import TranscriptStore
+from broadcast import CaptionBroadcaster
+import metrics
 
 class Worker(QObject):
     text_updated = pyqtSignal(str)
+    caption_updated = pyqtSignal(object)
+    state_changed = pyqtSignal(str, str)
 
-    def __init__(self):
+    def __init__(self, source=None, model_size="large-v3", device="cuda", compute_type="float16", engine="thread",
+                 engine_options=None, **transcriber_options):
         super().__init__()
-        self.audio_capture = AudioCapture()
+        # Any audio.AudioSource works here; default is WASAPI loopback of the speakers.
+        self.audio_capture = source if source is not None else AudioCapture()
+        if not self.audio_capture.realtime:
+            # Unpaced sources wait for the decoder (back-pressure), so there is no live edge to lag behind.
+            transcriber_options.setdefault("max_lag_seconds", None)
         # Using 'cuda' for NVIDIA GPU. If it fails, transcriber handles fallback.
         # Changed model to 'large-v3' for best accuracy
-        self.transcriber = AudioTranscriber(model_size="large-v3", device="cuda", compute_type="float16")
+        # Construction is instant; the model loads on the transcriber thread after start().
+        # engine="process" runs the transcriber in a worker process instead (engine.py),
+        # so inference never competes with capture and the UI for this interpreter.
+        self.engine = engine
+        if engine == "process":
+            self.transcriber = RemoteTranscriber(model_size=model_size, device=device, compute_type=compute_type,
+                                                 **(engine_options or {}), **transcriber_options)
+        else:
+            self.transcriber = AudioTranscriber(model_size=model_size, device=device, compute_type=compute_type, **transcriber_options)
         self.running = False
 
     def start(self):
+        # Capture starts right away; audio waits in the transcriber queue while the model loads.
+        # The source writes into that queue directly from its capture thread/callback.
         self.running = True
-        self.transcriber.start(self.handle_transcription)
+        self.audio_capture.connect(self.transcriber.audio_queue)
+        self.transcriber.start(self.handle_transcription, self.handle_caption, self.handle_state)
         self.audio_capture.start()
-        
-        self.bridge_thread = threading.Thread(target=self._bridge_audio)
-        self.bridge_thread.daemon = True
-        self.bridge_thread.start()
-
-    def _bridge_audio(self):
-        while self.running:
-            chunk = self.audio_capture.get_audio_chunk()
-            if chunk is not None:
-                self.transcriber.add_audio(chunk)
-            else:
-                time.sleep(0.01)
 
     def handle_transcription(self, text):
         self.text_updated.emit(text)
 
+    def handle_caption(self, caption):
+        self.caption_updated.emit(caption)
+
+    def handle_state(self, state, detail):
+        self.state_changed.emit(state, detail)
+
+    def finish(self, timeout=None):
+        # For finite sources: wait for the source to end, then let the transcriber decode
+        # whatever is left in its queue and buffer.
+        self.audio_capture.finished.wait(timeout)
+        self.running = False
+        return self.transcriber.finish(timeout)
+
     def stop(self):
         self.running = False
-        self.audio_capture.stop()
+        # Transcriber first: closing its queue releases a source blocked on back-pressure.
         self.transcriber.stop()
+        self.audio_capture.stop()
+        if self.engine == "process":
+            self.transcriber.close()
+
+class MultiWorker(QObject):
+    # Several sources (loopback, microphone, app streams) captioned by one shared model.
+    # Each source gets its own AudioTranscriber (buffer, VAD gate, language lock) whose
+    # model is a scheduler client; the InferenceScheduler owns the only model instance.
+    # Captions carry their source name; text_updated gets it as a "[name] " prefix.
+    text_updated = pyqtSignal(str)
+    caption_updated = pyqtSignal(object)
+    state_changed = pyqtSignal(str, str)
+
+    # Options that would give every source a model of its own; the scheduler runs one only.
+    UNSHARED_OPTIONS = dict(
+        adaptive_quality="the ladder swaps a transcriber's own model",
+        quality_options="they configure the adaptive quality ladder",
+        language_id_model="it would be loaded once per source; the shared model detects languages",
+        draft_model="it would be loaded once per source",
+        draft_interval="it paces the draft model",
+        draft_skip_logprob="it tunes the draft model",
+    )
+
+    def __init__(self, sources, model_size="large-v3", device="cuda", compute_type="float16", scheduler_options=None,
+                 model=None, batched_model=None, model_factory=None, **transcriber_options):
+        super().__init__()
+        for name, reason in self.UNSHARED_OPTIONS.items():
+            if transcriber_options.pop(name, None) not in (None, False, {}):
+                print(f"{name} is not available with several sources ({reason}); ignoring it")
+        self.sources = dict(sources)
+        self.scheduler = InferenceScheduler(
+            model_size, device, compute_type, model=model, batched_model=batched_model, model_factory=model_factory,
+            warmup_decode=transcriber_options.pop("warmup_decode", True),
+            cpu_profile=transcriber_options.pop("cpu_profile", None), **(scheduler_options or {}),
+        )
+        self.transcribers = {}
+        for name, source in self.sources.items():
+            options = dict(transcriber_options)
+            if not source.realtime:
+                options.setdefault("max_lag_seconds", None)
+            self.transcribers[name] = AudioTranscriber(model_size, device, compute_type, model=self.scheduler.client(name),
+                                                       warmup_decode=False, source_name=name, **options)
+        # The first source stands in for the single-source attributes (startup report).
+        self.transcriber = next(iter(self.transcribers.values()))
+        self.audio_capture = next(iter(self.sources.values()))
+        self.running = False
+
+    def start(self):
+        self.running = True
+        self.scheduler.start(self.handle_state)
+        for name, source in self.sources.items():
+            transcriber = self.transcribers[name]
+            source.connect(transcriber.audio_queue)
+            transcriber.start(None, self.handle_caption)
+            source.start()
+
+    def handle_caption(self, caption):
+        if caption.final and caption.text:
+            self.text_updated.emit(f"[{caption.source}] {caption.text}")
+        self.caption_updated.emit(caption)
+
+    def handle_state(self, state, detail):
+        self.state_changed.emit(state, detail)
+
+    def finish(self, timeout=None):
+        for source in self.sources.values():
+            source.finished.wait(timeout)
+        self.running = False
+        return all([transcriber.finish(timeout) for transcriber in self.transcribers.values()])
+
+    def stop(self):
+        self.running = False
+        for transcriber in self.transcribers.values():
+            transcriber.running = False
+        # Fails requests still waiting for the model, so no transcriber stays blocked on it.
+        self.scheduler.stop()
+        for transcriber in self.transcribers.values():
+            transcriber.stop()
+        for source in self.sources.values():
+            source.stop()
+
+def build_source(args):
+    if args.input == "-":
+        return PipeSource(rate=args.rate, channels=args.channels, realtime=args.realtime)
+    if args.input:
+        return FileSource(args.input, realtime=args.realtime, raw_rate=args.rate, raw_channels=args.channels)
+    if args.synthetic:
+        return SyntheticSource(args.synthetic, seconds=args.seconds, realtime=args.realtime)
+    return None
+
+def build_extra_source(spec, args):
+    # --add-source NAME=SPEC: "mic", "loopback", "synthetic:KIND" or a WAV/raw file.
+    if spec == "mic":
+        return MicrophoneCapture()
+    if spec == "loopback":
+        return AudioCapture()
+    if spec.startswith("synthetic:"):
+        return SyntheticSource(spec.split(":", 1)[1], seconds=args.seconds, realtime=args.realtime)
+    return FileSource(spec, realtime=args.realtime, raw_rate=args.rate, raw_channels=args.channels)
+
+def build_sources(args, primary):
+    # Named sources for MultiWorker; the main source is "desktop" (loopback) or "input".
+    sources = {("desktop" if primary is None else "input"): primary if primary is not None else AudioCapture()}
+    for item in args.add_source:
+        name, sep, spec = item.partition("=")
+        if not sep or not name or name in sources:
+            raise SystemExit(f"--add-source expects a new NAME=SPEC, got {item!r}")
+        sources[name] = build_extra_source(spec, args)
+    return sources
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Live captions for desktop audio.")
+    parser.add_argument("--input", help="WAV or raw s16le file to caption instead of loopback ('-' for stdin/FIFO)")
+    parser.add_argument("--synthetic", choices=["speech", "sine", "noise", "silence"], help="use a generated source")
+    parser.add_argument("--seconds", type=float, help="length of the synthetic source (default: endless)")
+    parser.add_argument("--rate", type=int, default=16000, help="sample rate of raw/pipe input")
+    parser.add_argument("--channels", type=int, default=1, help="channel count of raw/pipe input")
+    parser.add_argument("--no-realtime", dest="realtime", action="store_false", help="feed file/pipe/synthetic audio as fast as possible")
+    parser.add_argument("--headless", action="store_true", help="print captions to stdout instead of showing the overlay")
+    parser.add_argument("--streaming", action="store_true", help="rolling-window decoding with partial/final captions")
+    parser.add_argument("--segment-captions", action="store_true",
+                        help="show each segment as soon as it decodes instead of one caption per window")
+    parser.add_argument("--draft-model", help="small model (e.g. base) whose draft of each window shows first; "
+                                              "--model refines it")
+    parser.add_argument("--draft-interval", type=float, default=1.0, help="seconds of new audio per draft decode")
+    parser.add_argument("--draft-skip-logprob", type=float, default=-0.25,
+                        help="keep the draft and skip the refinement when all its segments reach this avg_logprob")
+    parser.add_argument("--result-cache", action="store_true",
+                        help="fingerprint each window and replay cached text for repeated audio (ads, intros, hold music)")
+    parser.add_argument("--result-cache-file", help="with --result-cache, keep the cache in this .npz across runs")
+    parser.add_argument("--vad-gate", action="store_true", help="drop silence before the model and cut windows at speech endpoints")
+    parser.add_argument("--silero", action="store_true", help="with --vad-gate, confirm each window with Silero before decoding")
+    parser.add_argument("--overload", choices=["drop_oldest", "skip_silence", "summary"], default="drop_oldest",
+                        help="what to do when decoding falls more than --max-lag seconds behind live audio")
+    parser.add_argument("--max-lag", type=float, default=20.0, help="maximum caption lag in seconds for live sources")
+    parser.add_argument("--adaptive-quality", action="store_true",
+                        help="step down beam/model/compute type when decoding falls behind, back up when it catches up")
+    parser.add_argument("--quality-floor", default="small", help="smallest model the adaptive ladder may use")
+    parser.add_argument("--preload-models", action="store_true", help="load every ladder model up front instead of on demand")
+    parser.add_argument("--no-language-id", dest="language_id", action="store_false",
+                        help="detect the language inside transcribe() (warm-up window, periodic re-detection) instead")
+    parser.add_argument("--language-id-model", help="separate (smaller) model for language ID, e.g. tiny")
+    parser.add_argument("--engine", choices=["thread", "process"], default="thread",
+                        help="run inference on a thread of this process or in a restartable worker process")
+    parser.add_argument("--add-source", action="append", default=[], metavar="NAME=SPEC",
+                        help="caption another source with the same model: mic, loopback, synthetic:KIND or a file "
+                             "(repeatable; captions are labeled by NAME)")
+    parser.add_argument("--store", metavar="DIR",
+                        help="append every final caption to a searchable transcript store in DIR (see store.py)")
+    parser.add_argument("--broadcast-port", type=int,
+                        help="serve captions to WebSocket/SSE clients and a browser overlay on 127.0.0.1:PORT")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on 127.0.0.1:PORT")
+    parser.add_argument("--metrics-log", help="append a JSON metrics snapshot to this file periodically")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="seconds between --metrics-log snapshots")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print startup timings as JSON to stderr after the first caption and exit")
+    parser.add_argument("--cpu-profile", metavar="FILE",
+                        help="on CPU, use the settings autotune.py saved in FILE (default: this host's profile, if any)")
+    parser.add_argument("--no-cpu-profile", action="store_true", help="on CPU, ignore any autotune.py profile")
+    parser.add_argument("--model", default="large-v3")
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--compute-type", default="float16")
+    return parser.parse_args(argv)
+
+class StartupTimer:
+    # Seconds from launch to each startup milestone; reported once the first caption shows.
+    def __init__(self):
+        self.marks = {}
+
+    def mark(self, name):
+        self.marks.setdefault(name, round(time.time() - LAUNCHED_AT, 3))
+
+    def report(self, transcriber):
+        model = {k: round(v, 3) for k, v in transcriber.timings.items()}
+        return json.dumps(dict(startup=self.marks, transcriber=model))
+
+def run_headless(worker, on_first_caption=None):
+    # DirectConnection: captions are printed on the transcriber thread, no Qt event loop needed.
+    worker.text_updated.connect(lambda text: print(text, flush=True), Qt.ConnectionType.DirectConnection)
+    if on_first_caption:
+        worker.text_updated.connect(on_first_caption, Qt.ConnectionType.DirectConnection)
+    worker.start()
+    try:
+        worker.finish()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.stop()
+        transcribers = getattr(worker, "transcribers", None) or {None: worker.transcriber}
+        for name, transcriber in transcribers.items():
+            prefix = f"[{name}] " if name else ""
+            print(f"{prefix}Backlog: {transcriber.backlog_report()}", file=sys.stderr)
+            report = transcriber.gate_report()
+            if report:
+                print(f"{prefix}VAD gate: {report}", file=sys.stderr)
+            report = transcriber.language_report()
+            if report:
+                print(f"{prefix}Language ID: {report}", file=sys.stderr)
+            report = transcriber.quality_report()
+            if report:
+                print(f"{prefix}Quality: {report}", file=sys.stderr)
+            report = transcriber.draft_report()
+            if report:
+                print(f"{prefix}Draft: {report}", file=sys.stderr)
+            report = transcriber.cache_report()
+            if report:
+                print(f"{prefix}Result cache: {report}", file=sys.stderr)
+        if hasattr(worker, "scheduler"):
+            print(f"Scheduler: {worker.scheduler.report()}", file=sys.stderr)
+
+def start_metrics(args):
+    # Optional exporters; the registry itself is always on and costs nothing to read.
+    exporters = []
+    if args.metrics_port:
+        server = metrics.serve(args.metrics_port)
+        exporters.append(server.shutdown)
+        print(f"Metrics on http://127.0.0.1:{args.metrics_port}/metrics", file=sys.stderr)
+    if args.metrics_log:
+        logger = metrics.JsonLinesLogger(args.metrics_log, args.metrics_interval)
+        logger.start()
+        exporters.append(logger.stop)
+    return exporters
 
 def main():
+    run(parse_args())
+
+def run(args, model=None):
+    # model: optional preloaded or stand-in model (benchmarks); otherwise args.model is loaded
+    # in the background after the window is up.
+    startup = StartupTimer()
+    source = build_source(args)
+    exporters = start_metrics(args)
+    options = dict(streaming=args.streaming, segment_captions=args.segment_captions, vad_gate=args.vad_gate,
+                   overload_policy=args.overload, language_id=args.language_id, language_id_model=args.language_id_model)
+    if source is None or source.realtime:
+        options["max_lag_seconds"] = args.max_lag
+    if args.adaptive_quality:
+        options["adaptive_quality"] = True
+        options["quality_options"] = dict(floor=args.quality_floor, preload=args.preload_models)
+    if args.draft_model:
+        options.update(draft_model=args.draft_model, draft_interval=args.draft_interval,
+                       draft_skip_logprob=args.draft_skip_logprob)
+    if args.result_cache:
+        options["result_cache"] = True
+        options["result_cache_options"] = dict(path=args.result_cache_file)
+    if args.cpu_profile or args.no_cpu_profile:
+        options["cpu_profile"] = False if args.no_cpu_profile else args.cpu_profile
+    if args.vad_gate and args.silero:
+        options["vad_options"] = dict(use_silero=True)
+    if model is not None:
+        options["model"] = model
+    if args.add_source:
+        if args.engine == "process":
+            print("--engine process runs one source; several sources share a model in this process")
+        sources = build_sources(args, source)
+    else:
+        options["engine"] = args.engine
+
+    store = TranscriptStore(args.store) if args.store else None
+    if store is not None:
+        # Closed with the exporters, after the worker has stopped emitting.
+        exporters.append(store.close)
+    broadcaster = CaptionBroadcaster(args.broadcast_port).start() if args.broadcast_port else None
+    if broadcaster is not None:
+        exporters.append(broadcaster.stop)
+        print(f"Captions on http://127.0.0.1:{broadcaster.port}/ (WebSocket, SSE at /events)", file=sys.stderr)
+
+    def make_worker():
+        if args.add_source:
+            worker = MultiWorker(sources, args.model, args.device, args.compute_type, **options)
+        else:
+            worker = Worker(source, args.model, args.device, args.compute_type, **options)
+        if store is not None:
+            # On the transcriber thread; add() only queues for the store's writer thread.
+            worker.caption_updated.connect(store.add, Qt.ConnectionType.DirectConnection)
+        if broadcaster is not None:
+            # Likewise: publish() only schedules the fan-out on the server's loop.
+            worker.caption_updated.connect(broadcaster.publish, Qt.ConnectionType.DirectConnection)
+        return worker
+
+    if args.headless:
+        worker = make_worker()
+
+        def first_caption(_):
+            if "first_caption" in startup.marks:
+                return
+            startup.mark("first_caption")
+            if args.startup_report:
+                print(startup.report(worker.transcriber), file=sys.stderr, flush=True)
+                worker.audio_capture.stop()
+
+        try:
+            run_headless(worker, first_caption)
+        finally:
+            for stop in exporters:
+                stop()
+        return
+
     app = QApplication(sys.argv)
     
     # UI
     window = CaptionWindow()
     window.show()
+    # Fires on the first event-loop pass, i.e. once the window has actually been shown.
+    QTimer.singleShot(0, lambda: startup.mark("window_visible"))
 
     # Logic
-    worker = Worker()
-    worker.text_updated.connect(window.update_text)
+    worker = make_worker()
+    worker.state_changed.connect(window.set_status)
+    if args.streaming:
+        worker.caption_updated.connect(window.update_caption)
+    else:
+        worker.caption_updated.connect(window.show_final)
+
+    def first_caption(caption):
+        # Queued to the GUI thread, so this runs after the window has the text.
+        if caption.final and "first_caption" not in startup.marks:
+            startup.mark("first_caption")
+            if args.startup_report:
+                print(startup.report(worker.transcriber), file=sys.stderr, flush=True)
+                app.quit()
+
+    worker.caption_updated.connect(first_caption)
     worker.start()
 
     try:
-        sys.exit(app.exec())
+        code = app.exec()
+        if not args.startup_report:
+            sys.exit(code)
     except KeyboardInterrupt:
         pass
     finally:
         worker.stop()
+        for stop in exporters:
+            stop()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,291 @@
+import bisect
+import json
+import threading
+import time
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) covering capture callbacks up to slow CPU decodes.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0)
+RATIO_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 4.0)
+DEPTH_BUCKETS = (0.0, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 40.0, 60.0)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    # Either set() explicitly or read from a function at collection time, which keeps
+    # sampling (queue depths, ring fill) entirely off the audio path. Per-instance readings
+    # are added with an owner: fn(owner) is read for every owner still alive and combined
+    # (summed by default), so several pipelines in one process each count, and the gauge
+    # holds them only weakly.
+    kind = "gauge"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self._value = 0.0
+        self._fn = None
+        self._owners = []
+        self._combine = sum
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, fn):
+        self._fn = fn
+
+    def add_owner(self, owner, fn, combine=sum):
+        with self._lock:
+            self._owners.append((weakref.ref(owner), fn))
+            self._combine = combine
+
+    @property
+    def computed(self):
+        return self._fn is not None or bool(self._owners)
+
+    @property
+    def value(self):
+        if self._owners:
+            with self._lock:
+                self._owners = [(ref, fn) for ref, fn in self._owners if ref() is not None]
+                owners = [(ref(), fn) for ref, fn in self._owners]
+            try:
+                return float(self._combine([fn(owner) for owner, fn in owners if owner is not None] or [0.0]))
+            except Exception:
+                return float("nan")
+        if self._fn is not None:
+            try:
+                return float(self._fn())
+            except Exception:
+                return float("nan")
+        return self._value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help="", buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket holding the q-th observation.
+        with self._lock:
+            counts, total, top = list(self.counts), self.count, self.max
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, c in enumerate(counts):
+            if c and seen + c >= rank:
+                lo = self.bounds[i - 1] if i > 0 else 0.0
+                hi = self.bounds[i] if i < len(self.bounds) else top
+                return min(lo + (hi - lo) * (rank - seen) / c, top)
+            seen += c
+        return top
+
+    def summary(self):
+        return dict(
+            count=self.count,
+            mean=self.sum / self.count if self.count else 0.0,
+            p50=self.quantile(0.5),
+            p95=self.quantile(0.95),
+            p99=self.quantile(0.99),
+            max=self.max,
+        )
+
+
+class Registry:
+    # Get-or-create by name, so every component can declare what it records and several
+    # pipelines in one process share the same series.
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help=""):
+        return self._get(Counter, name, help)
+
+    def gauge(self, name, help="", fn=None, owner=None, combine=sum):
+        # With an owner, fn(owner) is one instance's reading (see Gauge.add_owner); fn
+        # should not close over the owner, or the gauge keeps it alive.
+        gauge = self._get(Gauge, name, help)
+        if owner is not None:
+            gauge.add_owner(owner, fn, combine)
+        elif fn is not None:
+            gauge.set_function(fn)
+        return gauge
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, buckets)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self):
+        snap = dict(ts=time.time(), counters={}, gauges={}, histograms={})
+        for metric in self.metrics():
+            if metric.kind == "histogram":
+                snap["histograms"][metric.name] = metric.summary()
+            else:
+                snap[metric.kind + "s"][metric.name] = metric.value
+        return snap
+
+    def state(self):
+        # Raw cumulative values, for shipping to another process's registry via merge().
+        state = dict(counters={}, gauges={}, histograms={})
+        for metric in self.metrics():
+            if metric.kind == "histogram":
+                with metric._lock:
+                    state["histograms"][metric.name] = dict(
+                        help=metric.help, bounds=metric.bounds, counts=list(metric.counts),
+                        count=metric.count, sum=metric.sum, max=metric.max,
+                    )
+            else:
+                state[metric.kind + "s"][metric.name] = dict(help=metric.help, value=metric.value)
+        return state
+
+    def merge(self, state, previous=None):
+        # Fold in a state() from another process. Counters and histograms add what changed
+        # since `previous` (the last state merged from the same process, None for a fresh
+        # one), so totals survive that process being replaced; gauges take the latest value
+        # unless this process computes them itself.
+        previous = previous or dict(counters={}, histograms={})
+        for name, entry in state["counters"].items():
+            old = previous["counters"].get(name)
+            self.counter(name, entry["help"]).inc(entry["value"] - (old["value"] if old else 0))
+        for name, entry in state["gauges"].items():
+            gauge = self.gauge(name, entry["help"])
+            if not gauge.computed:
+                gauge.set(entry["value"])
+        for name, entry in state["histograms"].items():
+            metric = self.histogram(name, entry["help"], entry["bounds"])
+            if metric.bounds != tuple(entry["bounds"]):
+                continue
+            old = previous["histograms"].get(name)
+            with metric._lock:
+                for i, c in enumerate(entry["counts"]):
+                    metric.counts[i] += c - (old["counts"][i] if old else 0)
+                metric.count += entry["count"] - (old["count"] if old else 0)
+                metric.sum += entry["sum"] - (old["sum"] if old else 0.0)
+                metric.max = max(metric.max, entry["max"])
+
+    def to_prometheus(self):
+        lines = []
+        for metric in sorted(self.metrics(), key=lambda m: m.name):
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name} {metric.value}")
+                continue
+            with metric._lock:
+                counts, total, sum_ = list(metric.counts), metric.count, metric.sum
+            cumulative = 0
+            for bound, c in zip(metric.bounds, counts):
+                cumulative += c
+                lines.append(f'{metric.name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric.name}_bucket{{le="+Inf"}} {total}')
+            lines.append(f"{metric.name}_sum {sum_}")
+            lines.append(f"{metric.name}_count {total}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the pipeline components.
+REGISTRY = Registry()
+
+
+class JsonLinesLogger:
+    # Appends one registry snapshot per interval to a JSON-lines file.
+    def __init__(self, path, interval=10.0, registry=REGISTRY):
+        self.path = path
+        self.interval = float(interval)
+        self.registry = registry
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
+        # Final snapshot so short runs still leave a record.
+        self.write()
+
+    def write(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.registry.snapshot()) + "\n")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except Exception as e:
+                print(f"Error writing metrics to {self.path}: {e}")
+
+
+def serve(port=9464, host="127.0.0.1", registry=REGISTRY):
+    # Prometheus text-format endpoint on a daemon thread; returns the server (shutdown() to stop).
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
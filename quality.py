@@ -0,0 +1,219 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+# Whisper sizes below "large", from most to least accurate.
+SMALLER_MODELS = ("medium", "small", "base", "tiny")
+
+# Compute types CTranslate2 can't run on CPU, and what a CPU rung uses instead.
+_CPU_COMPUTE = {"float16": "int8", "int8_float16": "int8", "bfloat16": "int8", "int8_bfloat16": "int8"}
+
+
+@dataclass(frozen=True)
+class QualityLevel:
+    # One rung of the quality ladder: the model to decode with and how hard to search.
+    model_size: str
+    compute_type: str
+    beam_size: int = 1
+    best_of: int = 1
+
+    @property
+    def model_key(self):
+        return (self.model_size, self.compute_type)
+
+    def __str__(self):
+        return f"{self.model_size}/{self.compute_type}/beam{self.beam_size}"
+
+
+def build_ladder(model_size, compute_type, beam_size=3, best_of=1, floor="small"):
+    # Cheapest trade first: beam search -> greedy, then smaller models down to `floor`,
+    # then int8 weights on the smallest one. Rung 0 is the configured setting.
+    ladder = [QualityLevel(model_size, compute_type, beam_size, best_of)]
+    if beam_size > 1 or best_of > 1:
+        ladder.append(QualityLevel(model_size, compute_type))
+    if model_size.startswith("large"):
+        smaller = SMALLER_MODELS
+    elif model_size in SMALLER_MODELS:
+        smaller = SMALLER_MODELS[SMALLER_MODELS.index(model_size) + 1:]
+    else:
+        # distil-*, *.en and local paths: no known smaller sibling.
+        smaller = ()
+    if floor in smaller:
+        smaller = smaller[:smaller.index(floor) + 1]
+    elif floor in SMALLER_MODELS:
+        smaller = ()
+    ladder += [QualityLevel(size, compute_type) for size in smaller]
+    if compute_type != "int8":
+        ladder.append(QualityLevel(ladder[-1].model_size, "int8"))
+    return ladder
+
+
+def for_device(ladder, device):
+    # On CPU the float16 rungs load as int8 anyway; map them and drop the duplicates.
+    if device != "cpu":
+        return list(ladder)
+    mapped = []
+    for level in ladder:
+        compute_type = _CPU_COMPUTE.get(level.compute_type, level.compute_type)
+        level = QualityLevel(level.model_size, compute_type, level.beam_size, level.best_of)
+        if level not in mapped:
+            mapped.append(level)
+    return mapped
+
+
+class QualityController:
+    # Walks the ladder from a moving real-time factor (decode seconds per audio second
+    # over the last window_seconds) and the transcriber's lag. One rung down as soon as
+    # decoding can't keep up; one rung up only after headroom has held for hold_seconds.
+    # An up-step that has to be undone within two holds doubles the hold (up to
+    # max_hold_seconds), so a host hovering at the limit doesn't flap between rungs.
+    def __init__(
+        self,
+        ladder,
+        *,
+        window_seconds=20.0,
+        down_rtf=0.85,
+        up_rtf=0.45,
+        down_lag_seconds=8.0,
+        up_lag_seconds=3.0,
+        min_dwell_seconds=5.0,
+        hold_seconds=20.0,
+        max_hold_seconds=160.0,
+        min_audio_seconds=3.0,
+        clock=time.monotonic,
+    ):
+        if not ladder:
+            raise ValueError("Quality ladder is empty")
+        self.ladder = list(ladder)
+        self.index = 0
+        self.window_seconds = float(window_seconds)
+        self.down_rtf = float(down_rtf)
+        self.up_rtf = float(up_rtf)
+        self.down_lag_seconds = float(down_lag_seconds)
+        self.up_lag_seconds = float(up_lag_seconds)
+        self.min_dwell_seconds = float(min_dwell_seconds)
+        self.hold_seconds = float(hold_seconds)
+        self.max_hold_seconds = float(max_hold_seconds)
+        self.min_audio_seconds = float(min_audio_seconds)
+        self.clock = clock
+
+        # (time, decode seconds, audio seconds) per decode since the last change.
+        self._decodes = deque()
+        self._changed_at = clock()
+        self._last_up_at = None
+        self._headroom_since = None
+        # (time, from, to, reason) for every move.
+        self.changes = []
+
+    @property
+    def level(self):
+        return self.ladder[self.index]
+
+    @property
+    def rtf(self):
+        # None until the current rung has decoded enough audio to judge it.
+        audio = sum(d[2] for d in self._decodes)
+        if audio < self.min_audio_seconds:
+            return None
+        return sum(d[1] for d in self._decodes) / audio
+
+    def observe(self, decode_seconds, audio_seconds, lag_seconds):
+        # Record one decode; returns the new QualityLevel when the rung changes, else None.
+        now = self.clock()
+        self._decodes.append((now, decode_seconds, audio_seconds))
+        while self._decodes and now - self._decodes[0][0] > self.window_seconds:
+            self._decodes.popleft()
+
+        if now - self._changed_at < self.min_dwell_seconds:
+            return None
+        rtf = self.rtf
+        behind = lag_seconds > self.down_lag_seconds
+        if (behind or (rtf is not None and rtf > self.down_rtf)) and self.index < len(self.ladder) - 1:
+            self._headroom_since = None
+            if self._last_up_at is not None and now - self._last_up_at < 2 * self.hold_seconds:
+                self.hold_seconds = min(self.hold_seconds * 2, self.max_hold_seconds)
+            reason = f"lag {lag_seconds:.1f}s" if behind else f"rtf {rtf:.2f}"
+            return self._move(self.index + 1, now, reason)
+
+        if rtf is not None and rtf < self.up_rtf and lag_seconds < self.up_lag_seconds and self.index > 0:
+            if self._headroom_since is None:
+                self._headroom_since = now
+            elif now - self._headroom_since >= self.hold_seconds:
+                self._last_up_at = now
+                return self._move(self.index - 1, now, f"rtf {rtf:.2f}")
+        else:
+            self._headroom_since = None
+        return None
+
+    def discard(self, model_key):
+        # Drop the rungs using a model that failed to load (never rung 0, which is loaded)
+        # and settle on the nearest cheaper surviving rung, else the nearest better one.
+        keep = [i for i, level in enumerate(self.ladder) if i == 0 or level.model_key != model_key]
+        cheaper = [i for i in keep if i >= self.index]
+        index = cheaper[0] if cheaper else keep[-1]
+        self.ladder = [self.ladder[i] for i in keep]
+        self.index = keep.index(index)
+        self._decodes.clear()
+        return self.level
+
+    def _move(self, index, now, reason):
+        old = self.level
+        self.index = index
+        self.changes.append((now, old, self.level, reason))
+        self._changed_at = now
+        self._headroom_since = None
+        # Measurements from the old rung say nothing about the new one.
+        self._decodes.clear()
+        return self.level
+
+
+class ModelCache:
+    # Ladder models by (model_size, compute_type), loaded on background threads so a
+    # swap never blocks decoding. Loaded models are kept, so stepping back up is instant.
+    def __init__(self, load):
+        self._load = load
+        self._models = {}
+        self._loading = set()
+        self.failed = {}
+        self.load_seconds = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, model):
+        with self._lock:
+            self._models[key] = model
+
+    def get(self, key):
+        return self._models.get(key)
+
+    def key_of(self, model):
+        with self._lock:
+            return next((key for key, loaded in self._models.items() if loaded is model), None)
+
+    @property
+    def loading(self):
+        return bool(self._loading)
+
+    def request(self, key):
+        with self._lock:
+            if key in self._models or key in self._loading or key in self.failed:
+                return
+            self._loading.add(key)
+        thread = threading.Thread(target=self._run, args=(key,))
+        thread.daemon = True
+        thread.start()
+
+    def _run(self, key):
+        start = time.perf_counter()
+        try:
+            model = self._load(*key)
+        except Exception as e:
+            print(f"Could not load {key[0]} ({key[1]}): {e}")
+            with self._lock:
+                self.failed[key] = e
+                self._loading.discard(key)
+            return
+        with self._lock:
+            self._models[key] = model
+            self.load_seconds[key] = time.perf_counter() - start
+            self._loading.discard(key)
@@ -0,0 +1,131 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+@lru_cache(maxsize=None)
+def design_filter_bank(in_rate, out_rate, zero_crossings=16, beta=8.6, rolloff=0.9):
+    # Kaiser-windowed sinc low-pass split into `up` polyphase branches. Computed once per
+    # (device rate, target rate) pair and shared by every stream at that rate.
+    g = math.gcd(int(in_rate), int(out_rate))
+    up = int(out_rate) // g
+    down = int(in_rate) // g
+    taps = int(math.ceil(2 * zero_crossings * max(up, down) / up))
+    n = taps * up
+
+    # Cutoff sits below the lower of the two Nyquist rates, in cycles per upsampled sample.
+    cutoff = rolloff * 0.5 / max(up, down)
+    m = np.arange(n) - (n - 1) / 2.0
+    proto = 2 * cutoff * np.sinc(2 * cutoff * m) * np.kaiser(n, beta)
+    # Unity DC gain after zero-stuffing by `up`.
+    proto *= up / proto.sum()
+
+    # bank[p, k] multiplies x[i - k] for output phase p; stored reversed so it lines up
+    # with a forward sliding window over the input history.
+    bank = proto.reshape(taps, up).T[:, ::-1]
+    bank = np.ascontiguousarray(bank, dtype=np.float32)
+    bank.setflags(write=False)
+    return up, down, bank
+
+
+class Resampler:
+    # Streaming int16 interleaved -> float32 mono resampler. Downmix, int16 scaling and the
+    # anti-aliasing polyphase FIR run in one pass over preallocated buffers, with filter
+    # history and output phase carried across blocks so block edges are seamless.
+    def __init__(self, in_rate, out_rate=16000, channels=1, max_block=4096, zero_crossings=16):
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        self.channels = int(channels)
+        # Channel average and int16 normalisation folded into one constant.
+        self.scale = np.float32(1.0 / (32768.0 * self.channels))
+        self.passthrough = self.in_rate == self.out_rate
+
+        if self.passthrough:
+            self.up = self.down = 1
+            self.taps = 1
+            self.bank = None
+        else:
+            self.up, self.down, bank = design_filter_bank(self.in_rate, self.out_rate, zero_crossings)
+            self.taps = bank.shape[1]
+            self.bank = bank * self.scale
+
+        self._allocate(int(max_block))
+        self.reset()
+
+    def _allocate(self, max_block):
+        self.max_block = max_block
+        history = self.taps - 1
+        max_out = max_block * self.up // self.down + 2
+        self._hist = np.zeros(history + max_block, dtype=np.float32)
+        self._chan = np.zeros(max_block, dtype=np.float32)
+        self._out = np.zeros(max_out, dtype=np.float32)
+        self._steps = np.arange(max_out, dtype=np.int64) * self.down
+        self._pos = np.zeros(max_out, dtype=np.int64)
+        self._idx = np.zeros(max_out, dtype=np.int64)
+        self._phase = np.zeros(max_out, dtype=np.int64)
+        self._coefs = np.zeros((max_out, self.taps), dtype=np.float32)
+
+    def reset(self):
+        self._hist[:] = 0.0
+        # Position of the next output sample in upsampled units, relative to _hist[0].
+        self._next = (self.taps - 1) * self.up
+
+    def process(self, in_data):
+        # Returns a view into an internal buffer; it is overwritten by the next call.
+        samples = np.frombuffer(in_data, dtype=np.int16) if isinstance(in_data, (bytes, bytearray, memoryview)) else in_data
+        frames = samples.reshape(-1, self.channels)
+        nb = frames.shape[0]
+        if nb > self.max_block:
+            self._grow(nb)
+
+        history = self.taps - 1
+        hist = self._hist
+        # int16 -> float32 and channel sum straight into the filter history; the 1/32768 and
+        # 1/channels factors are already folded into the filter taps.
+        mixed = hist[history:history + nb]
+        np.copyto(mixed, frames[:, 0], casting="unsafe")
+        if self.channels > 1:
+            # Widen each extra channel into scratch first; mixed-dtype adds would buffer.
+            scratch = self._chan[:nb]
+            for c in range(1, self.channels):
+                np.copyto(scratch, frames[:, c], casting="unsafe")
+                np.add(mixed, scratch, out=mixed)
+
+        if self.passthrough:
+            out = self._out[:nb]
+            np.multiply(mixed, self.scale, out=out)
+            return out
+
+        up, down = self.up, self.down
+        limit = (history + nb) * up
+        k = (limit - 1 - self._next) // down + 1 if self._next < limit else 0
+        out = self._out[:k]
+        if k:
+            windows = sliding_window_view(hist[:history + nb], self.taps)
+            if up == 1:
+                # Integer decimation: every output uses the single branch on a strided view.
+                first = self._next - history
+                np.matmul(windows[first:first + (k - 1) * down + 1:down], self.bank[0], out=out)
+            else:
+                pos = np.add(self._steps[:k], self._next, out=self._pos[:k])
+                idx = np.floor_divide(pos, up, out=self._idx[:k])
+                np.subtract(idx, history, out=idx)
+                phase = np.remainder(pos, up, out=self._phase[:k])
+                coefs = np.take(self.bank, phase, axis=0, out=self._coefs[:k], mode="clip")
+                # Fractional ratios need an irregular gather; this is the only per-block
+                # temporary (k x taps floats), integer decimation above has none.
+                np.einsum("ij,ij->i", windows[idx], coefs, out=out)
+            self._next += k * down
+
+        # Slide the filter history and re-base the output position for the next block.
+        hist[:history] = hist[nb:nb + history]
+        self._next -= nb * up
+        return out
+
+    def _grow(self, nb):
+        # Device handed us a larger block than planned for; reallocate once and keep state.
+        history = self._hist[:self.taps - 1].copy()
+        self._allocate(nb)
+        self._hist[:self.taps - 1] = history
@@ -0,0 +1,93 @@
+import threading
+import numpy as np
+
+
+class RingBuffer:
+    # Fixed-capacity sample ring. Every sample is written twice (at i and i + capacity)
+    # so any unread span is contiguous in the backing array and can be returned as a
+    # zero-copy view without ever reallocating.
+    def __init__(self, capacity, dtype=np.float32):
+        self.capacity = int(capacity)
+        if self.capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self._data = np.zeros(2 * self.capacity, dtype=dtype)
+        # Monotonic sample counters; positions in the ring are taken modulo capacity.
+        self._write_pos = 0
+        self._read_pos = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._write_pos - self._read_pos
+
+    @property
+    def free(self):
+        return self.capacity - len(self)
+
+    @property
+    def read_pos(self):
+        return self._read_pos
+
+    @property
+    def write_pos(self):
+        return self._write_pos
+
+    def write(self, samples):
+        n = len(samples)
+        if n == 0:
+            return 0
+        with self._lock:
+            if n > self.capacity:
+                # Only the newest `capacity` samples can survive anyway.
+                self.dropped += n - self.capacity
+                samples = samples[-self.capacity:]
+                n = self.capacity
+
+            overflow = n - self.free
+            if overflow > 0:
+                # Drop oldest unread audio rather than block the producer.
+                self._read_pos += overflow
+                self.dropped += overflow
+
+            cap = self.capacity
+            data = self._data
+            start = self._write_pos % cap
+            first = min(n, cap - start)
+            data[start:start + first] = samples[:first]
+            data[start + cap:start + cap + first] = samples[:first]
+            rest = n - first
+            if rest:
+                data[:rest] = samples[first:]
+                data[cap:cap + rest] = samples[first:]
+            self._write_pos += n
+        return n
+
+    def view(self, n=None, offset=0):
+        # Zero-copy view of unread samples [offset, offset + n). Valid until the
+        # producer wraps around onto it, so consume before the next large write.
+        available = len(self) - offset
+        if n is None or n > available:
+            n = max(available, 0)
+        start = (self._read_pos + offset) % self.capacity
+        return self._data[start:start + n]
+
+    def consume(self, n):
+        with self._lock:
+            n = min(int(n), len(self))
+            self._read_pos += n
+        return n
+
+    def retain(self, n):
+        # Keep only the newest `n` unread samples (overlap carried into the next window).
+        return self.consume(len(self) - max(int(n), 0))
+
+    def read(self, n=None):
+        # Copy out and consume up to `n` samples; safe against a concurrent writer.
+        with self._lock:
+            chunk = self.view(n).copy()
+            self._read_pos += len(chunk)
+        return chunk
+
+    def clear(self):
+        with self._lock:
+            self._read_pos = self._write_pos
@@ -0,0 +1,400 @@
+import itertools
+import queue
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+import metrics
+
+
+class _Request:
+    __slots__ = ("source", "kind", "audio", "kwargs", "submitted", "deadline", "done", "result", "error", "late")
+
+    def __init__(self, source, kind, audio, kwargs, deadline):
+        self.source = source
+        self.kind = kind
+        self.audio = audio
+        self.kwargs = kwargs
+        self.submitted = time.perf_counter()
+        self.deadline = self.submitted + deadline
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.late = False
+
+
+class _SegmentStream:
+    # The segments of one decode, handed to the source's thread as soon as the model has
+    # returned its info: the scheduler thread runs faster-whisper's lazy decode and puts
+    # each segment here as it is produced, so segment captions and first-segment latency
+    # behave as with a model of the source's own.
+    _END = object()
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def put(self, segment):
+        self._queue.put(segment)
+
+    def close(self, error=None):
+        self._queue.put(self._END if error is None else error)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = self._queue.get()
+        if item is self._END:
+            self._queue.put(item)
+            raise StopIteration
+        if isinstance(item, BaseException):
+            self._queue.put(self._END)
+            raise item
+        return item
+
+
+class SourceStats:
+    def __init__(self, name, deadline_seconds, priority):
+        self.name = name
+        self.deadline_seconds = float(deadline_seconds)
+        self.priority = int(priority)
+        self.decodes = 0
+        self.batched = 0
+        self.late = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        # perf_counter of this source's last window with speech in it (active speaker).
+        self.last_voiced = None
+
+
+class SchedulerClient:
+    # What one source's AudioTranscriber gets as model=: transcribe() (and detect_language()
+    # when the shared model has it) queue a request with the scheduler and block the
+    # source's own thread until it has run. Buffers, VAD state and language lock stay in
+    # the per-source transcriber; only the model is shared.
+    def __init__(self, scheduler, name):
+        self.scheduler = scheduler
+        self.name = name
+
+    def transcribe(self, audio, **kwargs):
+        return self.scheduler.submit(self.name, "transcribe", audio, kwargs)
+
+    @property
+    def detect_language(self):
+        # Language ID is set up once the source's transcriber is "loaded", i.e. after the
+        # shared model is; a model without detect_language() keeps the transcribe() path.
+        self.scheduler.loaded.wait()
+        if not callable(getattr(self.scheduler.model, "detect_language", None)):
+            raise AttributeError("detect_language")
+        return lambda audio, **kwargs: self.scheduler.submit(self.name, "detect_language", audio, kwargs)
+
+
+class InferenceScheduler:
+    # One model instance shared by N sources (loopback, microphone, app streams). Each
+    # source keeps its own AudioTranscriber (buffer, VAD gate, language lock) with a
+    # SchedulerClient as its model; a single inference thread runs their requests:
+    #
+    # - Order: requests already past their source's deadline first (earliest deadline),
+    #   then the active speaker's (the source whose windows most recently had speech),
+    #   then by source priority and deadline.
+    # - Batching: other pending requests with the same decode settings (same language,
+    #   task, beam, lateness; no word timestamps) join the first one in one
+    #   BatchedInferencePipeline call with per-source clips, up to max_batch.
+    # - Deadlines: a request that waited past its deadline is decoded greedily (beam 1)
+    #   to catch up, and counted as late for its source.
+    #
+    # - Streaming: a request decoded on its own hands the source its segments as the
+    #   model produces them; a batched call returns each source's segments at the end.
+    #
+    # Memory grows with the sources' buffers only, not with a model per source. The model
+    # is loaded (with the CUDA -> CPU fallback) by a throwaway AudioTranscriber on the
+    # scheduler thread, so loading behaves exactly as for a single source.
+    def __init__(
+        self,
+        model_size="small",
+        device="cuda",
+        compute_type="float16",
+        *,
+        model=None,
+        batched_model=None,
+        model_factory=None,
+        warmup_decode=True,
+        cpu_profile=None,
+        max_batch=4,
+        active_seconds=3.0,
+        speech_rms=0.01,
+    ):
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.model = model
+        self._model_factory = model_factory
+        self.warmup_decode = bool(warmup_decode)
+        # Passed to the loader: a CPU host profile sets the shared model's compute type and
+        # threads (the per-source beam and window stay as configured).
+        self._cpu_profile = cpu_profile
+        self._batched = batched_model
+        self._supported = None
+        self._batched_supported = None
+        self.max_batch = max(1, int(max_batch))
+        # A source counts as the active speaker for this long after a voiced window.
+        self.active_seconds = float(active_seconds)
+        self.speech_rms = float(speech_rms)
+
+        self.sources = {}
+        self._pending = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self.loaded = threading.Event()
+        self.ready = False
+        self.running = False
+        self.thread = None
+        self.on_state = None
+        self.state = "idle"
+        self.timings = {}
+        self.batch_calls = 0
+
+        registry = metrics.REGISTRY
+        self._h_wait = registry.histogram("scheduler_wait_seconds", "Request queued until the shared model runs it")
+        self._h_batch = registry.histogram("scheduler_batch_size", "Requests per shared model call", (1, 2, 3, 4, 6, 8, 12, 16))
+        self._c_late = registry.counter("scheduler_late_total", "Requests that started past their source's deadline")
+        registry.gauge("scheduler_pending", "Requests waiting for the shared models",
+                       fn=lambda s: len(s._pending), owner=self)
+
+    def client(self, name, deadline_seconds=3.0, priority=0):
+        # deadline_seconds: how long a window of this source may wait for the model.
+        # priority: higher wins ties between sources that are neither late nor active.
+        self.sources[name] = SourceStats(name, deadline_seconds, priority)
+        return SchedulerClient(self, name)
+
+    def start(self, on_state=None):
+        self.on_state = on_state
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="inference-scheduler")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            pending, self._pending = self._pending, []
+            self._cond.notify_all()
+        for _, request in pending:
+            request.error = RuntimeError("Inference scheduler stopped")
+            request.done.set()
+        if self.thread:
+            self.thread.join()
+
+    def submit(self, source, kind, audio, kwargs):
+        # Called on the source's thread; blocks until the request has run.
+        stats = self.sources[source]
+        request = _Request(source, kind, audio, kwargs, stats.deadline_seconds)
+        if kind == "transcribe" and len(audio) and float(np.sqrt(np.mean(np.square(audio[::4])))) >= self.speech_rms:
+            stats.last_voiced = request.submitted
+        with self._cond:
+            if not self.running:
+                raise RuntimeError("Inference scheduler is not running")
+            self._pending.append((next(self._order), request))
+            self._cond.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _rank(self, request, now):
+        # Ranked when the model is free, since lateness and activity change while waiting.
+        stats = self.sources[request.source]
+        late = now >= request.deadline
+        active = stats.last_voiced is not None and now - stats.last_voiced <= self.active_seconds
+        if late:
+            return (0, request.deadline, 0)
+        return (1, 0 if active else 1, -stats.priority, request.deadline)
+
+    def _run(self):
+        if not self._load():
+            with self._cond:
+                self.running = False
+                pending, self._pending = self._pending, []
+            for _, request in pending:
+                request.error = RuntimeError(f"Model {self.model_size} is not available")
+                request.done.set()
+            return
+        while True:
+            with self._cond:
+                while self.running and not self._pending:
+                    self._cond.wait()
+                if not self.running:
+                    return
+                batch = self._take()
+            self._execute(batch)
+
+    def _load(self):
+        from transcriber import AudioTranscriber
+
+        start = time.perf_counter()
+        loader = AudioTranscriber(self.model_size, self.device, self.compute_type, model=self.model,
+                                  model_factory=self._model_factory, warmup_decode=self.warmup_decode,
+                                  language_id=False, cpu_profile=self._cpu_profile)
+        loader.on_state = self._set_state
+        try:
+            if not loader.load_model():
+                return False
+            self.model = loader.model
+            self.device, self.compute_type = loader.device, loader.compute_type
+            self._supported = loader._transcribe_supported_kwargs
+            self.timings = dict(loader.timings, ready=time.perf_counter() - start)
+            self.ready = True
+            return True
+        finally:
+            self.loaded.set()
+
+    def _set_state(self, state, detail=""):
+        self.state = state
+        if self.on_state:
+            self.on_state(state, detail)
+
+    def _take(self):
+        # Pop the best-ranked request and the ones that can share its model call. Lateness
+        # is fixed here, so a batch is all late (greedy) or all on time.
+        now = time.perf_counter()
+        self._pending.sort(key=lambda entry: (self._rank(entry[1], now), entry[0]))
+        for _, request in self._pending:
+            request.late = request.kind == "transcribe" and now >= request.deadline
+        head = self._pending[0][1]
+        batch, rest = [head], []
+        key = self._batch_key(head)
+        for entry in self._pending[1:]:
+            request = entry[1]
+            if (key is not None and len(batch) < self.max_batch and request.source != head.source
+                    and self._batch_key(request) == key):
+                batch.append(request)
+            else:
+                rest.append(entry)
+        self._pending = rest
+        return batch
+
+    def _batch_key(self, request):
+        # Requests batch when every decode setting matches, including the greedy override
+        # for late ones; prompts and word timestamps are per window, so those always run alone.
+        kwargs = request.kwargs
+        if (request.kind != "transcribe" or kwargs.get("word_timestamps") or kwargs.get("initial_prompt")
+                or "clip_timestamps" in kwargs):
+            return None
+        return repr((request.late, sorted(kwargs.items())))
+
+    def _execute(self, batch):
+        now = time.perf_counter()
+        for request in batch:
+            if request.kind != "transcribe":
+                continue
+            stats = self.sources[request.source]
+            wait = now - request.submitted
+            stats.wait_seconds += wait
+            stats.max_wait = max(stats.max_wait, wait)
+            self._h_wait.observe(wait)
+            if request.late:
+                stats.late += 1
+                self._c_late.inc()
+        self._h_batch.observe(len(batch))
+        if len(batch) == 1 or self._batched_pipeline() is None:
+            for request in batch:
+                self._run_one(request, len(batch))
+            return
+        try:
+            results = self._run_batched(batch)
+        except Exception as e:
+            for request in batch:
+                self._finish(request, len(batch), error=e)
+            return
+        for request, result in zip(batch, results):
+            self._finish(request, len(batch), result)
+
+    def _finish(self, request, batch_size, result=None, error=None):
+        if error is None and request.kind == "transcribe":
+            stats = self.sources[request.source]
+            stats.decodes += 1
+            stats.batched += batch_size > 1
+        request.result = result
+        request.error = error
+        request.done.set()
+
+    def _kwargs(self, request, supported):
+        kwargs = dict(request.kwargs)
+        if request.late:
+            # Past the deadline: the cheapest decode that still produces text.
+            kwargs.update(beam_size=1, best_of=1)
+        if supported is not None:
+            kwargs = {k: v for k, v in kwargs.items() if k in supported}
+        return kwargs
+
+    def _run_one(self, request, batch_size=1):
+        try:
+            if request.kind == "detect_language":
+                self._finish(request, batch_size, self.model.detect_language(request.audio, **request.kwargs))
+                return
+            segments, info = self.model.transcribe(request.audio, **self._kwargs(request, self._supported))
+        except Exception as e:
+            self._finish(request, batch_size, error=e)
+            return
+        # faster-whisper decodes lazily: the source gets a stream now, and the decode runs
+        # here on this thread, segment by segment, before the next request.
+        stream = _SegmentStream()
+        self._finish(request, batch_size, (stream, info))
+        try:
+            for segment in segments:
+                stream.put(segment)
+        except Exception as e:
+            stream.close(e)
+            return
+        stream.close()
+
+    def _batched_pipeline(self):
+        faster_whisper = sys.modules.get("faster_whisper")
+        if self._batched is None and faster_whisper is not None and isinstance(self.model, faster_whisper.WhisperModel):
+            from faster_whisper import BatchedInferencePipeline
+
+            self._batched = BatchedInferencePipeline(self.model)
+        if self._batched is not None and self._batched_supported is None:
+            from transcriber import _supported_kwargs
+
+            self._batched_supported = _supported_kwargs(self._batched.transcribe) or set()
+        return self._batched
+
+    def _run_batched(self, batch):
+        # One call over the concatenated windows; segments are split back per source by
+        # their start time and shifted to each window's own time base.
+        audio = np.concatenate([request.audio for request in batch])
+        ends = np.cumsum([len(request.audio) for request in batch])
+        clips = [dict(start=int(end - len(r.audio)), end=int(end)) for r, end in zip(batch, ends)]
+        kwargs = self._kwargs(batch[0], self._batched_supported or None)
+        kwargs.update(clip_timestamps=clips, batch_size=len(batch), vad_filter=False)
+        segments, info = self._batched.transcribe(audio, **kwargs)
+        self.batch_calls += 1
+        bounds = ends / 16000
+        parts = [[] for _ in batch]
+        for segment in segments:
+            index = min(int(np.searchsorted(bounds, segment.start, side="right")), len(batch) - 1)
+            offset = clips[index]["start"] / 16000
+            parts[index].append(SimpleNamespace(
+                text=segment.text, start=segment.start - offset, end=segment.end - offset, words=None,
+                avg_logprob=getattr(segment, "avg_logprob", None), no_speech_prob=getattr(segment, "no_speech_prob", None),
+            ))
+        return [(iter(part), info) for part in parts]
+
+    def report(self):
+        return dict(
+            batch_calls=self.batch_calls,
+            sources={
+                name: dict(
+                    decodes=s.decodes,
+                    batched=s.batched,
+                    late=s.late,
+                    mean_wait_seconds=round(s.wait_seconds / s.decodes, 3) if s.decodes else 0.0,
+                    max_wait_seconds=round(s.max_wait, 3),
+                )
+                for name, s in self.sources.items()
+            },
+        )
@@ -0,0 +1,90 @@
+from collections import deque
+
+
+class CaptionScrollback:
+    # What the caption window shows, kept apart from Qt: a bounded ring of finalized lines
+    # plus one partial line. Producers push as often as captions arrive; the window calls
+    # take() at most once per frame and gets only what changed since the previous frame,
+    # so a burst of partials costs one repaint and the superseded ones are counted as
+    # dropped. Final text is appended to the open line until it reaches line_chars or the
+    # source changes; push_final(new_line=True) always starts a line (fixed-window mode).
+    def __init__(self, max_lines=200, line_chars=90):
+        self.lines = deque(maxlen=int(max_lines))
+        self.line_chars = int(line_chars)
+        self.partial = ""
+        self._source = None
+        self._line_open = False
+        self._appended = 0
+        self._tail_changed = False
+        self._partial_changed = False
+        self._pushes = 0
+        # perf_counter capture time of the newest audio waiting to be shown.
+        self._captured_at = None
+        self.updates = 0
+        self.dropped = 0
+        self.frames = 0
+
+    def push_final(self, text, source=None, captured_at=None, new_line=False):
+        text = text.strip()
+        if not text:
+            return
+        label = f"[{source}] " if source else ""
+        if (new_line or not self._line_open or source != self._source
+                or len(self.lines[-1]) + 1 + len(text) > self.line_chars):
+            self.lines.append(label + text)
+            self._appended += 1
+        else:
+            self.lines[-1] = f"{self.lines[-1]} {text}"
+            self._tail_changed = True
+        self._line_open = not new_line
+        self._source = source
+        # The committed text replaces whatever partial it came from.
+        if self.partial:
+            self.partial = ""
+            self._partial_changed = True
+        self._pushed(captured_at)
+
+    def push_partial(self, text, captured_at=None):
+        text = text.strip()
+        if text == self.partial:
+            return
+        self.partial = text
+        self._partial_changed = True
+        self._pushed(captured_at)
+
+    def _pushed(self, captured_at):
+        self._pushes += 1
+        self.updates += 1
+        if captured_at is not None:
+            self._captured_at = captured_at
+
+    @property
+    def dirty(self):
+        return self._pushes > 0
+
+    def take(self):
+        # Changes since the last frame, or None: appended (new final lines, at most the
+        # ring size), tail_changed (last line grew), partial_changed, captured_at, dropped
+        # (updates folded into this frame beyond the one being shown).
+        if not self._pushes:
+            return None
+        appended = min(self._appended, len(self.lines))
+        frame = dict(
+            appended=appended,
+            # A line appended this frame is drawn whole anyway.
+            tail_changed=self._tail_changed and appended == 0,
+            partial_changed=self._partial_changed,
+            captured_at=self._captured_at,
+            dropped=self._pushes - 1,
+        )
+        self.dropped += self._pushes - 1
+        self.frames += 1
+        self._appended = 0
+        self._tail_changed = self._partial_changed = False
+        self._pushes = 0
+        self._captured_at = None
+        return frame
+
+    def tail(self, n):
+        return list(self.lines)[-n:] if n > 0 else []
+
@@ -0,0 +1,397 @@
+import argparse
+import bisect
+import json
+import mmap
+import os
+import queue
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import defaultdict
+from types import SimpleNamespace
+
+import numpy as np
+
+import metrics
+
+LOG_MAGIC = b"CAPLOG1\n"
+INDEX_MAGIC = b"CAPIDX1\n"
+# Record frame: payload length, CRC-32 of the payload; the payload is one JSON object.
+_RECORD = struct.Struct("<II")
+# Index segment header: log range it covers [start, end), term count.
+_INDEX = struct.Struct("<QQI")
+_MAX_RECORD = 1 << 20
+_TERM = re.compile(r"\w+")
+
+
+def terms(text):
+    # Lowercased words; the same tokenizer for indexing and queries.
+    return _TERM.findall(text.lower())
+
+
+def _scan(buffer, start, end):
+    # Yields (offset, payload) for each intact record in buffer[start:end], up to the
+    # first torn or corrupt one.
+    offset = start
+    while offset + _RECORD.size <= end:
+        length, crc = _RECORD.unpack_from(buffer, offset)
+        body = offset + _RECORD.size
+        if length > _MAX_RECORD or body + length > end:
+            return
+        payload = buffer[body:body + length]
+        if zlib.crc32(payload) != crc:
+            return
+        yield offset, payload
+        offset = body + length
+
+
+class _Segment:
+    # One flushed slice of the inverted index, memory-mapped: sorted terms with a postings
+    # list (log offsets, ascending) each. Layout after the header: uint32 term bounds
+    # [n + 1], uint32 postings bounds [n + 1], the UTF-8 terms, padding to 8 bytes, then
+    # uint64 postings.
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            self._map.close()
+            raise ValueError(f"Not an index segment: {path}")
+        pos = len(INDEX_MAGIC)
+        self.log_start, self.log_end, n = _INDEX.unpack_from(self._map, pos)
+        pos += _INDEX.size
+        self._term_bounds = np.frombuffer(self._map, dtype="<u4", count=n + 1, offset=pos)
+        pos += 4 * (n + 1)
+        self._post_bounds = np.frombuffer(self._map, dtype="<u4", count=n + 1, offset=pos)
+        pos += 4 * (n + 1)
+        self._strings = pos
+        pos += int(self._term_bounds[-1])
+        pos += -pos % 8
+        self._postings = np.frombuffer(self._map, dtype="<u8", count=int(self._post_bounds[-1]), offset=pos)
+        self._n = n
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        # Term i; lets bisect search the mapped table without loading it.
+        start = self._strings + int(self._term_bounds[i])
+        return self._map[start:self._strings + int(self._term_bounds[i + 1])].decode("utf-8")
+
+    def postings(self, term):
+        i = bisect.bisect_left(self, term)
+        if i == self._n or self[i] != term:
+            return None
+        return self._postings[int(self._post_bounds[i]):int(self._post_bounds[i + 1])]
+
+    @staticmethod
+    def write(path, log_start, log_end, postings):
+        items = sorted(postings.items())
+        encoded = [term.encode("utf-8") for term, _ in items]
+        term_bounds = np.zeros(len(items) + 1, dtype="<u4")
+        term_bounds[1:] = np.cumsum([len(e) for e in encoded])
+        post_bounds = np.zeros(len(items) + 1, dtype="<u4")
+        post_bounds[1:] = np.cumsum([len(offsets) for _, offsets in items])
+        strings = b"".join(encoded)
+        head = INDEX_MAGIC + _INDEX.pack(log_start, log_end, len(items))
+        pos = len(head) + term_bounds.nbytes + post_bounds.nbytes + len(strings)
+        flat = np.fromiter((o for _, offsets in items for o in offsets), dtype="<u8", count=int(post_bounds[-1]))
+        # Written aside and renamed into place: a segment is either whole or absent.
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(head)
+            f.write(term_bounds.tobytes())
+            f.write(post_bounds.tobytes())
+            f.write(strings)
+            f.write(b"\0" * (-pos % 8))
+            f.write(flat.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def close(self):
+        # numpy views pin the map; drop them before closing it.
+        self._term_bounds = self._post_bounds = self._postings = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+
+
+class TranscriptStore:
+    # Append-only, crash-safe transcript of a session in a directory: captions.log holds
+    # one CRC-framed JSON record per final caption, index-NNNNNN.idx the inverted index.
+    #
+    # add() only queues the caption; a writer thread appends it, fsyncs at most every
+    # fsync_interval seconds (or fsync_records records) and indexes it. The newest
+    # records are indexed in a small in-memory map that is written out as a mapped
+    # segment every segment_records records, so memory stays flat however long the
+    # session runs; searches look at the segments and the map. Opening an existing store
+    # truncates a torn tail left by a crash and re-indexes records no segment covers.
+    def __init__(self, path, fsync_interval=1.0, fsync_records=64, segment_records=2048, max_queue=10000):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.fsync_interval = float(fsync_interval)
+        self.fsync_records = int(fsync_records)
+        self.segment_records = int(segment_records)
+        self._queue = queue.Queue(maxsize=int(max_queue))
+        self._lock = threading.Lock()
+        self._segments = []
+        self._postings = defaultdict(list)
+        self._memory_records = 0
+        self._reader = None
+        self._reader_size = 0
+        self.records = 0
+        self.dropped = 0
+        self.fsyncs = 0
+
+        registry = metrics.REGISTRY
+        self._c_records = registry.counter("store_records_total", "Captions written to the transcript store")
+        self._c_dropped = registry.counter("store_dropped_total", "Captions dropped because the store writer fell behind")
+        self._h_fsync = registry.histogram("store_fsync_seconds", "Transcript log fsync wall time")
+        registry.gauge("store_queue", "Captions waiting for the store writer", fn=lambda s: s._queue.qsize(), owner=self)
+
+        self._log_path = os.path.join(path, "captions.log")
+        self._log = open(self._log_path, "a+b")
+        self._recover()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.thread = threading.Thread(target=self._run, name="transcript-store")
+        self.thread.daemon = True
+        self.thread.start()
+
+    # --- writing ---------------------------------------------------------------------
+
+    def add(self, caption):
+        # Any thread (the transcriber's); never blocks. Only final, non-empty captions.
+        if not caption.final or not caption.text:
+            return
+        record = dict(
+            start=round(caption.start, 3), end=round(caption.end, 3), text=caption.text, language=caption.language,
+            source=caption.source, avg_logprob=caption.avg_logprob, no_speech_prob=caption.no_speech_prob,
+            time=round(time.time(), 3),
+        )
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._c_dropped.inc()
+
+    def close(self):
+        self._queue.put(None)
+        self.thread.join()
+        self._sync()
+        self._log.close()
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+            self._close_reader()
+
+    def _run(self):
+        while True:
+            timeout = max(self._last_sync + self.fsync_interval - time.monotonic(), 0.0) if self._unsynced else None
+            try:
+                record = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                record = False
+            if record is None:
+                return
+            if record:
+                self._append(record)
+            if self._unsynced and (self._unsynced >= self.fsync_records
+                                   or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+            if self._memory_records >= self.segment_records:
+                self._flush_segment()
+
+    def _append(self, record):
+        payload = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        offset = self._log.tell()
+        self._log.write(_RECORD.pack(len(payload), zlib.crc32(payload)) + payload)
+        # In the OS page cache from here on, so mapped readers see it before the fsync.
+        self._log.flush()
+        self._index(offset, record["text"])
+        self.records += 1
+        self._unsynced += 1
+        self._c_records.inc()
+
+    def _sync(self):
+        if not self._unsynced:
+            return
+        start = time.perf_counter()
+        os.fsync(self._log.fileno())
+        self._h_fsync.observe(time.perf_counter() - start)
+        self.fsyncs += 1
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _index(self, offset, text):
+        with self._lock:
+            for term in set(terms(text)):
+                self._postings[term].append(offset)
+            self._memory_records += 1
+
+    def _flush_segment(self):
+        # Records must be durable before an index that points at them.
+        self._sync()
+        log_start = self._segments[-1].log_end if self._segments else len(LOG_MAGIC)
+        log_end = self._log.tell()
+        path = os.path.join(self.path, f"index-{len(self._segments) + 1:06d}.idx")
+        _Segment.write(path, log_start, log_end, self._postings)
+        segment = _Segment(path)
+        with self._lock:
+            self._segments.append(segment)
+            self._postings = defaultdict(list)
+            self._memory_records = 0
+
+    def _recover(self):
+        self._log.seek(0, os.SEEK_END)
+        size = self._log.tell()
+        if size == 0:
+            self._log.write(LOG_MAGIC)
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            size = len(LOG_MAGIC)
+        # Check every record, keeping none of them: memory stays flat for any log size.
+        valid = len(LOG_MAGIC)
+        with open(self._log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            if view[:len(LOG_MAGIC)] != LOG_MAGIC:
+                raise ValueError(f"Not a transcript log: {self._log_path}")
+            for offset, payload in _scan(view, len(LOG_MAGIC), size):
+                self.records += 1
+                valid = offset + _RECORD.size + len(payload)
+        if valid < size:
+            # The map is closed first; Windows can't truncate a mapped file.
+            print(f"Transcript store: dropping {size - valid} bytes of a torn record at the end of {self._log_path}")
+            self._log.truncate(valid)
+            os.fsync(self._log.fileno())
+        self._log.seek(valid)
+
+        indexed = len(LOG_MAGIC)
+        for name in sorted(os.listdir(self.path)):
+            if not (name.startswith("index-") and name.endswith(".idx")):
+                continue
+            segment = _Segment(os.path.join(self.path, name))
+            if segment.log_start != indexed or segment.log_end > valid:
+                # Out of sequence or past the surviving log: rebuilt from the records below.
+                segment.close()
+                os.remove(segment.path)
+                continue
+            self._segments.append(segment)
+            indexed = segment.log_end
+        if indexed < valid:
+            with open(self._log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                for offset, payload in _scan(view, indexed, valid):
+                    self._index(offset, json.loads(payload)["text"])
+
+    # --- reading ---------------------------------------------------------------------
+
+    def _view(self, end):
+        # Read-only map of the log covering at least [0, end); remapped as the log grows.
+        if self._reader is None or self._reader_size < end:
+            self._close_reader()
+            with open(self._log_path, "rb") as f:
+                self._reader_size = os.fstat(f.fileno()).st_size
+                self._reader = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._reader
+
+    def _close_reader(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+            self._reader_size = 0
+
+    def _read(self, view, offset):
+        length, _ = _RECORD.unpack_from(view, offset)
+        body = offset + _RECORD.size
+        return json.loads(view[body:body + length])
+
+    def search(self, query, limit=20):
+        # Records containing every word of the query, newest first.
+        words = set(terms(query))
+        if not words:
+            return []
+        with self._lock:
+            found = None
+            for word in words:
+                parts = [segment.postings(word) for segment in self._segments]
+                parts.append(np.asarray(self._postings.get(word, ()), dtype=np.uint64))
+                offsets = np.concatenate([p for p in parts if p is not None])
+                found = offsets if found is None else np.intersect1d(found, offsets, assume_unique=True)
+                if not len(found):
+                    return []
+            hits = np.sort(found)[::-1][:limit]
+            view = self._view(int(hits[0]) + _RECORD.size)
+            return [self._read(view, int(offset)) for offset in hits]
+
+    def iter_records(self):
+        # Every record written so far, oldest first, straight from a mapped snapshot.
+        with open(self._log_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= len(LOG_MAGIC):
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                offset = len(LOG_MAGIC)
+                while offset + _RECORD.size <= size:
+                    length, _ = _RECORD.unpack_from(view, offset)
+                    body = offset + _RECORD.size
+                    if body + length > size:
+                        break
+                    yield view[body:body + length]
+                    offset = body + length
+
+    def export_jsonl(self, f):
+        # The stored records as they are, one JSON object per line.
+        for payload in self.iter_records():
+            f.write(payload.decode("utf-8") + "\n")
+
+    def export_srt(self, f):
+        from batch import write_srt
+
+        captions = (SimpleNamespace(start=r["start"], end=r["end"],
+                                    text=f"[{r['source']}] {r['text']}" if r.get("source") else r["text"])
+                    for r in map(json.loads, self.iter_records()))
+        write_srt(captions, f)
+
+    def report(self):
+        return dict(records=self.records, dropped=self.dropped, fsyncs=self.fsyncs, segments=len(self._segments),
+                    memory_terms=len(self._postings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search or export a transcript store written with main.py --store.")
+    parser.add_argument("store", help="store directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    search = sub.add_parser("search", help="captions containing every word, newest first")
+    search.add_argument("query", nargs="+")
+    search.add_argument("--limit", type=int, default=20)
+    export = sub.add_parser("export", help="write the whole transcript as SRT or JSON lines")
+    export.add_argument("--format", choices=["srt", "jsonl"], default="srt")
+    export.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    store = TranscriptStore(args.store)
+    try:
+        if args.command == "search":
+            start = time.perf_counter()
+            hits = store.search(" ".join(args.query), args.limit)
+            for record in hits:
+                print(f"{record['start']:9.2f}  {record['text']}")
+            print(f"{len(hits)} hits in {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+        else:
+            out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+            try:
+                (store.export_srt if args.format == "srt" else store.export_jsonl)(out)
+            finally:
+                if args.output:
+                    out.close()
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import string
+from collections import namedtuple
+
+# Word with absolute stream timestamps (seconds since the source started).
+Word = namedtuple("Word", ["start", "end", "text"])
+
+_PUNCTUATION = str.maketrans("", "", string.punctuation)
+
+
+def _norm(word):
+    return word.text.strip().lower().translate(_PUNCTUATION)
+
+
+class LocalAgreement:
+    # LocalAgreement-2 commit policy for re-decoded sliding windows: a word becomes final
+    # once two consecutive hypotheses agree on it (and on everything before it). The
+    # remaining, still-changing tail is the partial caption.
+    def __init__(self, max_ngram=5):
+        self.max_ngram = max_ngram
+        self.committed_end = 0.0
+        self._previous = []
+        self._committed_tail = []
+
+    def insert(self, words):
+        # Words that overlap audio already committed come back on every re-decode.
+        words = [w for w in words if w.start >= self.committed_end - 0.1]
+        words = self._drop_repeated_head(words)
+
+        n = 0
+        limit = min(len(self._previous), len(words))
+        while n < limit and _norm(self._previous[n]) == _norm(words[n]):
+            n += 1
+
+        committed = words[:n]
+        self._previous = words[n:]
+        self._remember(committed)
+        return committed, list(self._previous)
+
+    def flush(self):
+        # End of stream or forced window cut: commit whatever the last hypothesis said.
+        committed = self._previous
+        self._previous = []
+        self._remember(committed)
+        return committed
+
+    def _remember(self, committed):
+        if committed:
+            self.committed_end = committed[-1].end
+            self._committed_tail = (self._committed_tail + committed)[-self.max_ngram:]
+
+    def _drop_repeated_head(self, words):
+        # The window start rarely falls exactly between words, so the first words of a new
+        # hypothesis can repeat the end of the committed text; remove the longest such n-gram.
+        if not words or not self._committed_tail:
+            return words
+        if abs(words[0].start - self.committed_end) > 1.0:
+            return words
+        tail = [_norm(w) for w in self._committed_tail]
+        for n in range(min(len(tail), len(words)), 0, -1):
+            if tail[-n:] == [_norm(w) for w in words[:n]]:
+                return words[n:]
+        return words
@@ -0,0 +1,83 @@
+import json
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+import autotune
+from transcriber import AudioTranscriber
+
+# Decode seconds per audio second at beam 1, and whether the weights garble words.
+ENGINES = dict(int8=(0.01, True), int8_float32=(0.02, False), float32=(0.04, False))
+
+
+class TunedModel:
+    # One word per second of audio, named after that second's level; costs its engine's
+    # rate times the beam size plus 20 ms per call.
+    def __init__(self, compute_type):
+        self.rate, self.garbled = ENGINES.get(compute_type, ENGINES["float32"])
+
+    def transcribe(self, audio, beam_size=1, **kwargs):
+        time.sleep(0.02 + self.rate * beam_size * len(audio) / 16000)
+        levels = [int(round(float(audio[i:i + 16000].max()) * 100)) for i in range(0, len(audio), 16000)]
+        text = " ".join("x" if self.garbled and level % 3 == 0 else f"w{level}" for level in levels)
+        segment = SimpleNamespace(text=" " + text, start=0.0, end=len(audio) / 16000, words=None)
+        return iter([segment]), SimpleNamespace(language="en", language_probability=0.99)
+
+
+def fixture(seconds=6):
+    return np.repeat(np.arange(1, seconds + 1, dtype=np.float32) / 100, 16000)
+
+
+def test_tune_picks_the_fastest_configuration_that_agrees():
+    settings = autotune.tune(
+        "small", fixture(), factory=lambda size, compute_type, threads, workers: TunedModel(compute_type),
+        compute_types=list(ENGINES), splits=[(2, 1)], beams=(3, 1), windows=(2.0, 6.0), log=lambda line: None)
+
+    # int8 is fastest but garbles a third of the words; larger windows save per-call cost.
+    assert (settings["compute_type"], settings["beam_size"], settings["transcribe_interval"]) == ("int8_float32", 1, 6.0)
+    assert settings["meets_target"] and settings["agreement"] == 1.0
+    by_type = {c["compute_type"]: c["agreement"] for c in settings["candidates"] if c["beam_size"] == 1}
+    assert by_type["int8"] < 0.9
+    assert len(settings["candidates"]) == 6
+
+
+def test_transcriber_loads_this_hosts_profile_on_cpu(tmp_path):
+    path = str(tmp_path / "profile.json")
+    autotune.save_profile("small", dict(compute_type="int8_float32", cpu_threads=2, num_workers=1, beam_size=1,
+                                        transcribe_interval=5.0), path)
+    calls = []
+
+    def factory(model_size, **kwargs):
+        calls.append(kwargs)
+        return TunedModel(kwargs["compute_type"])
+
+    t = AudioTranscriber("small", "cpu", "int8", model_factory=factory, cpu_profile=path, warmup_decode=False,
+                         language_id=False)
+    assert t.load_model()
+    assert calls == [dict(device="cpu", compute_type="int8_float32", cpu_threads=2, num_workers=1)]
+    assert (t.compute_type, t.beam_size, t.transcribe_interval) == ("int8_float32", 1, 5.0)
+
+    # Other model sizes, other hosts' profiles and GPU loads are left alone.
+    assert autotune.load_profile("medium", path) is None
+    with open(path, encoding="utf-8") as f:
+        profile = json.load(f)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dict(profile, host="another-cpu-64cpu"), f)
+    assert autotune.load_profile("small", path) is None
+    calls.clear()
+    assert AudioTranscriber("small", "cuda", "float16", model_factory=factory, cpu_profile=path,
+                            warmup_decode=False, language_id=False).load_model()
+    assert calls == [dict(device="cuda", compute_type="float16")]
+
+
+def test_explicit_beam_and_window_outrank_the_profile(tmp_path):
+    path = str(tmp_path / "profile.json")
+    autotune.save_profile("small", dict(compute_type="int8_float32", cpu_threads=2, num_workers=1, beam_size=1,
+                                        transcribe_interval=5.0), path)
+    t = AudioTranscriber("small", "cpu", "int8", model_factory=lambda size, **kwargs: TunedModel(kwargs["compute_type"]),
+                         cpu_profile=path, beam_size=5, transcribe_interval=2.0, warmup_decode=False, language_id=False)
+    assert t.load_model()
+    # The engine settings still come from the profile.
+    assert (t.compute_type, t.beam_size, t.transcribe_interval) == ("int8_float32", 5, 2.0)
+    assert t.cpu_settings == dict(compute_type="int8_float32", cpu_threads=2, num_workers=1)
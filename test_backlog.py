@@ -0,0 +1,66 @@
+import queue
+import threading
+import numpy as np
+
+from backlog import AudioBacklog
+
+
+def tone(n, amplitude=0.3):
+    return (amplitude * np.sin(np.arange(n) * 0.1)).astype(np.float32)
+
+
+def test_hard_cap_drops_oldest_and_keeps_stream_positions():
+    backlog = AudioBacklog(16000, max_seconds=1.0)
+    for _ in range(5):
+        backlog.put(tone(8000))
+    assert len(backlog) == 16000
+    assert backlog.dropped_seconds == 1.5
+    # The survivors are the newest chunks, stamped where they arrived in the stream.
+    assert [backlog.get_nowait()[0] for _ in range(2)] == [24000, 32000]
+
+
+def test_drop_quiet_sheds_pauses_before_speech():
+    backlog = AudioBacklog(16000, max_seconds=10.0)
+    silence = np.zeros(1600, dtype=np.float32)
+    # speech, 0.1 s gap (inside a word), speech, 0.5 s pause, speech, 0.5 s pause
+    for chunk in [tone(8000), silence, tone(8000)] + [silence] * 5 + [tone(8000)] + [silence] * 5:
+        backlog.put(chunk)
+    assert backlog.drop_quiet(keep_seconds=0.0) == 1.0
+    positions = [backlog.get_nowait()[0] for _ in range(4)]
+    assert positions == [0, 8000, 9600, 25600]
+
+
+def test_blocking_put_waits_for_the_consumer():
+    backlog = AudioBacklog(16000, max_seconds=1.0)
+    backlog.put(tone(16000))
+    done = threading.Event()
+    producer = threading.Thread(target=lambda: (backlog.put(tone(8000), block=True), done.set()))
+    producer.start()
+    assert not done.wait(0.1)
+    backlog.get(timeout=1)
+    assert done.wait(1)
+    producer.join()
+    assert backlog.dropped == 0
+
+
+def test_source_writes_straight_into_the_backlog():
+    from sources import SyntheticSource
+
+    backlog = AudioBacklog(16000, max_seconds=0.5)
+    source = SyntheticSource("noise", seconds=3.0, realtime=False)
+    source.connect(backlog)
+    source.start()
+    received, expected_pos = 0, 0
+    while not (source.finished.is_set() and len(backlog) == 0):
+        try:
+            stream_pos, samples, captured_at = backlog.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        # Zero-copy: chunks are views into the ring, in order, each with its capture time.
+        assert samples.base is backlog._data
+        assert stream_pos == expected_pos and captured_at is not None
+        expected_pos += len(samples)
+        received += len(samples)
+    source.stop()
+    assert received == 48000
+    assert backlog.dropped == 0 and len(source.ring) == 0
@@ -0,0 +1,69 @@
+import io
+import wave
+import numpy as np
+
+from batch import (collect_inputs, default_pool_size, format_timestamp, load_audio, output_names, split_at_silence,
+                   write_srt, write_vtt)
+from transcriber import Caption
+
+
+def test_long_audio_is_cut_inside_pauses():
+    rate = 16000
+    t = np.arange(rate * 300) / rate
+    # 3 s of tone, 1 s of silence, repeated.
+    audio = (0.3 * np.sin(2 * np.pi * 200 * t) * ((t % 4.0) < 3.0)).astype(np.float32)
+    pieces = split_at_silence(audio, rate, target_seconds=60.0, search_seconds=10.0)
+
+    assert pieces[0][0] == 0 and pieces[-1][1] == len(audio)
+    assert all(a[1] == b[0] for a, b in zip(pieces, pieces[1:]))
+    for _, end in pieces[:-1]:
+        assert (end / rate) % 4.0 >= 3.0
+        assert np.abs(audio[end - 160:end + 160]).max() == 0.0
+    assert all(50 * rate <= end - start <= 60 * rate for start, end in pieces[:-1])
+    assert pieces[-1][1] - pieces[-1][0] <= 70 * rate
+
+
+def test_short_audio_is_one_piece():
+    audio = np.zeros(16000 * 30, dtype=np.float32)
+    assert split_at_silence(audio, target_seconds=120.0) == [(0, len(audio))]
+
+
+def test_subtitle_writers():
+    captions = [Caption("Hello there.", True, 1.5, 3.25, "en"), Caption("Bye.", True, 3661.0, 3662.001, "en")]
+    srt, vtt = io.StringIO(), io.StringIO()
+    write_srt(captions, srt)
+    write_vtt(captions, vtt)
+    assert srt.getvalue().startswith("1\n00:00:01,500 --> 00:00:03,250\nHello there.\n\n2\n01:01:01,000")
+    assert vtt.getvalue().startswith("WEBVTT\n\n00:00:01.500 --> 00:00:03.250\nHello there.\n")
+    assert format_timestamp(59.9996) == "00:01:00,000"
+
+
+def test_wav_is_loaded_as_16k_mono(tmp_path):
+    rate = 44100
+    pcm = (np.sin(2 * np.pi * 440 * np.arange(rate * 3) / rate) * 8000).astype(np.int16)
+    path = tmp_path / "stereo.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.repeat(pcm, 2).tobytes())
+    audio = load_audio(path)
+    assert audio.dtype == np.float32
+    assert abs(len(audio) - 48000) <= 1
+
+
+def test_pool_size_uses_every_core():
+    assert default_pool_size(16) == (4, 4)
+    assert default_pool_size(2) == (1, 2)
+
+
+def test_output_names_mirror_inputs_and_never_clash(tmp_path):
+    for rel in ("a/standup.wav", "b/standup.wav", "b/deep/retro.wav", "c/x.wav", "c/x.mp3"):
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+    inputs = [str(tmp_path / "a"), str(tmp_path / "b"), str(tmp_path / "c" / "x.wav"), str(tmp_path / "c" / "x.mp3")]
+    names = output_names(collect_inputs(inputs), inputs)
+    assert sorted(name.replace("\\", "/") for name in names.values()) == [
+        "a/standup", "b/deep/retro", "b/standup", "c/x.mp3", "c/x.wav",
+    ]
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from broadcast import CaptionBroadcaster, connect, read_events
+from transcriber import Caption
+
+
+async def wait_for_clients(broadcaster, n):
+    while broadcaster.report()["clients"] < n:
+        await asyncio.sleep(0.01)
+
+
+async def take(reader, kind, n):
+    events = []
+    async for event in read_events(reader, kind):
+        events.append(event)
+        if len(events) == n:
+            return events
+
+
+def test_websocket_and_sse_clients_get_every_caption():
+    broadcaster = CaptionBroadcaster(port=0).start()
+    try:
+        broadcaster.publish(Caption("before", True, 0.0, 1.0, "en"))
+        page = urllib.request.urlopen(f"http://127.0.0.1:{broadcaster.port}/", timeout=5).read()
+        assert b"EventSource" in page
+
+        async def clients():
+            connections = {kind: await connect("127.0.0.1", broadcaster.port, kind) for kind in ("ws", "sse")}
+            await wait_for_clients(broadcaster, 2)
+            broadcaster.publish(Caption("wor", False, 1.0, 2.0, "en", source="desktop"))
+            broadcaster.publish(Caption("world", True, 1.0, 2.0, "en", source="desktop"))
+            received = {}
+            for kind, (reader, writer) in connections.items():
+                received[kind] = await asyncio.wait_for(take(reader, kind, 3), 5)
+                writer.close()
+            return received
+
+        for events in asyncio.run(clients()).values():
+            # The last final captions are replayed to a client that joins late.
+            assert [(e["text"], e["final"], e.get("replay", False)) for e in events] == [
+                ("before", True, True), ("wor", False, False), ("world", True, False)]
+            assert events[2]["source"] == "desktop" and events[2]["seq"] == 3
+    finally:
+        broadcaster.stop()
+
+
+def test_stalled_client_is_dropped_and_others_keep_up():
+    broadcaster = CaptionBroadcaster(port=0, max_queue=8, write_buffer=4096).start()
+    text = "caption " * 250
+
+    def publish():
+        # 1 MB/s of captions, far more than speech produces.
+        for i in range(400):
+            broadcaster.publish(Caption(text, True, i, i + 1.0))
+            time.sleep(0.002)
+
+    try:
+        async def clients():
+            stalled = await connect("127.0.0.1", broadcaster.port, "ws", recv_buffer=1024)
+            reader, writer = await connect("127.0.0.1", broadcaster.port, "sse")
+            await wait_for_clients(broadcaster, 2)
+            publisher = threading.Thread(target=publish)
+            publisher.start()
+            events = await asyncio.wait_for(take(reader, "sse", 400), 20)
+            publisher.join()
+            writer.close()
+            stalled[1].close()
+            return events
+
+        events = asyncio.run(clients())
+        assert [e["seq"] for e in events] == list(range(1, 401))
+        assert broadcaster.report()["dropped_clients"] == 1
+    finally:
+        broadcaster.stop()
+
+
+def test_websocket_from_a_foreign_origin_is_rejected():
+    broadcaster = CaptionBroadcaster(port=0).start()
+    try:
+        async def clients():
+            own = await connect("127.0.0.1", broadcaster.port, "ws", origin=f"http://localhost:{broadcaster.port}")
+            own[1].close()
+            with pytest.raises(ConnectionError, match="403"):
+                await connect("127.0.0.1", broadcaster.port, "ws", origin="https://example.com")
+
+        asyncio.run(clients())
+        assert broadcaster.report()["connected"] == 1
+    finally:
+        broadcaster.stop()
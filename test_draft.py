@@ -0,0 +1,64 @@
+import time
+
+import numpy as np
+
+from conftest import FakeWhisperModel
+from draft import word_edits, words
+from transcriber import AudioTranscriber
+
+
+class DraftModel(FakeWhisperModel):
+    def __init__(self, text, avg_logprob):
+        super().__init__(text)
+        self.avg_logprob = avg_logprob
+
+    def transcribe(self, audio, **kwargs):
+        segments, info = super().transcribe(audio, **kwargs)
+        segments = list(segments)
+        for segment in segments:
+            segment.avg_logprob = self.avg_logprob
+        return iter(segments), info
+
+
+def run_window(main, draft):
+    # Three live seconds, one draft per second, one main-model window of three seconds.
+    transcriber = AudioTranscriber(model=main, draft_model=draft, warmup_seconds=0, transcribe_interval=3.0,
+                                   draft_interval=1.0, warmup_decode=False, language_id=False)
+    captions = []
+    transcriber.start(None, captions.append)
+    for i in range(3):
+        transcriber.add_audio(np.full(16000, 0.1, dtype=np.float32))
+        deadline = time.time() + 5
+        while i < 2 and len(draft.calls) <= i and time.time() < deadline:
+            time.sleep(0.005)
+    assert transcriber.finish(timeout=5)
+    transcriber.stop()
+    return transcriber, [(c.final, c.text) for c in captions]
+
+
+def test_word_edits():
+    assert word_edits(words("The cat sat."), words("the cat sat")) == 0
+    assert word_edits(words("the cat sat"), words("a cat sat down")) == 2
+
+
+def test_draft_shows_first_and_the_main_model_replaces_it():
+    main = FakeWhisperModel(" a b c")
+    draft = DraftModel(" a", avg_logprob=-0.8)
+    transcriber, captions = run_window(main, draft)
+
+    assert captions == [(False, "a"), (False, "a a"), (False, "a a a"), (True, "a b c"), (False, "")]
+    assert len(draft.calls) == 3 and draft.calls[0]["beam_size"] == 1
+    assert len(main.calls) == 1
+    report = transcriber.draft_report()
+    assert report["refined_windows"] == 1 and report["skipped_windows"] == 0
+    assert report["word_diff_rate"] == 0.667
+
+
+def test_confident_draft_skips_the_main_model():
+    main = FakeWhisperModel(" a b c")
+    draft = DraftModel(" a", avg_logprob=-0.1)
+    transcriber, captions = run_window(main, draft)
+
+    assert captions[-2:] == [(True, "a a a"), (False, "")]
+    assert main.calls == []
+    assert transcriber.draft_report()["skip_rate"] == 1.0
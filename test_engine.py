@@ -0,0 +1,83 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from conftest import FakeWhisperModel
+from engine import RemoteTranscriber, SharedAudioRing
+
+
+def test_shared_ring_round_trip_and_overflow():
+    ring = SharedAudioRing(16000, max_seconds=1.0)
+    try:
+        ring.put(np.full(4000, 0.5, dtype=np.float32), captured_at=1.5)
+        ring.put(np.full(4000, 0.25, dtype=np.float32))
+        pos, samples, captured_at = ring.get(timeout=0)
+        assert (pos, len(samples), captured_at) == (0, 4000, 1.5) and samples[0] == 0.5
+        ring.release()
+        pos, samples, captured_at = ring.get(timeout=0)
+        assert (pos, captured_at) == (4000, None) and samples[-1] == 0.25
+        ring.release()
+        try:
+            ring.get(timeout=0)
+            assert False, "ring should be empty"
+        except queue.Empty:
+            pass
+
+        # A live producer never waits: 2 s into a 1 s ring, the reader skips the oldest.
+        for i in range(8):
+            ring.put(np.full(4000, i, dtype=np.float32))
+        assert ring.dropped == 16000
+        pos, samples, _ = ring.get(timeout=0)
+        assert pos == 8000 + 16000 and samples[0] == 4
+        ring.release()
+        assert ring.dropped_seconds == 1.0
+    finally:
+        ring.release_memory()
+
+
+def test_engine_process_restarts_and_keeps_source_time():
+    captions = []
+    states = []
+    got = threading.Event()
+    engine = RemoteTranscriber(
+        model=FakeWhisperModel(" level{level}"), warmup_seconds=0, transcribe_interval=1.0, warmup_decode=False, language_id=False,
+        heartbeat_interval=0.2, restart_delay=0.1,
+    )
+
+    def on_caption(caption):
+        captions.append(caption)
+        got.set()
+
+    inference = metrics.REGISTRY.histogram("inference_seconds")
+    decodes_before = inference.count
+    engine.start(lambda text: None, on_caption, lambda state, detail: states.append(state))
+    try:
+        second = np.full(16000, 0.1, dtype=np.float32)
+        engine.add_audio(second, captured_at=time.perf_counter())
+        assert got.wait(30)
+        assert captions[0].text == "level1" and captions[0].start == 0.0
+
+        # Kill the worker; capture keeps writing into the ring while a new one starts.
+        got.clear()
+        engine.process.kill()
+        engine.add_audio(np.full(16000, 0.3, dtype=np.float32))
+        assert got.wait(30)
+        assert engine.restarts == 1 and "restarting" in states
+        assert captions[-1].text == "level3"
+        # Source time carries on from the ring position, not from zero in the new worker.
+        assert captions[-1].start == 1.0
+
+        engine.add_audio(np.full(8000, 0.5, dtype=np.float32))
+        assert engine.finish(timeout=30)
+        assert captions[-1].text == "level5"
+        assert engine.backlog_report()["engine_restarts"] == 1
+        # The replacement worker's decodes show up in this process's registry (the killed
+        # one's last heartbeat may not have carried its decode).
+        engine.stop()
+        assert inference.count - decodes_before >= 2
+    finally:
+        engine.stop()
+        engine.close()
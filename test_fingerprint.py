@@ -0,0 +1,93 @@
+import time
+
+import numpy as np
+
+from conftest import FakeWhisperModel, jingle
+from fingerprint import ResultCache
+from quality import QualityLevel
+from transcriber import AudioTranscriber
+
+KEY = ("small", "translate")
+
+
+def test_repeat_hits_shifted_and_other_audio_misses():
+    ident = jingle(0, 7)
+    noise = np.random.default_rng(1).standard_normal(96000).astype(np.float32) * 0.003
+    cache = ResultCache()
+    cache.put(cache.fingerprint(ident[:96000]), KEY, 6.0, [(1.0, 5.0, " station ident", -0.1, 0.01)], "en", 2.0)
+
+    # The same ident cut 0.25 s later and under noise: the cached text, moved 0.25 s earlier.
+    segments, language = cache.get(cache.fingerprint(ident[4000:100000] + noise), KEY, 6.0)
+    assert language == "en"
+    assert segments[0][2] == " station ident"
+    assert abs(segments[0][0] - 0.75) < 0.05 and abs(segments[0][1] - 4.75) < 0.05
+
+    assert cache.get(cache.fingerprint(jingle(2, 6)), KEY, 6.0) is None
+    assert cache.get(cache.fingerprint(ident[:96000]), KEY, 6.0, language="fr") is None
+    report = cache.report()
+    assert report["lookups"] == 3 and report["hits"] == 1 and report["saved_seconds"] == 2.0
+
+
+def test_cache_survives_a_restart(tmp_path):
+    path = str(tmp_path / "cache.npz")
+    ident = jingle(0, 6)
+    cache = ResultCache(path=path)
+    cache.put(cache.fingerprint(ident), KEY, 6.0, [(0.0, 6.0, " hold music", None, None)], "en", 1.0)
+    cache.save()
+
+    reloaded = ResultCache(path=path)
+    assert reloaded.report()["entries"] == 1
+    assert reloaded.get(reloaded.fingerprint(ident), KEY, 6.0)[0][0][2] == " hold music"
+
+
+def test_repeated_window_is_captioned_without_the_model():
+    model = FakeWhisperModel()
+    transcriber = AudioTranscriber(model=model, result_cache=True, warmup_seconds=0, warmup_decode=False,
+                                   language_id=False, transcribe_interval=6.0, batch_windows=1)
+    captions = []
+    transcriber.start(None, captions.append)
+    for i, part in enumerate((jingle(0, 6), jingle(3, 6), jingle(0, 6))):
+        transcriber.add_audio(part)
+        deadline = time.time() + 5
+        while len(captions) <= i and time.time() < deadline:
+            time.sleep(0.005)
+    assert transcriber.finish(timeout=5)
+    transcriber.stop()
+
+    assert [c.text for c in captions] == ["heard 6.0s"] * 3
+    assert len(model.calls) == 2
+    assert transcriber.cache_report()["hits"] == 1
+    assert captions[2].start == 12.0 and captions[2].end == 18.0
+
+
+def test_cache_entries_belong_to_the_model_that_decoded_them():
+    large, small = FakeWhisperModel(" large"), FakeWhisperModel(" small")
+    ladder = [QualityLevel("large-v3", "float16", 3), QualityLevel("small", "float16", 1)]
+    transcriber = AudioTranscriber(model=large, result_cache=True, quality_ladder=ladder, warmup_seconds=0,
+                                   warmup_decode=False, language_id=False, transcribe_interval=6.0, batch_windows=1)
+    captions = []
+    transcriber.start(None, captions.append)
+
+    def window(level=None):
+        if level is not None:
+            # Between decodes, as _adapt_quality would.
+            transcriber._apply_quality(level, "test")
+        transcriber.add_audio(jingle(0, 6))
+        deadline = time.time() + 5
+        while len(captions) < window.count + 1 and time.time() < deadline:
+            time.sleep(0.005)
+        window.count += 1
+
+    window.count = 0
+    window()
+    transcriber._models.add(ladder[1].model_key, small)
+    # The small rung must not be served the large model's caption, nor the other way round.
+    window(ladder[1])
+    window()
+    window(ladder[0])
+    assert transcriber.finish(timeout=5)
+    transcriber.stop()
+
+    assert [c.text for c in captions] == ["large", "small", "small", "large"]
+    assert len(large.calls) == 1 and len(small.calls) == 1
+    assert transcriber.cache_report()["hits"] == 2
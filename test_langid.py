@@ -0,0 +1,64 @@
+import threading
+
+import numpy as np
+
+from conftest import FakeWhisperModel
+from langid import LanguagePosterior, speech_window
+from transcriber import AudioTranscriber
+
+
+def test_posterior_locks_and_needs_repeated_evidence_to_switch():
+    posterior = LanguagePosterior(lock_threshold=0.8)
+    assert posterior.update({"en": 0.6, "de": 0.3}) is None
+    assert posterior.update({"en": 0.9, "de": 0.05}) == "en"
+    # One confident stray detection is not enough to switch...
+    assert posterior.update({"de": 0.95, "en": 0.03}) == "en"
+    # ...a second one is.
+    assert posterior.update({"de": 0.95, "en": 0.03}) == "de"
+    assert abs(sum(posterior.posterior().values()) - 1.0) < 1e-9
+
+
+def test_speech_window_picks_the_speech_dense_stretch():
+    rate = 16000
+    audio = np.zeros(rate * 12, dtype=np.float32)
+    t = np.arange(rate * 3) / rate
+    audio[rate * 7:rate * 10] = 0.2 * np.sin(2 * np.pi * 220 * t)
+    window = speech_window(audio, rate, window_seconds=4.0)
+    assert len(window) == 4 * rate - 4 * rate % 480
+    assert np.abs(window).max() > 0.1 and np.count_nonzero(window) >= 3 * rate - 480
+    assert speech_window(np.zeros(rate * 5, dtype=np.float32), rate) is None
+
+
+class LidModel(FakeWhisperModel):
+    def __init__(self):
+        super().__init__(" hallo", language="de", probability=0.6)
+        self.detected = threading.Event()
+
+    def detect_language(self, audio, **kwargs):
+        self.detected.set()
+        return "de", 0.97, [("de", 0.97), ("en", 0.02)]
+
+
+def test_language_id_runs_beside_decoding_and_skips_the_warm_up_window():
+    model = LidModel()
+    transcriber = AudioTranscriber(model=model, transcribe_interval=2.0, warmup_decode=False,
+                                   language_id_options=dict(interval_seconds=1.0, window_seconds=2.0))
+    texts = []
+    transcriber.start(texts.append)
+    assert transcriber.model_ready.wait(5)
+    rate = 16000
+    speech = (0.2 * np.sin(2 * np.pi * 220 * np.arange(rate) / rate)).astype(np.float32)
+    for _ in range(2):
+        transcriber.add_audio(speech)
+    assert model.detected.wait(5)
+    for _ in range(4):
+        transcriber.add_audio(speech)
+    assert transcriber.finish(timeout=5)
+    transcriber.stop()
+
+    # First window is transcribe_interval long, not the 10 s warm-up.
+    assert texts == ["hallo"] * 3
+    assert transcriber.locked_language == "de"
+    assert all(call["multilingual"] is False for call in model.calls)
+    assert model.calls[-1]["language"] == "de"
+    assert transcriber.language_report()["detections"] >= 1
@@ -0,0 +1,106 @@
+import gc
+import json
+import urllib.request
+
+import numpy as np
+import pytest
+
+from conftest import FakeWhisperModel
+from metrics import REGISTRY, JsonLinesLogger, Registry, serve
+from sources import SyntheticSource
+from transcriber import AudioTranscriber
+
+
+def test_histogram_quantiles_and_prometheus_text():
+    registry = Registry()
+    hist = registry.histogram("decode_seconds", "Decode time", buckets=(0.1, 0.5, 1.0))
+    for value in [0.05] * 50 + [0.3] * 45 + [0.9] * 5:
+        hist.observe(value)
+    assert registry.histogram("decode_seconds") is hist
+    assert hist.quantile(0.5) <= 0.1
+    assert 0.1 < hist.quantile(0.95) <= 0.5
+    assert hist.summary()["max"] == 0.9
+
+    text = registry.to_prometheus()
+    assert "# TYPE decode_seconds histogram" in text
+    assert 'decode_seconds_bucket{le="0.5"} 95' in text
+    assert 'decode_seconds_bucket{le="+Inf"} 100' in text
+    with pytest.raises(ValueError):
+        registry.counter("decode_seconds")
+
+
+def test_gauge_functions_and_json_lines(tmp_path):
+    registry = Registry()
+    depth = [3.0]
+    registry.gauge("queue_seconds", fn=lambda: depth[0])
+    registry.counter("calls_total").inc(2)
+    path = tmp_path / "metrics.jsonl"
+    logger = JsonLinesLogger(path, interval=60, registry=registry)
+    logger.write()
+    depth[0] = 1.5
+    logger.write()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["gauges"]["queue_seconds"] for line in lines] == [3.0, 1.5]
+    assert lines[-1]["counters"]["calls_total"] == 2
+
+
+def test_prometheus_endpoint_serves_registry():
+    registry = Registry()
+    registry.counter("captions_total", "Captions emitted").inc()
+    server = serve(0, registry=registry)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        body = urllib.request.urlopen(url, timeout=5).read().decode()
+    finally:
+        server.shutdown()
+    assert "captions_total 1" in body
+
+
+def test_merge_adds_remote_deltas_across_restarts():
+    remote, local = Registry(), Registry()
+    remote.histogram("inference_seconds").observe(0.2)
+    remote.counter("decodes").inc(2)
+    remote.gauge("queue_depth").set(1.5)
+    first = remote.state()
+    local.merge(first)
+    remote.histogram("inference_seconds").observe(0.4)
+    local.merge(remote.state(), first)
+
+    # A replacement process starts from zero; totals keep growing.
+    fresh = Registry()
+    fresh.counter("decodes").inc()
+    local.merge(fresh.state())
+
+    assert local.counter("decodes").value == 3
+    h = local.histogram("inference_seconds")
+    assert h.count == 2 and abs(h.sum - 0.6) < 1e-9 and h.max == 0.4
+    assert local.gauge("queue_depth").value == 1.5
+
+
+def test_chunks_carry_capture_timestamps():
+    source = SyntheticSource("sine", seconds=0.5, realtime=False)
+    source.start()
+    source.finished.wait(5)
+    source.stop()
+    chunk = source.get_audio_chunk()
+    assert len(chunk) == 8000
+    assert source.last_captured_at is not None
+    assert source.last_captured_at == source._stamps[0][1]
+
+
+def test_per_instance_gauges_report_every_source():
+    gc.collect()
+    queued = REGISTRY.gauge("transcriber_queue_seconds")
+    before = queued.value
+    desktop = AudioTranscriber(model=FakeWhisperModel(), language_id=False)
+    mic = AudioTranscriber(model=FakeWhisperModel(), language_id=False)
+    desktop.audio_queue.put(np.zeros(16000, dtype=np.float32))
+    mic.audio_queue.put(np.zeros(8000, dtype=np.float32))
+    assert queued.value - before == 1.5
+
+    # A dropped transcriber stops counting instead of being kept alive by its gauge.
+    del mic
+    gc.collect()
+    assert queued.value - before == 1.0
+    assert f"transcriber_queue_seconds {before + 1.0}" in REGISTRY.to_prometheus()
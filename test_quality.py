@@ -0,0 +1,84 @@
+import time
+
+from conftest import FakeWhisperModel
+from quality import QualityController, build_ladder, for_device
+from transcriber import AudioTranscriber
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_default_ladder_order():
+    ladder = [str(level) for level in build_ladder("large-v3", "float16", beam_size=3)]
+    assert ladder == ["large-v3/float16/beam3", "large-v3/float16/beam1", "medium/float16/beam1",
+                      "small/float16/beam1", "small/int8/beam1"]
+    cpu = [str(level) for level in for_device(build_ladder("medium", "float16", beam_size=1), "cpu")]
+    assert cpu == ["medium/int8/beam1", "small/int8/beam1"]
+
+
+def test_controller_steps_down_fast_and_up_with_hysteresis():
+    clock = Clock()
+    ladder = build_ladder("large-v3", "float16", beam_size=3)
+    controller = QualityController(ladder, min_dwell_seconds=5, hold_seconds=20, clock=clock)
+
+    def decode(rtf, lag=0.0, seconds=3.0):
+        clock.now += seconds
+        return controller.observe(rtf * seconds, seconds, lag)
+
+    assert decode(1.2) is None  # still inside the dwell time after start
+    assert decode(1.2) == ladder[1]
+    # The new rung gets a fresh measurement and its own dwell before moving again.
+    assert decode(1.2) is None
+    assert decode(0.9) == ladder[2]
+    assert decode(0.5, lag=12.0) is None
+    assert decode(0.5, lag=12.0) == ladder[3]
+
+    # Headroom must hold for hold_seconds before one step back up.
+    steps = [decode(0.2) for _ in range(10)]
+    assert steps.count(ladder[2]) == 1 and controller.index == 2
+    # Falling behind right after the up-step doubles the hold.
+    decode(1.5)
+    assert decode(1.5) == ladder[3]
+    assert controller.hold_seconds == 40
+    assert [reason.split()[0] for _, _, _, reason in controller.changes] == ["rtf", "rtf", "lag", "rtf", "rtf"]
+
+
+def test_transcriber_swaps_models_in_the_background():
+    loaded = []
+
+    def factory(model_size, device=None, compute_type=None):
+        loaded.append((model_size, device, compute_type))
+        # Captions name the model that decoded them.
+        return FakeWhisperModel(f" {model_size}")
+
+    clock = Clock()
+    transcriber = AudioTranscriber(
+        model_size="medium", device="cpu", compute_type="int8", beam_size=2, model_factory=factory,
+        adaptive_quality=True, quality_options=dict(min_dwell_seconds=0, clock=clock),
+    )
+    assert transcriber.load_model()
+    assert [str(level) for level in transcriber.quality.ladder] == ["medium/int8/beam2", "medium/int8/beam1", "small/int8/beam1"]
+
+    def slow_decode():
+        clock.now += 3.0
+        transcriber._account(time.perf_counter() - 6.0, 3 * 16000)
+
+    slow_decode()
+    assert transcriber.beam_size == 1 and transcriber.model.text == " medium"
+    slow_decode()
+    # The small model loads on a background thread; decoding continues on medium meanwhile.
+    deadline = time.time() + 5
+    while transcriber._models.get(("small", "int8")) is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert transcriber.model.text == " medium"
+    slow_decode()
+    assert transcriber.model.text == " small"
+    # Warmed up before the swap, on the load thread.
+    assert transcriber.model.calls[0]["vad_filter"] is False
+    assert loaded == [("medium", "cpu", "int8"), ("small", "cpu", "int8")]
+    assert [new for _, new, _ in transcriber.quality_report()["changes"]] == ["medium/int8/beam1", "small/int8/beam1"]
@@ -0,0 +1,45 @@
+import numpy as np
+
+from ringbuffer import RingBuffer
+
+
+def test_write_and_view_across_wrap():
+    ring = RingBuffer(8)
+    ring.write(np.arange(6, dtype=np.float32))
+    ring.consume(4)
+    ring.write(np.arange(6, 11, dtype=np.float32))
+
+    view = ring.view()
+    assert len(ring) == 7
+    assert np.array_equal(view, np.arange(4, 11, dtype=np.float32))
+    # Wrapped data is still a view into the backing array, not a copy.
+    assert view.base is ring._data
+
+
+def test_overflow_drops_oldest():
+    ring = RingBuffer(4)
+    ring.write(np.arange(3, dtype=np.float32))
+    ring.write(np.arange(3, 6, dtype=np.float32))
+
+    assert ring.dropped == 2
+    assert np.array_equal(ring.view(), [2, 3, 4, 5])
+
+
+def test_retain_keeps_overlap():
+    ring = RingBuffer(16)
+    ring.write(np.arange(10, dtype=np.float32))
+    ring.retain(3)
+
+    assert np.array_equal(ring.view(), [7, 8, 9])
+    assert ring.read_pos == 7
+
+
+def test_read_copies_and_consumes():
+    ring = RingBuffer(4)
+    ring.write(np.ones(3, dtype=np.float32))
+    chunk = ring.read()
+    ring.write(np.zeros(4, dtype=np.float32))
+
+    assert np.array_equal(chunk, [1, 1, 1])
+    assert len(ring) == 4
+    assert ring.read(10).sum() == 0
@@ -0,0 +1,174 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from conftest import FakeWhisperModel, StubWhisperModel
+from scheduler import InferenceScheduler
+from transcriber import AudioTranscriber
+
+
+class GatedModel(FakeWhisperModel):
+    # Holds its first call until released, so other requests pile up behind it.
+    def __init__(self):
+        super().__init__(" level{level}")
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.order = []
+
+    def transcribe(self, audio, **kwargs):
+        self.started.set()
+        self.release.wait(5)
+        self.order.append((int(round(float(np.abs(audio).max()) * 10)), kwargs.get("beam_size")))
+        return super().transcribe(audio, **kwargs)
+
+
+def submit_in_thread(scheduler, source, level, results):
+    audio = np.full(16000, level / 10, dtype=np.float32)
+    thread = threading.Thread(target=lambda: results.update({source: scheduler.submit(source, "transcribe", audio, dict(beam_size=3))}))
+    thread.start()
+    return thread
+
+
+def wait_pending(scheduler, n):
+    deadline = time.time() + 5
+    while len(scheduler._pending) < n and time.time() < deadline:
+        time.sleep(0.005)
+
+
+def test_late_requests_first_then_the_active_speaker():
+    model = GatedModel()
+    scheduler = InferenceScheduler(model=model, warmup_decode=False, speech_rms=0.25)
+    scheduler.client("first")
+    scheduler.client("quiet", priority=5)
+    scheduler.client("loud")
+    scheduler.client("urgent", deadline_seconds=0.0)
+    scheduler.start()
+    results = {}
+    try:
+        threads = [submit_in_thread(scheduler, "first", 1, results)]
+        assert model.started.wait(5)
+        threads.append(submit_in_thread(scheduler, "quiet", 2, results))
+        threads.append(submit_in_thread(scheduler, "loud", 5, results))
+        threads.append(submit_in_thread(scheduler, "urgent", 1, results))
+        wait_pending(scheduler, 3)
+        model.release.set()
+        for thread in threads:
+            thread.join(5)
+    finally:
+        scheduler.stop()
+
+    # Past its deadline: first and greedy. Then the voiced source beats a higher priority.
+    assert model.order == [(1, 3), (1, 1), (5, 3), (2, 3)]
+    assert len(results) == 4
+    report = scheduler.report()["sources"]
+    assert report["urgent"]["late"] == 1 and report["quiet"]["late"] == 0
+
+
+def test_ready_windows_from_several_sources_share_one_batched_call():
+    model = GatedModel()
+    batched = StubWhisperModel(rtf=0.0)
+    scheduler = InferenceScheduler(model=model, batched_model=batched, warmup_decode=False)
+    for name in ("a", "b", "c", "d"):
+        scheduler.client(name)
+    scheduler.start()
+    results = {}
+    try:
+        threads = [submit_in_thread(scheduler, "a", 1, results)]
+        assert model.started.wait(5)
+        threads += [submit_in_thread(scheduler, name, 3, results) for name in ("b", "c", "d")]
+        wait_pending(scheduler, 3)
+        model.release.set()
+        for thread in threads:
+            thread.join(5)
+    finally:
+        scheduler.stop()
+
+    assert batched.calls == 1 and scheduler.batch_calls == 1
+    # Each source gets its own segments back, in its own window's time base.
+    for name in ("b", "c", "d"):
+        segments = list(results[name][0])
+        assert segments and segments[0].start < 1.0 and segments[-1].end <= 1.0
+
+
+def test_late_and_on_time_requests_do_not_share_a_call():
+    model = GatedModel()
+    batched = StubWhisperModel(rtf=0.0)
+    scheduler = InferenceScheduler(model=model, batched_model=batched, warmup_decode=False)
+    for name in ("a", "c", "d"):
+        scheduler.client(name)
+    scheduler.client("late", deadline_seconds=0.0)
+    scheduler.start()
+    results = {}
+    try:
+        threads = [submit_in_thread(scheduler, "a", 1, results)]
+        assert model.started.wait(5)
+        threads += [submit_in_thread(scheduler, name, 3, results) for name in ("late", "c", "d")]
+        wait_pending(scheduler, 3)
+        model.release.set()
+        for thread in threads:
+            thread.join(5)
+    finally:
+        scheduler.stop()
+
+    # The late window decodes greedily on its own; the on-time ones keep their beam together.
+    assert model.order == [(1, 3), (3, 1)]
+    assert batched.calls == 1 and len(results) == 4
+
+
+class StreamingModel(FakeWhisperModel):
+    # Produces its second segment only once released, like a decode still running.
+    def __init__(self):
+        super().__init__(" first")
+        self.release = threading.Event()
+
+    def transcribe(self, audio, **kwargs):
+        segments, info = super().transcribe(audio, **kwargs)
+
+        def decode():
+            yield from segments
+            self.release.wait(5)
+            yield SimpleNamespace(text=" second", start=1.0, end=2.0, words=None)
+
+        return decode(), info
+
+
+def test_segments_reach_the_source_while_the_decode_runs():
+    model = StreamingModel()
+    scheduler = InferenceScheduler(model=model, warmup_decode=False)
+    client = scheduler.client("desktop")
+    scheduler.start()
+    try:
+        segments, info = client.transcribe(np.zeros(16000, dtype=np.float32), beam_size=1)
+        assert next(segments).text == " first" and not model.release.is_set()
+        model.release.set()
+        assert [s.text for s in segments] == [" second"]
+    finally:
+        model.release.set()
+        scheduler.stop()
+
+
+def test_sources_keep_their_own_transcriber_and_label_captions():
+    model = FakeWhisperModel(" level{level}")
+    scheduler = InferenceScheduler(model=model, warmup_decode=False)
+    captions = []
+    transcribers = {}
+    for name, level in (("desktop", 0.2), ("mic", 0.4)):
+        transcriber = AudioTranscriber(model=scheduler.client(name), source_name=name, warmup_seconds=0,
+                                       transcribe_interval=1.0, warmup_decode=False, language_id=False)
+        transcriber.add_audio(np.full(16000, level, dtype=np.float32))
+        transcribers[name] = transcriber
+    scheduler.start()
+    for transcriber in transcribers.values():
+        transcriber.start(None, captions.append)
+    try:
+        for transcriber in transcribers.values():
+            assert transcriber.finish(timeout=5)
+    finally:
+        scheduler.stop()
+        for transcriber in transcribers.values():
+            transcriber.stop()
+
+    assert sorted((c.source, c.text) for c in captions) == [("desktop", "level2"), ("mic", "level4")]
+    assert len(model.calls) == 2
@@ -0,0 +1,40 @@
+from scrollback import CaptionScrollback
+
+
+def test_frames_coalesce_updates_and_report_only_changes():
+    view = CaptionScrollback(max_lines=3, line_chars=20)
+    assert view.take() is None
+
+    for text in ("hel", "hello", "hello wor"):
+        view.push_partial(text, captured_at=1.0)
+    view.push_partial("hello wor")  # unchanged partials are not updates
+    frame = view.take()
+    assert frame == dict(appended=0, tail_changed=False, partial_changed=True, captured_at=1.0, dropped=2)
+    assert view.partial == "hello wor"
+
+    # Final text clears the partial and grows the open line until line_chars.
+    view.push_final("hello world")
+    view.push_final("again")
+    frame = view.take()
+    assert frame["appended"] == 1 and frame["partial_changed"] and frame["dropped"] == 1
+    assert list(view.lines) == ["hello world again"] and view.partial == ""
+    view.push_final("and more")
+    assert view.take()["appended"] == 1
+    view.push_final("x")
+    assert view.take()["tail_changed"]
+    assert list(view.lines) == ["hello world again", "and more x"]
+
+
+def test_ring_is_bounded_and_sources_start_new_lines():
+    view = CaptionScrollback(max_lines=3)
+    for i in range(10):
+        view.push_final(f"line {i}", new_line=True)
+    frame = view.take()
+    assert frame["appended"] == 3 and frame["dropped"] == 9
+    assert view.tail(2) == ["line 8", "line 9"]
+
+    view.push_final("from the mic", source="mic")
+    view.push_final("more", source="mic")
+    view.push_final("speakers", source="desktop")
+    assert view.tail(2) == ["[mic] from the mic more", "[desktop] speakers"]
+    assert len(view.lines) == 3
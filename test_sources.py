@@ -0,0 +1,52 @@
+import io
+import wave
+import numpy as np
+
+from sources import FileSource, PipeSource, SyntheticSource
+
+
+def drain(source):
+    source.start()
+    source.finished.wait(10)
+    source.stop()
+    return source.ring.read()
+
+
+def test_wav_file_is_resampled_to_16k(tmp_path):
+    rate = 44100
+    pcm = (np.sin(2 * np.pi * 440 * np.arange(rate * 2) / rate) * 10000).astype(np.int16)
+    path = tmp_path / "tone.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.repeat(pcm, 2).tobytes())
+
+    audio = drain(FileSource(path, realtime=False))
+    assert abs(len(audio) - 32000) <= 1
+    assert abs(np.sqrt(np.mean(audio[1000:-1000] ** 2)) - 10000 / 32768 / np.sqrt(2)) < 0.01
+
+
+def test_unpaced_source_applies_back_pressure_instead_of_dropping():
+    source = SyntheticSource("noise", seconds=3.0, realtime=False, buffer_seconds=0.5)
+    source.start()
+    received = 0
+    while not (source.finished.is_set() and len(source.ring) == 0):
+        chunk = source.get_audio_chunk()
+        received += 0 if chunk is None else len(chunk)
+    source.stop()
+
+    assert source.ring.dropped == 0
+    assert received == 48000
+
+
+def test_pipe_keeps_frames_aligned_across_short_reads():
+    class ShortReads(io.BytesIO):
+        def read(self, n=-1):
+            return super().read(min(n, 333))
+
+    stereo = np.tile(np.array([1000, -1000], dtype=np.int16), 4000)
+    audio = drain(PipeSource(ShortReads(stereo.tobytes()), rate=16000, channels=2))
+    assert len(audio) == 4000
+    # Misaligned channels would show up as +/- full-scale samples instead of silence.
+    assert np.abs(audio).max() < 1e-6
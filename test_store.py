@@ -0,0 +1,57 @@
+import io
+import json
+import os
+
+from store import TranscriptStore
+from transcriber import Caption
+
+
+def fill(store, texts, start=0):
+    for i, text in enumerate(texts, start):
+        store.add(Caption(text, True, float(i), i + 0.9, "en", source="desktop", avg_logprob=-0.3))
+
+
+def test_search_spans_segments_and_survives_reopening(tmp_path):
+    store = TranscriptStore(str(tmp_path), segment_records=2)
+    fill(store, ["The quick brown fox", "jumps over", "the lazy dog", "a quick dog", "fox again"])
+    store.add(Caption("partial text", False, 0.0, 1.0, "en"))
+    store.close()
+    assert sorted(os.listdir(tmp_path)) == ["captions.log", "index-000001.idx", "index-000002.idx"]
+
+    store = TranscriptStore(str(tmp_path), segment_records=2)
+    try:
+        # Newest first; one hit from each flushed segment and the in-memory tail.
+        assert [r["text"] for r in store.search("QUICK")] == ["a quick dog", "The quick brown fox"]
+        assert [r["text"] for r in store.search("fox")] == ["fox again", "The quick brown fox"]
+        assert [r["start"] for r in store.search("dog the")] == [2.0]
+        assert store.search("cat") == [] and store.search("...") == []
+        fill(store, ["one more fox"], start=5)
+    finally:
+        store.close()
+    assert store.records == 6
+
+
+def test_export_and_torn_tail_recovery(tmp_path):
+    store = TranscriptStore(str(tmp_path))
+    fill(store, ["hello there", "general kenobi"])
+    store.close()
+    # A crash in the middle of the next record.
+    with open(tmp_path / "captions.log", "ab") as f:
+        f.write(b"\x40\x00\x00\x00\x12\x34")
+
+    store = TranscriptStore(str(tmp_path))
+    fill(store, ["after the crash"], start=2)
+    store.close()
+    store = TranscriptStore(str(tmp_path))
+    try:
+        out = io.StringIO()
+        store.export_jsonl(out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [r["text"] for r in records] == ["hello there", "general kenobi", "after the crash"]
+        assert records[0]["source"] == "desktop" and records[0]["avg_logprob"] == -0.3
+        srt = io.StringIO()
+        store.export_srt(srt)
+        assert srt.getvalue().startswith("1\n00:00:00,000 --> 00:00:00,900\n[desktop] hello there\n\n2\n")
+        assert [r["text"] for r in store.search("crash")] == ["after the crash"]
+    finally:
+        store.close()
@@ -0,0 +1,44 @@
+from streaming import LocalAgreement, Word
+
+
+def words(text, start=0.0, step=0.5):
+    return [Word(start + i * step, start + i * step + 0.4, " " + w) for i, w in enumerate(text.split())]
+
+
+def test_commits_prefix_two_hypotheses_agree_on():
+    agreement = LocalAgreement()
+    committed, partial = agreement.insert(words("hello there gen"))
+    assert committed == []
+    assert [w.text for w in partial] == [" hello", " there", " gen"]
+
+    committed, partial = agreement.insert(words("hello there general kenobi"))
+    assert [w.text for w in committed] == [" hello", " there"]
+    assert [w.text for w in partial] == [" general", " kenobi"]
+    assert agreement.committed_end == 0.9
+
+
+def test_agreement_ignores_case_and_punctuation():
+    agreement = LocalAgreement()
+    agreement.insert(words("Hello, world"))
+    committed, _ = agreement.insert(words("hello world."))
+    assert len(committed) == 2
+
+
+def test_repeated_words_after_window_trim_are_dropped():
+    agreement = LocalAgreement()
+    agreement.insert(words("one two three"))
+    agreement.insert(words("one two three four"))
+    assert agreement.committed_end == 1.4
+
+    # Window now starts at the committed end, but the decoder repeats "three".
+    rewind = [Word(1.4, 1.45, " three")] + words("four five", start=1.5)
+    committed, partial = agreement.insert(rewind)
+    assert [w.text for w in committed] == [" four"]
+    assert [w.text for w in partial] == [" five"]
+
+
+def test_flush_commits_unstable_tail():
+    agreement = LocalAgreement()
+    agreement.insert(words("last words"))
+    assert [w.text for w in agreement.flush()] == [" last", " words"]
+    assert agreement.flush() == []
@@ -0,0 +1,84 @@
+import sys
+import time
+import numpy as np
+
+from conftest import FakeWhisperModel, StubWhisperModel
+from transcriber import AudioTranscriber
+
+
+def test_construction_does_not_load_or_import_the_model():
+    transcriber = AudioTranscriber(model_size="tiny", device="cpu")
+    assert transcriber.model is None
+    assert not transcriber.model_ready.is_set()
+    assert "faster_whisper" not in sys.modules
+
+
+def test_audio_queued_before_the_model_is_ready_is_decoded_after_warm_up():
+    model = FakeWhisperModel()
+    transcriber = AudioTranscriber(model=model, warmup_seconds=0, transcribe_interval=2.0)
+    # Capture runs before the model is ready; nothing may be lost meanwhile.
+    for _ in range(5):
+        transcriber.add_audio(np.full(16000, 0.1, dtype=np.float32))
+
+    texts, states = [], []
+    transcriber.start(texts.append, on_state=lambda state, detail: states.append(state))
+    assert transcriber.finish(timeout=5)
+    transcriber.stop()
+
+    assert states == ["warming_up", "ready"]
+    assert model.calls[0]["vad_filter"] is False
+    assert texts == ["heard 2.0s", "heard 2.0s", "heard 1.0s"]
+    assert set(transcriber.timings) == {"warmup", "ready", "first_caption"}
+
+
+def test_idle_after_finish_waits_instead_of_polling():
+    transcriber = AudioTranscriber(model=FakeWhisperModel(), warmup_seconds=0, warmup_decode=False, language_id=False)
+    transcriber.add_audio(np.full(16000, 0.1, dtype=np.float32))
+    transcriber.start(lambda text: None)
+    assert transcriber.finish(timeout=5)
+
+    calls = []
+    get = transcriber.audio_queue.get
+    transcriber.audio_queue.get = lambda timeout=None: calls.append(timeout) or get(timeout)
+    time.sleep(0.3)
+    transcriber.stop()
+    assert len(calls) <= 2
+
+
+def test_backlog_catch_up_passes_clips_in_samples():
+    class RecordingBatch(StubWhisperModel):
+        def transcribe(self, audio, clip_timestamps=None, **kwargs):
+            self.clips = clip_timestamps
+            return super().transcribe(audio, clip_timestamps=clip_timestamps, **kwargs)
+
+    batched = RecordingBatch(rtf=0.0)
+    transcriber = AudioTranscriber(model=FakeWhisperModel(), batched_model=batched, warmup_seconds=0, transcribe_interval=1.0,
+                                   warmup_decode=False, language_id=False)
+    for _ in range(3):
+        transcriber.add_audio(np.full(16000, 0.1, dtype=np.float32))
+    captions = []
+    transcriber.start(lambda text: None, captions.append)
+    assert transcriber.finish(timeout=5)
+    transcriber.stop()
+
+    assert batched.clips == [dict(start=0, end=16000), dict(start=16000, end=32000), dict(start=32000, end=48000)]
+    assert all(isinstance(clip["end"], int) for clip in batched.clips)
+    assert [(c.start, c.end) for c in captions] == [(0.0, 1.0), (1.0, 2.0), (2.0, 3.0)]
+    assert all(c.text for c in captions)
+
+
+def test_segment_captions_are_emitted_while_the_window_decodes():
+    model = StubWhisperModel(rtf=0.0, segment_seconds=1.0)
+    transcriber = AudioTranscriber(model=model, warmup_seconds=0, transcribe_interval=3.0, warmup_decode=False,
+                                   language_id=False, segment_captions=True)
+    transcriber.add_audio(np.full(16000, 0.1, dtype=np.float32))
+    transcriber.add_audio(np.full(32000, 0.1, dtype=np.float32))
+    captions, yielded = [], []
+    transcriber.start(None, lambda caption: (captions.append(caption), yielded.append(model.yielded)))
+    assert transcriber.finish(timeout=5)
+    transcriber.stop()
+
+    # One caption per segment, each sent before the decoder produced the next.
+    assert model.calls == 1 and yielded == [1, 2, 3]
+    assert [(c.start, c.end) for c in captions] == [(0.0, 1.15), (1.2, 2.05), (2.1, 2.95)]
+    assert all(c.avg_logprob == -0.2 and c.no_speech_prob == 0.01 for c in captions)
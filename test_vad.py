@@ -0,0 +1,54 @@
+import numpy as np
+
+from vad import VoiceActivityGate
+
+
+def voiced(seconds, rate=16000, f0=150.0, amplitude=0.3):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * sum(np.sin(2 * np.pi * k * f0 * t) / k for k in range(1, 6))).astype(np.float32)
+
+
+def feed(gate, audio, chunk=1024):
+    runs = []
+    endpoints = []
+    for i in range(0, len(audio), chunk):
+        if gate.process(audio[i:i + chunk], lambda samples, pos: runs.append((pos, samples.copy()))):
+            endpoints.append(i + chunk)
+    return runs, endpoints
+
+
+def test_silence_and_noise_never_reach_the_sink():
+    rng = np.random.default_rng(0)
+    audio = np.concatenate([np.zeros(32000), 0.05 * rng.standard_normal(32000)]).astype(np.float32)
+    gate = VoiceActivityGate()
+    runs, endpoints = feed(gate, audio)
+    assert runs == []
+    assert endpoints == []
+    assert gate.seconds_dropped > 3.9
+
+
+def test_speech_is_kept_with_preroll_and_endpointed():
+    audio = np.concatenate([np.zeros(16000), voiced(1.0), np.zeros(16000)]).astype(np.float32)
+    gate = VoiceActivityGate(hangover_ms=300, preroll_ms=210)
+    runs, endpoints = feed(gate, audio)
+
+    kept = np.concatenate([samples for _, samples in runs])
+    first_pos = runs[0][0]
+    # Pre-roll reaches back before the onset; hangover extends past the offset.
+    assert 16000 - 210 * 16 <= first_pos <= 16000
+    assert 1.0 <= len(kept) / 16000 <= 1.6
+    assert len(endpoints) == 1
+    assert 32000 < endpoints[0] <= 32000 + 0.4 * 16000
+    # Runs are contiguous stream positions, so timestamps survive gating.
+    for (pos, samples), (next_pos, _) in zip(runs, runs[1:]):
+        assert pos + len(samples) == next_pos
+
+
+def test_chunking_does_not_change_decisions():
+    audio = np.concatenate([np.zeros(8000), voiced(0.8), np.zeros(16000), voiced(0.5), np.zeros(8000)]).astype(np.float32)
+    a_runs, a_end = feed(VoiceActivityGate(), audio, chunk=1024)
+    b_runs, b_end = feed(VoiceActivityGate(), audio, chunk=333)
+    a = np.concatenate([s for _, s in a_runs])
+    b = np.concatenate([s for _, s in b_runs])
+    assert np.array_equal(a, b)
+    assert len(a_end) == len(b_end) == 2
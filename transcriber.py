@@ -1,9 +1,70 @@
-from faster_whisper import WhisperModel
 import numpy as np
 import threading
 import queue
+import sys
 import time
 import inspect
+from collections import deque
+from dataclasses import dataclass
+
+import autotune
+import metrics
+from backlog import OVERLOAD_POLICIES, AudioBacklog
+from draft import DraftStats, DraftWindow
+from fingerprint import ResultCache
+from langid import LanguageIdentifier, supports_language_id
+from quality import ModelCache, QualityController, QualityLevel, build_ladder, for_device
+from ringbuffer import RingBuffer
+from streaming import LocalAgreement, Word
+from vad import VoiceActivityGate
+
+# Filter common Whisper hallucinations
+HALLUCINATIONS = [
+    "Thank you", "Thanks for watching", "Thank you for watching", 
+    "Subscribe", "Amara.org", "MBC", "Copyright", "silence"
+]
+
+def is_hallucination(text):
+    # If the text is short and contains a hallucination phrase, ignore it
+    if len(text) >= 50: # Only filter if it's a short phrase (likely just the hallucination)
+        return False
+    lowered = text.lower()
+    return any(h.lower() in lowered for h in HALLUCINATIONS)
+
+def _confidence(segments):
+    # Window-level (avg_logprob, no_speech_prob): mean log-probability, most doubtful segment.
+    logprobs = [s.avg_logprob for s in segments if getattr(s, "avg_logprob", None) is not None]
+    no_speech = [s.no_speech_prob for s in segments if getattr(s, "no_speech_prob", None) is not None]
+    return (sum(logprobs) / len(logprobs) if logprobs else None), (max(no_speech) if no_speech else None)
+
+def _supported_kwargs(transcribe):
+    # Parameter names a transcribe() accepts, or None to pass everything through.
+    try:
+        params = inspect.signature(transcribe).parameters.values()
+    except Exception:
+        return None
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in params):
+        # Wrappers taking **kwargs accept everything; nothing to filter.
+        return None
+    return {p.name for p in params}
+
+@dataclass
+class Caption:
+    # One caption update. Partial captions are provisional and superseded by the next
+    # update; final captions are committed. Times are seconds since the source started.
+    text: str
+    final: bool = True
+    start: float = 0.0
+    end: float = 0.0
+    language: str = None
+    # perf_counter capture time of the newest audio behind this caption (latency metrics).
+    captured_at: float = None
+    # Which source it came from when several share one model (scheduler.InferenceScheduler).
+    source: str = None
+    # Decoder confidence: the segment's own values with segment_captions, otherwise the
+    # mean avg_logprob and highest no_speech_prob over the window's segments.
+    avg_logprob: float = None
+    no_speech_prob: float = None
 
 class AudioTranscriber:
     def __init__(
@@ -13,44 +74,113 @@ class AudioTranscriber:
         compute_type="float16",
         *,
         warmup_seconds=10.0,
-        transcribe_interval=3.0,
+        transcribe_interval=None,
         min_detect_seconds=8.0,
         language_lock_threshold=0.80,
         language_detection_segments=2,
         language_detection_threshold=0.80,
         language_redetect_interval=180.0,
-        beam_size=3,
+        beam_size=None,
         temperature=0.0,
         best_of=1,
+        max_buffer_seconds=30.0,
+        streaming=False,
+        stream_step=0.5,
+        stream_min_seconds=1.0,
+        stream_max_window=15.0,
+        vad_gate=False,
+        vad_min_window=1.0,
+        vad_max_window=8.0,
+        vad_options=None,
+        max_queue_seconds=60.0,
+        max_lag_seconds=20.0,
+        overload_policy="drop_oldest",
+        silence_threshold_db=-45.0,
+        batch_windows=4,
+        summary_chars=200,
+        model=None,
+        batched_model=None,
+        warmup_decode=True,
+        model_factory=None,
+        adaptive_quality=False,
+        quality_ladder=None,
+        quality_options=None,
+        language_id=True,
+        language_id_model=None,
+        language_id_options=None,
+        source_name=None,
+        segment_captions=False,
+        draft_model=None,
+        draft_interval=1.0,
+        draft_skip_logprob=-0.25,
+        result_cache=False,
+        result_cache_options=None,
+        cpu_profile=None,
     ):
-        print(f"Loading Whisper model: {model_size} on {device}...")
-        try:
-            self.model = WhisperModel(model_size, device=device, compute_type=compute_type)
-        except Exception as e:
-            print(f"Error loading model on {device}: {e}")
-            print("Falling back to CPU...")
-            self.model = WhisperModel(model_size, device="cpu", compute_type="int8")
+        if overload_policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"Unknown overload policy: {overload_policy}")
 
-        # Cache supported transcribe() kwargs for compatibility across faster-whisper versions.
-        try:
-            self._transcribe_supported_kwargs = set(inspect.signature(self.model.transcribe).parameters.keys())
-        except Exception:
-            self._transcribe_supported_kwargs = None
+        # The model is loaded by load_model(), which start() runs on the processing thread,
+        # so construction is instant and audio queues up while the weights load.
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.warmup_decode = bool(warmup_decode)
+        # model_factory(model_size, device=, compute_type=) replaces WhisperModel (tests, benchmarks).
+        self._model_factory = model_factory
+        # When the model lands on CPU, the host profile written by autotune.py replaces the
+        # int8 default with the tuned compute type, cpu_threads/num_workers, beam size and
+        # window length (those two only when left unset, as None). None: this host's profile
+        # unless model_factory is set; True: this host's profile; a path: that file; False:
+        # never. cpu_settings is what was applied.
+        self._cpu_profile = cpu_profile if cpu_profile is not None else model_factory is None
+        self._profile_decoding = dict(beam_size=beam_size is None, transcribe_interval=transcribe_interval is None)
+        self.cpu_settings = None
+        self.model = None
+        self._transcribe_supported_kwargs = None
+        self.model_ready = threading.Event()
+        self.on_state = None
+        self.state = "idle"
+        self._created_at = time.perf_counter()
+        # Seconds since construction / durations: model_load, warmup, ready, first_caption.
+        self.timings = {}
+        if model is not None:
+            # Preloaded or stand-in model (anything with a compatible transcribe()).
+            self._set_model(model)
+
+        self.sample_rate = 16000
+        # Label put on every Caption, for multi-source sessions.
+        self.source_name = source_name
 
-        self.audio_queue = queue.Queue()
+        # Bounded hand-off from the capture bridge. max_queue_seconds is a hard memory cap;
+        # max_lag_seconds (None to disable) bounds how far decoding may trail live audio
+        # before overload_policy sheds or condenses the backlog.
+        self.audio_queue = AudioBacklog(self.sample_rate, max_queue_seconds)
+        self.max_lag_seconds = None if max_lag_seconds is None else float(max_lag_seconds)
+        self.overload_policy = overload_policy
+        self.silence_threshold_db = float(silence_threshold_db)
+        self.summary_chars = int(summary_chars)
         self.running = False
         self.thread = None
         self.callback = None
-        
-        # Buffer for accumulating audio
-        self.buffer = np.array([], dtype=np.float32)
-        self.sample_rate = 16000
+        self.on_caption = None
+
+        # Backlog catch-up: up to batch_windows pending windows go through one batched call
+        # (faster-whisper's BatchedInferencePipeline, or any stand-in taking clip_timestamps).
+        self.batch_windows = max(1, int(batch_windows))
+        self._batched = batched_model
+        self._batched_supported_kwargs = None if batched_model is None else _supported_kwargs(batched_model.transcribe)
 
         # Chunking / cadence
         self.warmup_seconds = float(warmup_seconds)
-        self.transcribe_interval = float(transcribe_interval)
+        self.transcribe_interval = 3.0 if transcribe_interval is None else float(transcribe_interval)
         self.min_detect_seconds = float(min_detect_seconds)
 
+        # Preallocated buffer for accumulating audio; sized for the largest window plus slack
+        # so appending a chunk is a copy into place instead of a reallocation.
+        buffer_seconds = max(float(max_buffer_seconds), self.warmup_seconds, self.transcribe_interval) + 1.0
+        self.buffer = RingBuffer(int(buffer_seconds * self.sample_rate))
+
         # Multi-language strategy: detect once during warm-up, then lock language.
         self.language_lock_threshold = float(language_lock_threshold)
         self.language_detection_segments = int(language_detection_segments)
@@ -61,16 +191,144 @@ class AudioTranscriber:
         self.last_language_check_ts = 0.0
         self._pending_language = None
         self._pending_language_count = 0
+        # Separate language-ID stage (langid.LanguageIdentifier): a language-token pass over
+        # a speech-dense sub-window on its own thread, feeding a running posterior that sets
+        # locked_language. Used when the model has detect_language() (WhisperModel does);
+        # language_id_model may name a smaller model for it. Otherwise detection falls back
+        # to transcribe() with the warm-up window and periodic re-detection below.
+        self._language_id_enabled = bool(language_id)
+        self._language_id_model = language_id_model
+        self._language_id_options = dict(language_id_options or {})
+        self.language_id = None
 
         # Decoding (speed/quality)
-        self.beam_size = int(beam_size)
+        self.beam_size = 3 if beam_size is None else int(beam_size)
         self.temperature = float(temperature)
         self.best_of = int(best_of)
 
+        # Adaptive quality: a QualityController walks a ladder of (model, compute type, beam)
+        # settings from the measured real-time factor and lag; models for other rungs load
+        # in the background and are swapped in between decodes. An explicit ladder's first
+        # rung replaces model_size/compute_type/beam_size/best_of.
+        self.adaptive_quality = bool(adaptive_quality or quality_ladder)
+        self._quality_ladder = None
+        if quality_ladder:
+            self._quality_ladder = [l if isinstance(l, QualityLevel) else QualityLevel(**l) for l in quality_ladder]
+            first = self._quality_ladder[0]
+            self.model_size, self.compute_type = first.model_size, first.compute_type
+            self.beam_size, self.best_of = first.beam_size, first.best_of
+        self._quality_options = dict(quality_options or {})
+        self.quality = None
+        self._models = None
+        self._pending_level = None
+
         self._has_emitted_text = False
 
-    def start(self, callback):
+        # Fixed-window mode: emit each segment as the decoder yields it instead of one
+        # caption per window, so the first sentence isn't held back by the last.
+        self.segment_captions = bool(segment_captions)
+
+        # Two-pass captions (fixed-window mode): a small draft model (draft_model: size or
+        # model) decodes each draft_interval of new audio in the open window greedily and
+        # shows the window's draft as a partial caption; the main model then decodes the
+        # whole window from the same buffer and its final caption replaces the draft. When
+        # every draft segment of a window reaches draft_skip_logprob (None: never), the
+        # draft becomes the final caption and the main-model pass is skipped.
+        self._draft_model = draft_model
+        self.draft = None
+        self._draft_supported_kwargs = None
+        self.draft_interval = float(draft_interval)
+        self._draft_window = DraftWindow(draft_skip_logprob)
+        self._drafted_to = 0
+        self._draft_shown = False
+        self.draft_stats = DraftStats() if draft_model is not None else None
+
+        # Repeated audio (intros, ads, hold music): fixed windows are fingerprinted and
+        # looked up in a fingerprint.ResultCache keyed by the decode that would run (the
+        # model actually loaded, its compute type, beam size, best_of and task; the forced
+        # language, if any) before decoding; a hit replays the cached segments instead of
+        # running the model.
+        # result_cache_options go to ResultCache (max_entries, path to persist, ...).
+        self.result_cache = None
+        if result_cache and not streaming:
+            self.result_cache = ResultCache(sample_rate=self.sample_rate, **(result_cache_options or {}))
+
+        # Streaming mode: re-decode a sliding window every stream_step seconds and commit
+        # words with LocalAgreement instead of waiting for a full fixed window.
+        self.streaming = bool(streaming)
+        self.stream_step = float(stream_step)
+        self.stream_min_seconds = float(stream_min_seconds)
+        self._stream_max_samples = int(min(float(stream_max_window), self.buffer.capacity / self.sample_rate - 1.0) * self.sample_rate)
+        self.agreement = LocalAgreement()
+        self._decoded_at = 0
+        self._committed_text = ""
+        self._last_partial = ""
+
+        # Pre-model voice activity gate: silent frames never reach the buffer, and gated
+        # windows close at the first speech endpoint between vad_min_window and
+        # vad_max_window seconds instead of every transcribe_interval.
+        self.gate = VoiceActivityGate(self.sample_rate, **(vad_options or {})) if vad_gate else None
+        self.vad_min_window = float(vad_min_window)
+        self.vad_max_window = float(vad_max_window)
+        # (buffer sample, stream sample) at each gap so captions keep source timestamps.
+        self._time_map = deque([(0, 0)])
+        # (queue position, source position - queue position) from add_audio(stream_pos=);
+        # appended by the producer, popped by the consumer.
+        self._source_offsets = deque([(0, 0)])
+        self._stream_pos = 0
+        self._expected_stream_pos = 0
+
+        # Model cost accounting (also used to estimate what the gate saved).
+        self.decode_calls = 0
+        self.decode_seconds = 0.0
+        self.decoded_audio_seconds = 0.0
+        self.skipped_windows = 0
+        self.skipped_seconds = 0.0
+        self.batch_calls = 0
+        self.batched_windows = 0
+        self.overloads = 0
+        self.max_lag_seen = 0.0
+        self.caption_lag = 0.0
+        self.max_caption_lag = 0.0
+        self._first_caption = True
+
+        # Latency breakdown, following the newest captured sample through each stage.
+        registry = metrics.REGISTRY
+        self._h_capture_to_buffer = registry.histogram(
+            "capture_to_buffer_seconds", "Capture callback to transcriber buffer")
+        self._h_buffer_wait = registry.histogram(
+            "buffer_to_inference_seconds", "Oldest undecoded audio waiting in the buffer until a decode starts")
+        self._h_inference = registry.histogram("inference_seconds", "Model transcribe() wall time per call")
+        self._h_rtf = registry.histogram(
+            "inference_rtf", "Inference seconds per second of audio decoded", metrics.RATIO_BUCKETS)
+        self._h_queue_depth = registry.histogram(
+            "queue_depth_seconds", "Transcriber queue depth when a decode starts", metrics.DEPTH_BUCKETS)
+        self._h_caption_latency = registry.histogram(
+            "caption_latency_seconds", "Capture of the newest decoded audio to final caption emit")
+        self._c_decode_calls = registry.counter("decode_calls_total", "Model transcribe() calls")
+        self._h_first_segment = registry.histogram(
+            "first_segment_seconds", "Decode start to the first segment caption of a window (segment_captions)")
+        # Summed over every live transcriber, so each source (and the scheduler's loader) counts.
+        registry.gauge("transcriber_queue_seconds", "Audio queued for the transcribers",
+                       fn=lambda t: t.audio_queue.seconds, owner=self)
+        registry.gauge("transcriber_lag_seconds", "Audio received but not yet decoded, summed over transcribers",
+                       fn=lambda t: t.lag_seconds, owner=self)
+        registry.gauge("transcriber_dropped_seconds", "Audio shed by the transcriber queues",
+                       fn=lambda t: t.audio_queue.dropped_seconds, owner=self)
+        self._newest_captured_at = None
+        self._decoded_captured_at = None
+        self._undecoded_since = None
+
+        # End-of-input handling for finite sources (files, pipes).
+        self._finishing = False
+        self.done = threading.Event()
+
+    def start(self, callback, on_caption=None, on_state=None):
+        # callback(text) receives final text only; on_caption(Caption) also gets partials;
+        # on_state(state, detail) follows model loading ("loading", "warming_up", "ready", "error").
         self.callback = callback
+        self.on_caption = on_caption
+        self.on_state = on_state
         self.running = True
         self.thread = threading.Thread(target=self._process_loop)
         self.thread.daemon = True
@@ -78,47 +336,447 @@ class AudioTranscriber:
 
     def stop(self):
         self.running = False
+        self.audio_queue.close()
         if self.thread:
             self.thread.join()
+        if self.language_id is not None:
+            self.language_id.stop()
+        if self.result_cache is not None and self.result_cache.path:
+            self.result_cache.save()
+
+    def add_audio(self, audio_chunk, block=False, captured_at=None, stream_pos=None):
+        # block=True for unpaced sources: wait for queue space instead of shedding audio.
+        # stream_pos: the chunk's position in the source, from callers that can skip audio
+        # (the engine process after a restart); captions keep source timestamps across it.
+        if stream_pos is not None:
+            offset = stream_pos - self.audio_queue.received
+            if offset != self._source_offsets[-1][1]:
+                self._source_offsets.append((self.audio_queue.received, offset))
+        self.audio_queue.put(audio_chunk, block=block, captured_at=captured_at)
+
+    @property
+    def lag_seconds(self):
+        # Audio received but not decoded yet: queued chunks plus the open window.
+        return (len(self.audio_queue) + len(self.buffer)) / self.sample_rate
+
+    def finish(self, timeout=None):
+        # No more audio is coming: decode whatever is still buffered once the queue drains.
+        self._finishing = True
+        self.audio_queue.wake()
+        return self.done.wait(timeout)
+
+    def _set_state(self, state, detail=""):
+        self.state = state
+        if detail:
+            print(detail)
+        if self.on_state:
+            self.on_state(state, detail)
+
+    def _set_model(self, model):
+        self.model = model
+        # Cache supported transcribe() kwargs for compatibility across faster-whisper versions.
+        self._transcribe_supported_kwargs = _supported_kwargs(model.transcribe)
+
+    def load_model(self):
+        # Load (unless a model was given) and warm up. Safe to call again; returns False if
+        # no model could be loaded.
+        if self.model_ready.is_set():
+            return True
+        if self.model is None:
+            start = time.perf_counter()
+            self._set_state("loading", f"Loading Whisper model: {self.model_size} on {self.device}...")
+            try:
+                device, compute_type = self.device, self.compute_type
+                if device == "cuda" and self._model_factory is None:
+                    # Deferred: importing faster-whisper/CTranslate2 costs seconds on a cold start.
+                    import ctranslate2
+
+                    if ctranslate2.get_cuda_device_count() == 0:
+                        # Skip a CUDA attempt that can only fail; it used to double the load time.
+                        device, compute_type = "cpu", "int8"
+                        self._set_state("loading", f"No CUDA device; loading {self.model_size} on CPU (int8)...")
+                try:
+                    model, compute_type = self._create_main_model(device, compute_type)
+                except Exception as e:
+                    if device == "cpu":
+                        raise
+                    print(f"Error loading model on {device}: {e}")
+                    self._set_state("loading", "Falling back to CPU...")
+                    device, compute_type = "cpu", "int8"
+                    model, compute_type = self._create_main_model(device, compute_type)
+            except Exception as e:
+                self._set_state("error", f"Could not load model {self.model_size}: {e}")
+                return False
+            # Where the model actually runs; the quality ladder loads its other models there too.
+            self.device, self.compute_type = device, compute_type
+            self._set_model(model)
+            self.timings["model_load"] = time.perf_counter() - start
 
-    def add_audio(self, audio_chunk):
-        self.audio_queue.put(audio_chunk)
+        if self.warmup_decode:
+            # One throwaway decode so kernel setup and allocator growth don't land on the
+            # first real window.
+            start = time.perf_counter()
+            self._set_state("warming_up", "Warming up model...")
+            self._warm_up(self.model)
+            self.timings["warmup"] = time.perf_counter() - start
+        if self._draft_model is not None and self.draft is None and not self.streaming:
+            self._init_draft()
+        if self._language_id_enabled and self.language_id is None:
+            self._init_language_id()
+        if self.adaptive_quality and self.quality is None:
+            self._init_quality()
+        self.timings["ready"] = time.perf_counter() - self._created_at
+        self.model_ready.set()
+        self._set_state("ready", "")
+        return True
+
+    def _create_main_model(self, device, compute_type):
+        options = {}
+        profile = None
+        if device == "cpu" and self._cpu_profile:
+            profile = autotune.load_profile(self.model_size, None if self._cpu_profile is True else self._cpu_profile)
+        if profile:
+            compute_type = profile["compute_type"]
+            options = dict(cpu_threads=profile["cpu_threads"], num_workers=profile["num_workers"])
+            self.cpu_settings = dict(compute_type=compute_type, **options)
+            # An explicit beam size or window is the caller's choice; only unset ones are tuned.
+            if self._profile_decoding["beam_size"]:
+                self.beam_size = self.cpu_settings["beam_size"] = int(profile["beam_size"])
+            if self._profile_decoding["transcribe_interval"]:
+                self.transcribe_interval = self.cpu_settings["transcribe_interval"] = min(
+                    float(profile["transcribe_interval"]), self.buffer.capacity / self.sample_rate)
+            self._set_state("loading", f"Loading {self.model_size} on CPU with the tuned host profile "
+                                       f"({compute_type}, {options['cpu_threads']} threads, beam {self.beam_size})...")
+        return self._create_model(self.model_size, device, compute_type, **options), compute_type
+
+    def _create_model(self, model_size, device, compute_type, **options):
+        # options: cpu_threads / num_workers from a CPU host profile.
+        if self._model_factory is not None:
+            return self._model_factory(model_size, device=device, compute_type=compute_type, **options)
+        from faster_whisper import WhisperModel
+
+        return WhisperModel(model_size, device=device, compute_type=compute_type, **options)
+
+    def _warm_up(self, model):
+        try:
+            noise = np.random.default_rng(0).standard_normal(self.sample_rate).astype(np.float32) * 0.01
+            kwargs = dict(beam_size=self.beam_size, language="en", multilingual=False, vad_filter=False)
+            supported = _supported_kwargs(model.transcribe)
+            if supported is not None:
+                kwargs = {k: v for k, v in kwargs.items() if k in supported}
+            segments, _ = model.transcribe(noise, **kwargs)
+            list(segments)
+        except Exception as e:
+            print(f"Warm-up decode failed: {e}")
+
+    def _init_draft(self):
+        model = self._draft_model
+        if isinstance(model, str):
+            start = time.perf_counter()
+            self._set_state("loading", f"Loading draft model: {model}...")
+            try:
+                model = self._create_model(model, self.device, self.compute_type)
+            except Exception as e:
+                # The main model alone still captions; just without the early draft.
+                print(f"Could not load draft model {self._draft_model}: {e}")
+                return
+            if self.warmup_decode:
+                self._warm_up(model)
+            self.timings["draft_load"] = time.perf_counter() - start
+        self.draft = model
+        self._draft_supported_kwargs = _supported_kwargs(model.transcribe)
+
+    def _init_language_id(self):
+        model, load = self._language_id_model, None
+        if isinstance(model, str):
+            size = model
+            model, load = None, lambda: self._create_model(size, self.device, self.compute_type)
+        elif model is None:
+            model = self.model
+        if model is not None and not supports_language_id(model):
+            # Stand-in without detect_language(): keep detecting through transcribe().
+            return
+        self.language_id = LanguageIdentifier(
+            model, load=load, sample_rate=self.sample_rate, lock_threshold=self.language_lock_threshold,
+            on_lock=self._on_language_lock, **self._language_id_options,
+        )
+        self.language_id.start()
+
+    def _on_language_lock(self, language, probability):
+        # Language-ID thread; plain attribute writes, read by the next decode.
+        self.locked_language = language
+        self.locked_language_probability = probability
+        self.last_language_check_ts = time.time()
+        print(f"Language locked: {language} ({probability:.2f})")
+
+    def _init_quality(self):
+        options = dict(self._quality_options)
+        preload = options.pop("preload", False)
+        floor = options.pop("floor", "small")
+        ladder = list(self._quality_ladder or []) or build_ladder(self.model_size, self.compute_type, self.beam_size, self.best_of, floor)
+        # Rung 0 is what load_model() actually produced (possibly the CPU fallback).
+        ladder[0] = QualityLevel(self.model_size, self.compute_type, self.beam_size, self.best_of)
+        self.quality = QualityController(for_device(ladder, self.device), **options)
+        self._models = ModelCache(self._load_quality_model)
+        self._models.add(self.quality.level.model_key, self.model)
+        metrics.REGISTRY.gauge("quality_level", "Lowest rung of the adaptive quality ladders in use (0 = best)",
+                               fn=lambda t: t.quality.index, owner=self, combine=max)
+        self._c_quality_changes = metrics.REGISTRY.counter("quality_changes_total", "Adaptive quality rung changes")
+        print(f"Adaptive quality ladder: {' > '.join(str(level) for level in self.quality.ladder)}")
+        if preload:
+            for level in self.quality.ladder[1:]:
+                self._models.request(level.model_key)
+
+    def _load_quality_model(self, model_size, compute_type):
+        # Runs on a ModelCache thread; the warm-up keeps first-use cost off the live stream.
+        model = self._create_model(model_size, self.device, compute_type)
+        self._warm_up(model)
+        return model
+
+    def _adapt_quality(self, decode_seconds, samples):
+        # Called after every decode, i.e. between model calls, where swapping is safe.
+        pending = self._pending_level
+        if pending is not None:
+            if pending.model_key in self._models.failed:
+                self._apply_quality(self.quality.discard(pending.model_key), "load failed")
+            elif self._models.get(pending.model_key) is not None:
+                self._apply_quality(pending, "loaded")
+            # Until the swap, the old model's timings must not push the controller further down.
+            return
+        # Lag here is the queued backlog only; the window just decoded is not "behind".
+        level = self.quality.observe(decode_seconds, samples / self.sample_rate, self.audio_queue.seconds)
+        if level is not None:
+            self._c_quality_changes.inc()
+            self._apply_quality(level, self.quality.changes[-1][3])
+
+    def _apply_quality(self, level, reason):
+        self.beam_size, self.best_of = level.beam_size, level.best_of
+        model = self._models.get(level.model_key)
+        if model is None:
+            # Keep decoding with the current model while the new one loads.
+            self._pending_level = level
+            self._models.request(level.model_key)
+            print(f"Quality: switching to {level} ({reason}); loading in the background")
+            return
+        self._pending_level = None
+        if model is not self.model:
+            if self._batched is not None and getattr(self._batched, "model", None) is self.model:
+                # A pipeline built around the old model; rebuilt on the next catch-up.
+                self._batched = None
+            if self.language_id is not None and self.language_id.model is self.model:
+                # Language ID shares the main model; it follows the swap too.
+                self.language_id.model = model
+            self._set_model(model)
+        print(f"Quality: {level} ({reason})")
 
     def _process_loop(self):
+        if not self.load_model():
+            self.running = False
+            self.done.set()
+            return
         while self.running:
             try:
                 # Get audio from queue
-                chunk = self.audio_queue.get(timeout=0.1)
-                self.buffer = np.concatenate((self.buffer, chunk))
-                
-                # Check if we have enough audio or time passed
-                current_time = time.time()
-                duration = len(self.buffer) / self.sample_rate
-
-                target_seconds = self.transcribe_interval
-                if not self._has_emitted_text and self.warmup_seconds > 0:
-                    # Initial delay is acceptable: use a bigger warm-up chunk so language detection is reliable.
-                    target_seconds = max(target_seconds, self.warmup_seconds)
-
-                if duration >= target_seconds:
-                    self._transcribe()
-                    # Clear buffer after transcription for this simple version
-                    # In a more advanced version, we would use a rolling window or VAD
-                    self.buffer = np.array([], dtype=np.float32) 
-                    # current_time kept for potential future cadence logic
-                    
+                # Woken by the producer, finish() or stop(); the timeout is only a safety net.
+                stream_pos, chunk, captured_at = self.audio_queue.get(timeout=0 if self._finishing and not self.done.is_set() else 1.0)
+                endpoint = self._ingest(stream_pos, chunk, captured_at)
+
+                lag = self.lag_seconds
+                self.max_lag_seen = max(self.max_lag_seen, lag)
+                if self.max_lag_seconds is not None and lag > self.max_lag_seconds:
+                    self._shed_load()
+                    continue
+
+                if self.streaming:
+                    if endpoint and len(self.buffer) > 0:
+                        # A pause closes the utterance: commit it without waiting for agreement.
+                        self._stream_decode(final=True)
+                    elif (
+                        self.buffer.write_pos - self._decoded_at >= self.stream_step * self.sample_rate
+                        and len(self.buffer) >= self.stream_min_seconds * self.sample_rate
+                        # Behind live: absorb the queued audio first and decode it in one pass.
+                        and (len(self.audio_queue) == 0 or len(self.buffer) >= self._stream_max_samples)
+                    ):
+                        self._stream_decode()
+                    continue
+
+                if self._window_ready(endpoint):
+                    if self.batch_windows > 1 and self.audio_queue.seconds >= self._window_target():
+                        # At least one more full window is already waiting: catch up in a batch.
+                        self._catch_up()
+                    else:
+                        self._transcribe()
+                        # Clear buffer after transcription for this simple version
+                        # In a more advanced version, we would use a rolling window or VAD
+                        self.buffer.clear()
+                elif (
+                    self.draft is not None
+                    and self.buffer.write_pos - max(self._drafted_to, self.buffer.read_pos) >= self.draft_interval * self.sample_rate
+                    # Behind live the drafts would only delay the main model.
+                    and len(self.audio_queue) == 0
+                ):
+                    self._draft_decode()
+
             except queue.Empty:
+                if self._finishing and not self.done.is_set():
+                    try:
+                        if self.streaming:
+                            self._stream_decode(final=True)
+                        else:
+                            self._transcribe()
+                            self.buffer.clear()
+                    finally:
+                        self.done.set()
                 continue
             except Exception as e:
                 print(f"Error in processing: {e}")
 
-    def _transcribe(self):
-        if len(self.buffer) == 0:
-            return
+    def _ingest(self, stream_pos, chunk, captured_at=None):
+        # Route one queued chunk into the window buffer; returns True at a speech endpoint.
+        offsets = self._source_offsets
+        while len(offsets) > 1 and offsets[1][0] <= stream_pos:
+            offsets.popleft()
+        stream_pos += offsets[0][1]
+        if captured_at is not None:
+            self._newest_captured_at = captured_at
+            self._h_capture_to_buffer.observe(time.perf_counter() - captured_at)
+        endpoint = False
+        if self.gate is not None:
+            if stream_pos != self._stream_pos:
+                # Audio was shed upstream; the gate restarts at the new position.
+                endpoint = self.gate.seek(stream_pos)
+            endpoint = self.gate.process(chunk, self._buffer_audio) or endpoint
+        else:
+            self._buffer_audio(chunk, stream_pos)
+        self._stream_pos = stream_pos + len(chunk)
+        if self.language_id is not None and self.language_id.due(self._stream_pos):
+            # Newest buffered audio (a view); the identifier copies only what it keeps.
+            tail = int(2 * self.language_id.window_seconds * self.sample_rate)
+            self.language_id.offer(self.buffer.view()[-tail:], self._stream_pos)
+        return endpoint
 
-        now = time.time()
+    def _window_target(self):
+        target_seconds = self.transcribe_interval
+        if self.gate is not None:
+            target_seconds = self.vad_min_window
+        if not self._has_emitted_text and self.warmup_seconds > 0 and self.language_id is None:
+            # Initial delay is acceptable: use a bigger warm-up chunk so language detection is reliable.
+            # (Not needed with the separate language-ID stage.)
+            target_seconds = max(target_seconds, self.warmup_seconds)
+        return target_seconds
+
+    def _window_ready(self, endpoint):
         duration = len(self.buffer) / self.sample_rate
+        target_seconds = self._window_target()
+        if self.gate is not None:
+            return (endpoint and duration >= target_seconds) or duration >= max(self.vad_max_window, target_seconds)
+        return duration >= target_seconds
+
+    def _shed_load(self):
+        # Decoding has fallen more than max_lag_seconds behind live audio.
+        self.overloads += 1
+        if self.overload_policy == "summary":
+            # Keep everything, but decode the whole backlog in one cheap batched pass and
+            # emit it as a single condensed caption.
+            if self.streaming and len(self.buffer) > 0:
+                self._stream_decode(final=True)
+            self._catch_up(summary=True)
+            return
+        keep = self._window_target()
+        if self.overload_policy == "skip_silence":
+            self.audio_queue.drop_quiet(keep, self.silence_threshold_db)
+        self.audio_queue.drop_oldest(keep)
+
+    def _buffer_audio(self, samples, stream_pos):
+        if self._undecoded_since is None:
+            self._undecoded_since = time.perf_counter()
+        if stream_pos != self._expected_stream_pos:
+            self._time_map.append((self.buffer.write_pos, stream_pos))
+        self.buffer.write(samples)
+        self._expected_stream_pos = stream_pos + len(samples)
 
+    def _stream_seconds(self, buffer_pos):
+        # Map a buffer sample position back to seconds since the source started.
+        oldest = min(self.buffer.read_pos, buffer_pos)
+        while len(self._time_map) > 1 and self._time_map[1][0] <= oldest:
+            self._time_map.popleft()
+        for mark, stream_pos in reversed(self._time_map):
+            if mark <= buffer_pos:
+                return (stream_pos + buffer_pos - mark) / self.sample_rate
+        mark, stream_pos = self._time_map[0]
+        return (stream_pos + buffer_pos - mark) / self.sample_rate
+
+    def backlog_report(self):
+        return dict(
+            received_seconds=round(self.audio_queue.received_seconds, 2),
+            dropped_seconds=round(self.audio_queue.dropped_seconds, 2),
+            dropped_chunks=self.audio_queue.dropped_chunks,
+            dropped_quiet_seconds=round(self.audio_queue.dropped_quiet / self.sample_rate, 2),
+            peak_queue_seconds=round(self.audio_queue.peak / self.sample_rate, 2),
+            overloads=self.overloads,
+            max_lag_seconds=round(self.max_lag_seen, 2),
+            max_caption_lag_seconds=round(self.max_caption_lag, 2),
+            decode_calls=self.decode_calls,
+            batch_calls=self.batch_calls,
+            batched_windows=self.batched_windows,
+        )
+
+    def language_report(self):
+        if self.language_id is None:
+            return None
+        posterior = self.language_id.posterior.posterior()
+        posterior.pop(self.language_id.posterior.OTHER, None)
+        posterior = sorted(posterior.items(), key=lambda kv: -kv[1])[:3]
+        return dict(
+            locked=self.locked_language,
+            posterior={language: round(p, 3) for language, p in posterior},
+            detections=self.language_id.detections,
+            skipped=self.language_id.skipped,
+            seconds=round(self.language_id.seconds, 3),
+        )
+
+    def cache_report(self):
+        if self.result_cache is None:
+            return None
+        return self.result_cache.report()
+
+    def draft_report(self):
+        if self.draft_stats is None:
+            return None
+        return dict(self.draft_stats.report(), refine_decode_calls=self.decode_calls,
+                    refine_seconds=round(self.decode_seconds, 3))
+
+    def quality_report(self):
+        if self.quality is None:
+            return None
+        return dict(
+            level=str(self.quality.level),
+            rung=self.quality.index,
+            rtf=None if self.quality.rtf is None else round(self.quality.rtf, 3),
+            changes=[(str(old), str(new), reason) for _, old, new, reason in self.quality.changes],
+            hold_seconds=self.quality.hold_seconds,
+            load_seconds={f"{size}/{compute}": round(t, 2) for (size, compute), t in self._models.load_seconds.items()},
+        )
+
+    def gate_report(self):
+        # Model time avoided by the gate, estimated from the measured decode cost per
+        # second of audio: dropped silence plus windows the Silero check rejected.
+        if self.gate is None:
+            return None
+        cost = self.decode_seconds / self.decoded_audio_seconds if self.decoded_audio_seconds else 0.0
+        avoided = self.gate.seconds_dropped + self.skipped_seconds
+        return dict(
+            audio_seconds=self._stream_pos / self.sample_rate,
+            dropped_seconds=round(self.gate.seconds_dropped, 2),
+            skipped_windows=self.skipped_windows,
+            decode_calls=self.decode_calls,
+            decode_seconds=round(self.decode_seconds, 3),
+            model_seconds_per_audio_second=round(cost, 4),
+            saved_model_seconds=round(avoided * cost, 3),
+        )
+
+    def _decode_language(self, duration, now):
+        # (language, multilingual) for the next transcribe() of duration seconds.
         should_redetect = (
             self.locked_language is None
             or (
@@ -131,6 +789,15 @@ class AudioTranscriber:
         # If locked, pass explicit language to avoid repeated detection overhead.
         language_arg = None if should_redetect else self.locked_language
         multilingual_arg = True if language_arg is None else False
+        if self.language_id is not None:
+            # Language ID runs on its own thread. Until it locks, transcribe() detects once
+            # per window; never per segment.
+            language_arg = self.locked_language
+            multilingual_arg = False
+        return language_arg, multilingual_arg
+
+    def _decode(self, audio, now, batched=False, draft=False, **overrides):
+        language_arg, multilingual_arg = self._decode_language(len(audio) / self.sample_rate, now)
 
         # Run inference
         # vad_filter=True helps ignore silence
@@ -148,16 +815,30 @@ class AudioTranscriber:
             language_detection_segments=self.language_detection_segments,
             language_detection_threshold=self.language_detection_threshold,
         )
+        transcribe_kwargs.update(overrides)
 
-        if self._transcribe_supported_kwargs is not None:
+        if draft:
+            model, supported = self.draft, self._draft_supported_kwargs
+        elif batched:
+            model, supported = self._batched, self._batched_supported_kwargs
+        else:
+            model, supported = self.model, self._transcribe_supported_kwargs
+        if supported is not None:
             transcribe_kwargs = {
-                k: v for k, v in transcribe_kwargs.items() if k in self._transcribe_supported_kwargs
+                k: v for k, v in transcribe_kwargs.items() if k in supported
             }
 
-        segments, info = self.model.transcribe(self.buffer, **transcribe_kwargs)
+        segments, info = model.transcribe(audio, **transcribe_kwargs)
+        return segments, info, language_arg
 
-        segments_list = list(segments)
-        text = " ".join([segment.text for segment in segments_list]).strip()
+    def _update_language(self, info, language_arg, now):
+        if self.language_id is not None:
+            if language_arg is None and getattr(info, "language", None):
+                # transcribe() detected on its own; free evidence for the posterior.
+                probs = getattr(info, "all_language_probs", None) or [(info.language, info.language_probability or 0.0)]
+                self.language_id.observe(dict(probs))
+                return info.language
+            return language_arg
 
         # Update language lock when we did detection.
         if language_arg is None and hasattr(info, "language") and hasattr(info, "language_probability"):
@@ -183,19 +864,376 @@ class AudioTranscriber:
                         self.locked_language_probability = detected_prob
                         self._pending_language = None
                         self._pending_language_count = 0
-        
-        # Filter common Whisper hallucinations
-        hallucinations = [
-            "Thank you", "Thanks for watching", "Thank you for watching", 
-            "Subscribe", "Amara.org", "MBC", "Copyright", "silence"
-        ]
-        
-        # If the text is short and contains a hallucination phrase, ignore it
-        if any(h.lower() in text.lower() for h in hallucinations):
-            if len(text) < 50: # Only filter if it's a short phrase (likely just the hallucination)
-                return
 
-        if text and self.callback:
-            # print(f"Detected language: {info.language} with probability {info.language_probability}")
-            self.callback(text)
+        if language_arg is None:
+            return getattr(info, "language", None)
+        return language_arg
+
+    def _emit(self, caption):
+        caption.source = self.source_name
+        if caption.captured_at is None:
+            caption.captured_at = self._decoded_captured_at
+        if caption.final:
+            if not caption.text or is_hallucination(caption.text):
+                return
+            if self._first_caption:
+                self._first_caption = False
+                self.timings["first_caption"] = time.perf_counter() - self._created_at
+            if self.callback:
+                self.callback(caption.text)
             self._has_emitted_text = True
+            # How far behind live audio this caption arrived.
+            self.caption_lag = max(self.audio_queue.received_seconds - caption.end, 0.0)
+            self.max_caption_lag = max(self.max_caption_lag, self.caption_lag)
+            if caption.captured_at is not None:
+                self._h_caption_latency.observe(time.perf_counter() - caption.captured_at)
+        if self.on_caption:
+            self.on_caption(caption)
+
+    def _transcribe(self):
+        if len(self.buffer) == 0:
+            return
+
+        now = time.time()
+        start = self._stream_seconds(self.buffer.read_pos)
+        end = self._stream_seconds(self.buffer.write_pos)
+        # Zero-copy view of the buffered window; nothing writes to the buffer while decoding.
+        audio = self.buffer.view()
+
+        overrides = {}
+        if self.gate is not None and self.gate.use_silero:
+            if not self.gate.confirm(audio):
+                self.skipped_windows += 1
+                self.skipped_seconds += len(audio) / self.sample_rate
+                if self.draft is not None:
+                    self._reset_draft()
+                return
+            # Silero already looked at this window; don't run it again inside transcribe().
+            overrides["vad_filter"] = False
+
+        duration = len(audio) / self.sample_rate
+        fp = key = None
+        if self.result_cache is not None:
+            key = self._cache_key(overrides)
+            fp = self.result_cache.fingerprint(audio)
+            cached = self.result_cache.get(fp, key, duration, self._decode_language(duration, now)[0])
+            if cached is not None:
+                self._emit_cached(*cached, start, end)
+                if self.draft is not None:
+                    self._reset_draft()
+                return
+
+        drafted = None
+        if self.draft is not None:
+            drafted = self._finish_draft(start, end)
+            if drafted is None:
+                return
+
+        decode_start = time.perf_counter()
+        segments, info, language_arg = self._decode(audio, now, **overrides)
+        if self.segment_captions and drafted is None:
+            segments_list, language = self._emit_segments(segments, info, language_arg, now, decode_start, len(audio))
+            if fp is not None:
+                self._cache_put(fp, key, duration, segments_list, language, time.perf_counter() - decode_start)
+            return
+
+        segments_list = list(segments)
+        cost = time.perf_counter() - decode_start
+        self._account(decode_start, len(audio))
+        text = " ".join([segment.text for segment in segments_list]).strip()
+
+        language = self._update_language(info, language_arg, now)
+        # print(f"Detected language: {info.language} with probability {info.language_probability}")
+        if fp is not None:
+            self._cache_put(fp, key, duration, segments_list, language, cost)
+        if drafted:
+            self.draft_stats.compare(drafted, text)
+        avg_logprob, no_speech_prob = _confidence(segments_list)
+        self._emit(Caption(text, True, start, end, language, avg_logprob=avg_logprob, no_speech_prob=no_speech_prob))
+        if drafted is not None:
+            self._reset_draft()
+
+    def _draft_decode(self):
+        # Draft the audio added to the open window since the last draft; the partial
+        # caption shows the draft of the whole window so far.
+        offset = max(self._drafted_to, self.buffer.read_pos) - self.buffer.read_pos
+        audio = self.buffer.view(offset=offset)
+        captured_at = self._newest_captured_at
+        decode_start = time.perf_counter()
+        segments, info, language_arg = self._decode(audio, time.time(), draft=True, beam_size=1, best_of=1)
+        segments = [s for s in segments if s.text.strip() and not is_hallucination(s.text.strip())]
+        self.draft_stats.drafted(time.perf_counter() - decode_start)
+        self._drafted_to = self.buffer.write_pos
+        window = self._draft_window
+        window.add(segments, language_arg or getattr(info, "language", None))
+        if window.text or self._draft_shown:
+            self._draft_shown = bool(window.text)
+            self._emit(Caption(window.text, False, self._stream_seconds(self.buffer.read_pos),
+                               self._stream_seconds(self.buffer.write_pos), window.language,
+                               captured_at=captured_at, avg_logprob=window.avg_logprob))
+
+    def _finish_draft(self, start, end):
+        # Window closing: draft the rest of it, then either keep a confident draft as the
+        # final caption (returns None) or return the draft text ("" if nothing was drafted)
+        # to compare with the main model's; the draft stays on screen until that replaces it.
+        if self.buffer.write_pos - max(self._drafted_to, self.buffer.read_pos) >= 0.1 * self.sample_rate:
+            self._draft_decode()
+        window = self._draft_window
+        if not window.confident:
+            return window.text
+        self.draft_stats.skip()
+        self._emit(Caption(window.text, True, start, end, window.language, captured_at=self._newest_captured_at,
+                           avg_logprob=window.avg_logprob))
+        self._reset_draft()
+        return None
+
+    def _reset_draft(self):
+        if self._draft_shown:
+            # Clear the partial in case the final caption was empty or filtered.
+            self._draft_shown = False
+            end = self._stream_seconds(self.buffer.write_pos)
+            self._emit(Caption("", False, end, end, self._draft_window.language))
+        self._draft_window.clear()
+        self._drafted_to = self.buffer.write_pos
+
+    def _emit_segments(self, segments, info, language_arg, now, decode_start, samples):
+        # faster-whisper decodes lazily: each segment is sent as soon as the generator
+        # yields it. info (and the language) is known before the first segment; the
+        # hallucination filter runs per segment in _emit. Segment times are window seconds.
+        language = self._update_language(info, language_arg, now)
+        self._decoded_captured_at = self._newest_captured_at
+        base = self.buffer.read_pos
+        first = True
+        decoded = []
+        for segment in segments:
+            decoded.append(segment)
+            caption = Caption(
+                segment.text.strip(), True,
+                self._stream_seconds(base + int(round(segment.start * self.sample_rate))),
+                self._stream_seconds(base + int(round(segment.end * self.sample_rate))),
+                language,
+                avg_logprob=getattr(segment, "avg_logprob", None),
+                no_speech_prob=getattr(segment, "no_speech_prob", None),
+            )
+            if first and caption.text:
+                first = False
+                self._h_first_segment.observe(time.perf_counter() - decode_start)
+            self._emit(caption)
+        self._account(decode_start, samples)
+        return decoded, language
+
+    def _cache_key(self, overrides):
+        # What actually decodes this window: the loaded model (with adaptive quality, the
+        # rung whose model is swapped in, not the configured size) and its search settings.
+        model_key = None if self._models is None else self._models.key_of(self.model)
+        model_key = model_key or (self.model_size, self.compute_type)
+        return model_key + (overrides.get("beam_size", self.beam_size), overrides.get("best_of", self.best_of),
+                            "translate")
+
+    def _cache_put(self, fp, key, duration, segments, language, cost):
+        self.result_cache.put(fp, key, duration, [
+            (s.start, s.end, s.text, getattr(s, "avg_logprob", None), getattr(s, "no_speech_prob", None))
+            for s in segments
+        ], language, cost)
+
+    def _emit_cached(self, segments, language, start, end):
+        # A repeat: the cached segments (already shifted into this window) stand in for a
+        # decode, captioned the same way a decode would have been.
+        self._decoded_captured_at = self._newest_captured_at
+        self._undecoded_since = None
+        if self.segment_captions:
+            base = self.buffer.read_pos
+            for seg_start, seg_end, text, avg_logprob, no_speech_prob in segments:
+                self._emit(Caption(
+                    text.strip(), True,
+                    self._stream_seconds(base + int(round(seg_start * self.sample_rate))),
+                    self._stream_seconds(base + int(round(seg_end * self.sample_rate))),
+                    language, avg_logprob=avg_logprob, no_speech_prob=no_speech_prob,
+                ))
+            return
+        logprobs = [s[3] for s in segments if s[3] is not None]
+        no_speech = [s[4] for s in segments if s[4] is not None]
+        self._emit(Caption(" ".join(s[2] for s in segments).strip(), True, start, end, language,
+                           avg_logprob=sum(logprobs) / len(logprobs) if logprobs else None,
+                           no_speech_prob=max(no_speech) if no_speech else None))
+
+    def _take_window(self):
+        # Copy the open window out of the ring (catch-up decodes several at once).
+        start = self._stream_seconds(self.buffer.read_pos)
+        end = self._stream_seconds(self.buffer.write_pos)
+        return self.buffer.read(), start, end
+
+    def _catch_up(self, summary=False):
+        # Cut further windows from the queued backlog and decode them together. Only full
+        # windows are taken, except in summary mode, which drains the whole backlog.
+        windows = [self._take_window()] if len(self.buffer) else []
+        while (summary or len(windows) < self.batch_windows) and len(self.audio_queue):
+            try:
+                stream_pos, chunk, captured_at = self.audio_queue.get_nowait()
+            except queue.Empty:
+                break
+            if self._window_ready(self._ingest(stream_pos, chunk, captured_at)):
+                windows.append(self._take_window())
+        if summary and len(self.buffer):
+            windows.append(self._take_window())
+        self._transcribe_batch(windows, summary)
+
+    def _batched_pipeline(self):
+        # A real WhisperModel means faster_whisper is already imported; stand-ins never import it.
+        faster_whisper = sys.modules.get("faster_whisper")
+        if self._batched is None and faster_whisper is not None and isinstance(self.model, faster_whisper.WhisperModel):
+            from faster_whisper import BatchedInferencePipeline
+
+            self._batched = BatchedInferencePipeline(self.model)
+            self._batched_supported_kwargs = _supported_kwargs(self._batched.transcribe)
+        return self._batched
+
+    def _transcribe_batch(self, windows, summary=False):
+        if self.gate is not None and self.gate.use_silero:
+            kept = []
+            for window in windows:
+                if self.gate.confirm(window[0]):
+                    kept.append(window)
+                else:
+                    self.skipped_windows += 1
+                    self.skipped_seconds += len(window[0]) / self.sample_rate
+            windows = kept
+        if not windows:
+            return
+        if self.draft is not None:
+            # Catching up skips the drafts; the batch's finals replace whatever was shown.
+            self._reset_draft()
+
+        now = time.time()
+        # Summaries trade accuracy for speed: greedy decoding over the whole backlog.
+        overrides = dict(beam_size=1, best_of=1) if summary else {}
+        samples = sum(len(audio) for audio, _, _ in windows)
+        texts = []
+        decode_start = time.perf_counter()
+        if len(windows) > 1 and self._batched_pipeline() is not None:
+            audio = np.concatenate([audio for audio, _, _ in windows])
+            ends = np.cumsum([len(a) for a, _, _ in windows])
+            # BatchedInferencePipeline takes clips in samples; the segments come back in seconds.
+            clips = [dict(start=int(end - len(a)), end=int(end)) for (a, _, _), end in zip(windows, ends)]
+            bounds = ends / self.sample_rate
+            segments, info, language_arg = self._decode(
+                audio, now, batched=True, clip_timestamps=clips, batch_size=len(windows), **overrides
+            )
+            parts = [[] for _ in windows]
+            for segment in segments:
+                index = min(int(np.searchsorted(bounds, segment.start, side="right")), len(windows) - 1)
+                parts[index].append(segment.text)
+            texts = [" ".join(p).strip() for p in parts]
+            calls = 1
+            self.batch_calls += 1
+            language = self._update_language(info, language_arg, now)
+        else:
+            for audio, _, _ in windows:
+                segments, info, language_arg = self._decode(audio, now, **overrides)
+                texts.append(" ".join(segment.text for segment in segments).strip())
+                language = self._update_language(info, language_arg, now)
+            calls = len(windows)
+        self._account(decode_start, samples, calls)
+        self.batched_windows += len(windows)
+
+        if summary:
+            text = " ".join(t for t in texts if t)
+            if len(text) > self.summary_chars:
+                text = text[:self.summary_chars].rsplit(" ", 1)[0] + " …"
+            self._emit(Caption(text, True, windows[0][1], windows[-1][2], language))
+            return
+        for text, (_, start, end) in zip(texts, windows):
+            self._emit(Caption(text, True, start, end, language))
+
+    def transcribe_segments(self, audio, offset=0.0, **overrides):
+        # Offline decoding (batch.py) with the live settings, language lock and hallucination
+        # filter. Returns (captions, language, language_probability); one Caption per segment,
+        # times shifted by offset seconds.
+        if not self.load_model():
+            raise RuntimeError(f"Model {self.model_size} is not available")
+        now = time.time()
+        decode_start = time.perf_counter()
+        segments, info, language_arg = self._decode(audio, now, **overrides)
+        segments = list(segments)
+        self._account(decode_start, len(audio))
+        language = self._update_language(info, language_arg, now)
+        captions = []
+        for segment in segments:
+            text = segment.text.strip()
+            if text and not is_hallucination(text):
+                captions.append(Caption(text, True, offset + segment.start, offset + segment.end, language,
+                                        avg_logprob=getattr(segment, "avg_logprob", None),
+                                        no_speech_prob=getattr(segment, "no_speech_prob", None)))
+        probability = float(getattr(info, "language_probability", 0.0) or 0.0) if language_arg is None else 1.0
+        return captions, language, probability
+
+    def _account(self, decode_start, samples, calls=1):
+        elapsed = time.perf_counter() - decode_start
+        self.decode_calls += calls
+        self.decode_seconds += elapsed
+        self.decoded_audio_seconds += samples / self.sample_rate
+
+        self._c_decode_calls.inc(calls)
+        for _ in range(calls):
+            self._h_inference.observe(elapsed / calls)
+        if samples:
+            self._h_rtf.observe(elapsed * self.sample_rate / samples)
+        self._h_queue_depth.observe(self.audio_queue.seconds)
+        if self._undecoded_since is not None:
+            self._h_buffer_wait.observe(max(decode_start - self._undecoded_since, 0.0))
+            self._undecoded_since = None
+        self._decoded_captured_at = self._newest_captured_at
+        if self.quality is not None:
+            self._adapt_quality(elapsed, samples)
+
+    def _stream_decode(self, final=False):
+        # Re-decode the whole uncommitted window, commit what two consecutive hypotheses
+        # agree on, and trim the audio those committed words cover.
+        self._decoded_at = self.buffer.write_pos
+        committed, partial, language = [], [], self.locked_language
+        if len(self.buffer) == 0:
+            if final:
+                committed = self.agreement.flush()
+        else:
+            now = time.time()
+            # Word times stay in buffer seconds (gaps removed by the gate) for agreement and
+            # trimming; they are mapped to source time only when a caption is emitted.
+            offset = self.buffer.read_pos / self.sample_rate
+            overrides = dict(word_timestamps=True)
+            if self._committed_text:
+                # Committed text as prompt keeps wording consistent across window cuts.
+                overrides["initial_prompt"] = self._committed_text[-200:]
+            decode_start = time.perf_counter()
+            segments, info, language_arg = self._decode(self.buffer.view(), now, **overrides)
+            words = [
+                Word(offset + w.start, offset + w.end, w.word)
+                for segment in segments
+                for w in (segment.words or [])
+            ]
+            self._account(decode_start, len(self.buffer))
+            language = self._update_language(info, language_arg, now)
+            committed, partial = self.agreement.insert(words)
+
+            if final or len(self.buffer) >= self._stream_max_samples:
+                # Nothing left to agree with (or the window is full): commit the tail as-is.
+                committed = committed + self.agreement.flush()
+                partial = []
+                self.buffer.clear()
+            elif committed:
+                trim = int(round((self.agreement.committed_end - offset) * self.sample_rate))
+                self.buffer.consume(max(trim, 0))
+
+        def to_stream(seconds):
+            return self._stream_seconds(int(round(seconds * self.sample_rate)))
+
+        if committed:
+            text = "".join(w.text for w in committed).strip()
+            self._committed_text = (self._committed_text + " " + text)[-400:]
+            self._emit(Caption(text, True, to_stream(committed[0].start), to_stream(committed[-1].end), language))
+
+        partial_text = "".join(w.text for w in partial).strip()
+        if partial_text != self._last_partial:
+            self._last_partial = partial_text
+            start = partial[0].start if partial else self.agreement.committed_end
+            end = partial[-1].end if partial else start
+            self._emit(Caption(partial_text, False, to_stream(start), to_stream(end), language))
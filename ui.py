@@ -1,12 +1,42 @@
 import sys
+import time
 from PyQt6.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QWidget, QHBoxLayout, QPushButton
-from PyQt6.QtCore import Qt, QPoint
+from PyQt6.QtCore import Qt, QTimer
+
+import metrics
+from scrollback import CaptionScrollback
+
+# End of the latency chain: capture callback to the caption being on screen.
+DISPLAY_LATENCY = metrics.REGISTRY.histogram(
+    "caption_display_latency_seconds", "Capture of the newest decoded audio to caption shown in the window")
+DROPPED_UPDATES = metrics.REGISTRY.counter(
+    "caption_updates_dropped_total", "Caption updates superseded before the next frame was drawn")
+
+LINE_STYLE = "color: white; font-size: 24px; font-family: Arial; font-weight: bold; background: transparent;"
+PARTIAL_STYLE = "color: #aaaaaa; font-size: 24px; font-family: Arial; font-style: italic; background: transparent;"
 
 class CaptionWindow(QMainWindow):
-    def __init__(self):
+    # Captions go into a CaptionScrollback as they arrive and are drawn by a frame timer at
+    # most max_fps times a second (max_fps=None draws on every update, the old behaviour).
+    # The caption area is a fixed-size stack of visible_lines plain-text labels plus one
+    # partial label, recycled as a ring: a new final line re-texts the oldest label and
+    # moves it to the bottom, and a new partial touches only the partial label, so the
+    # window never relayouts as a whole.
+    def __init__(self, max_fps=20, visible_lines=3, scrollback_lines=200):
         super().__init__()
         self.oldPos = None
+        self.has_caption = False
+        # ~60 characters is one or two rows of the 24 px font across the 800 px window.
+        self.scrollback = CaptionScrollback(scrollback_lines, line_chars=60)
+        self._status_shown = True
+        self.visible_lines = int(visible_lines)
         self.initUI()
+        self.frame_timer = None
+        if max_fps:
+            self.frame_timer = QTimer(self)
+            self.frame_timer.setTimerType(Qt.TimerType.PreciseTimer)
+            self.frame_timer.timeout.connect(self.draw_frame)
+            self.frame_timer.start(int(1000 / max_fps))
 
     def initUI(self):
         # Window setup
@@ -67,23 +97,28 @@ class CaptionWindow(QMainWindow):
         self.layout.addWidget(self.title_bar)
         # ------------------------
 
-        # Label for text
-        self.label = QLabel("Waiting for audio...", self)
-        self.label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.label.setStyleSheet("""
-            QLabel {
-                color: white;
-                font-size: 24px;
-                font-family: Arial;
-                font-weight: bold;
+        # Caption area: fixed size so text changes never resize the window.
+        self.caption_area = QWidget()
+        self.caption_area.setObjectName("captionArea")
+        self.caption_area.setAttribute(Qt.WidgetAttribute.WA_StyledBackground)
+        self.caption_area.setStyleSheet("""
+            #captionArea {
                 background-color: rgba(0, 0, 0, 150);
                 border-bottom-left-radius: 10px;
                 border-bottom-right-radius: 10px;
-                padding: 10px;
             }
         """)
-        self.label.setWordWrap(True)
-        self.layout.addWidget(self.label)
+        self.caption_area.setFixedSize(800, 200)
+        self.caption_layout = QVBoxLayout(self.caption_area)
+        self.caption_layout.setContentsMargins(10, 10, 10, 10)
+        self.caption_layout.addStretch()
+        self.line_labels = []
+        for _ in range(self.visible_lines):
+            self.line_labels.append(self._caption_label(LINE_STYLE))
+        # Status text lives in the partial line until the first caption arrives.
+        self.label = self._caption_label(PARTIAL_STYLE)
+        self.label.setText("Waiting for audio...")
+        self.layout.addWidget(self.caption_area)
         self.layout.addStretch()
 
         # Position at bottom of screen
@@ -95,8 +130,84 @@ class CaptionWindow(QMainWindow):
             250
         )
 
-    def update_text(self, text):
-        self.label.setText(text)
+    def set_status(self, state, detail):
+        # Model loading progress from the transcriber; the caption area is only used for it
+        # until the first caption arrives.
+        labels = dict(loading="loading model", warming_up="warming up", error="model error",
+                      restarting="engine restarting")
+        suffix = f" - {labels[state]}" if state in labels else ""
+        self.title_label.setText(f"Live Captions (Drag to move){suffix}")
+        if detail and not self.has_caption:
+            self.label.setText(detail)
+            self._status_shown = True
+        elif state == "ready" and not self.has_caption:
+            self.label.setText("Waiting for audio...")
+            self._status_shown = True
+
+    def _caption_label(self, style):
+        label = QLabel("", self.caption_area)
+        label.setTextFormat(Qt.TextFormat.PlainText)
+        label.setWordWrap(True)
+        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        label.setStyleSheet(style)
+        self.caption_layout.addWidget(label)
+        return label
+
+    def update_text(self, text, captured_at=None):
+        # One finished caption per line (fixed-window mode); older lines scroll up.
+        self.has_caption = True
+        self.scrollback.push_final(text, captured_at=captured_at, new_line=True)
+        self._changed()
+
+    def show_final(self, caption):
+        # Fixed-window mode fed with transcriber.Caption: a line per final caption; partials
+        # (a draft model's provisional text) sit in the partial line until it arrives.
+        self.has_caption = True
+        if caption.final:
+            self.scrollback.push_final(caption.text, caption.source, caption.captured_at, new_line=True)
+        else:
+            self.scrollback.push_partial(caption.text, caption.captured_at)
+        self._changed()
+
+    def update_caption(self, caption):
+        # Streaming captions: committed text extends the current line, the unstable tail is
+        # the dimmed partial line below it.
+        self.has_caption = True
+        if caption.final:
+            self.scrollback.push_final(caption.text, caption.source, caption.captured_at)
+        else:
+            self.scrollback.push_partial(caption.text, caption.captured_at)
+        self._changed()
+
+    def _changed(self):
+        if self.frame_timer is None:
+            self.draw_frame()
+
+    def draw_frame(self):
+        # One frame: apply only what changed since the last one. Returns whether anything did.
+        frame = self.scrollback.take()
+        if frame is None:
+            return False
+        labels = self.line_labels
+        if frame["appended"]:
+            new = min(frame["appended"], len(labels))
+            for line in self.scrollback.tail(new):
+                # Recycle the top label as the new bottom line.
+                label = labels.pop(0)
+                self.caption_layout.removeWidget(label)
+                label.setText(line)
+                self.caption_layout.insertWidget(self.caption_layout.indexOf(self.label), label)
+                labels.append(label)
+        elif frame["tail_changed"] and labels:
+            labels[-1].setText(self.scrollback.lines[-1])
+        if frame["partial_changed"] or self._status_shown:
+            self.label.setText(self.scrollback.partial)
+            self._status_shown = False
+        if frame["dropped"]:
+            DROPPED_UPDATES.inc(frame["dropped"])
+        if frame["captured_at"] is not None:
+            DISPLAY_LATENCY.observe(time.perf_counter() - frame["captured_at"])
+        return True
 
     def close_app(self):
         # Force exit
@@ -0,0 +1,178 @@
+import numpy as np
+
+
+class VoiceActivityGate:
+    # Cheap pre-model speech gate. Per 30 ms frame it computes energy and spectral flatness
+    # (vectorized over every frame in a chunk), tracks an adaptive noise floor, and runs a
+    # hysteresis state machine: onset needs `onset_frames` loud, tonal frames; release
+    # needs `hangover_ms` below the lower release threshold. Only speech (plus a short
+    # pre-roll and the hangover) is passed to the sink; releases are reported as endpoints.
+    def __init__(
+        self,
+        sample_rate=16000,
+        *,
+        frame_ms=30,
+        onset_margin_db=9.0,
+        release_margin_db=5.0,
+        min_energy_db=-55.0,
+        flatness_threshold=0.45,
+        onset_frames=2,
+        hangover_ms=300,
+        preroll_ms=210,
+        floor_rise_db_per_s=3.0,
+        use_silero=False,
+    ):
+        self.sample_rate = sample_rate
+        self.frame = int(sample_rate * frame_ms / 1000)
+        self.onset_margin_db = float(onset_margin_db)
+        self.release_margin_db = float(release_margin_db)
+        self.min_energy_db = float(min_energy_db)
+        self.flatness_threshold = float(flatness_threshold)
+        self.onset_frames = int(onset_frames)
+        self.hangover_frames = max(1, int(hangover_ms / frame_ms))
+        self.preroll_frames = int(preroll_ms / frame_ms)
+        self.floor_rise_db = floor_rise_db_per_s * frame_ms / 1000.0
+        self.use_silero = use_silero
+        self._window = np.hanning(self.frame).astype(np.float32)
+        self._silero_options = None
+
+        self._staging = np.zeros(self.frame * 64, dtype=np.float32)
+        self._pending = 0
+        self._preroll = np.zeros(self.frame * max(self.preroll_frames, 1), dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        self.in_speech = False
+        self.noise_floor_db = self.min_energy_db
+        self._onset_count = 0
+        self._quiet_count = 0
+        self._preroll_len = 0
+        self._pending = 0
+        # Stream position (samples) of the first sample in _staging.
+        self._pos = 0
+        self.frames_total = 0
+        self.frames_kept = 0
+        self.endpoints = 0
+
+    def seek(self, stream_pos):
+        # Jump over audio that never reached the gate (shed upstream under overload). An
+        # open utterance ends at the gap; returns True if that produced an endpoint.
+        ended = self.in_speech
+        if ended:
+            self.endpoints += 1
+        self.in_speech = False
+        self._onset_count = 0
+        self._quiet_count = 0
+        self._preroll_len = 0
+        self._pending = 0
+        self._pos = int(stream_pos)
+        return ended
+
+    @property
+    def seconds_dropped(self):
+        return (self.frames_total - self.frames_kept) * self.frame / self.sample_rate
+
+    def process(self, chunk, sink):
+        # Feed one chunk of 16k mono float32. sink(samples, stream_pos) receives each
+        # contiguous run of kept audio. Returns True if speech ended inside this chunk.
+        n = len(chunk)
+        needed = self._pending + n
+        if needed > len(self._staging):
+            grown = np.zeros(needed + self.frame, dtype=np.float32)
+            grown[:self._pending] = self._staging[:self._pending]
+            self._staging = grown
+        self._staging[self._pending:needed] = chunk
+
+        n_frames = needed // self.frame
+        endpoint = False
+        if n_frames:
+            frames = self._staging[:n_frames * self.frame].reshape(n_frames, self.frame)
+            energy_db, flatness = self._features(frames)
+            endpoint = self._decide(frames, energy_db, flatness, sink)
+
+        # Carry the partial frame over to the next call.
+        used = n_frames * self.frame
+        rest = needed - used
+        self._staging[:rest] = self._staging[used:needed]
+        self._pending = rest
+        self._pos += used
+        return endpoint
+
+    def _features(self, frames):
+        power = np.mean(frames * frames, axis=1)
+        energy_db = 10.0 * np.log10(power + 1e-10)
+        spectrum = np.abs(np.fft.rfft(frames * self._window, axis=1)) ** 2 + 1e-12
+        # Geometric over arithmetic mean: ~0.56 for white noise, near 0 for voiced speech.
+        flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+        return energy_db, flatness
+
+    def _decide(self, frames, energy_db, flatness, sink):
+        endpoint = False
+        # Speech carried over from the previous chunk keeps its run open from frame 0.
+        run_start = 0 if self.in_speech else None
+        self.frames_total += len(frames)
+        for i in range(len(frames)):
+            e = energy_db[i]
+            if not self.in_speech:
+                # Floor follows quiet frames down immediately and creeps up slowly.
+                if e < self.noise_floor_db:
+                    self.noise_floor_db = max(e, -100.0)
+                else:
+                    self.noise_floor_db += self.floor_rise_db
+
+            onset_level = max(self.noise_floor_db + self.onset_margin_db, self.min_energy_db)
+            speech_like = e > onset_level and flatness[i] < self.flatness_threshold
+
+            if not self.in_speech:
+                self._onset_count = self._onset_count + 1 if speech_like else 0
+                if self._onset_count >= self.onset_frames:
+                    self.in_speech = True
+                    self._quiet_count = 0
+                    # The earlier onset frames and some lead-in are already in the pre-roll.
+                    preroll = self._preroll_len
+                    if preroll:
+                        sink(self._preroll[:preroll], self._pos + i * self.frame - preroll)
+                        self.frames_kept += preroll // self.frame
+                        self._preroll_len = 0
+                    run_start = i
+                else:
+                    self._push_preroll(frames[i])
+            else:
+                # Lower energy threshold than onset (hysteresis); noise-like frames count as quiet.
+                release_level = max(self.noise_floor_db + self.release_margin_db, self.min_energy_db)
+                voiced = e >= release_level and flatness[i] < self.flatness_threshold
+                self._quiet_count = 0 if voiced else self._quiet_count + 1
+                if self._quiet_count >= self.hangover_frames:
+                    self.in_speech = False
+                    self._onset_count = 0
+                    self.endpoints += 1
+                    endpoint = True
+                    self.frames_kept += i + 1 - run_start
+                    sink(frames[run_start:i + 1].reshape(-1), self._pos + run_start * self.frame)
+                    run_start = None
+
+        if run_start is not None:
+            self.frames_kept += len(frames) - run_start
+            sink(frames[run_start:].reshape(-1), self._pos + run_start * self.frame)
+        return endpoint
+
+    def _push_preroll(self, frame):
+        if not self.preroll_frames:
+            return
+        size = len(self._preroll)
+        if self._preroll_len == size:
+            self._preroll[:-self.frame] = self._preroll[self.frame:]
+            self._preroll_len -= self.frame
+        self._preroll[self._preroll_len:self._preroll_len + self.frame] = frame
+        self._preroll_len += self.frame
+
+    def confirm(self, audio):
+        # Optional second opinion from the Silero model bundled with faster-whisper, run once
+        # per closed window; music and other tonal non-speech passes the energy gate.
+        if not self.use_silero:
+            return True
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        if self._silero_options is None:
+            self._silero_options = VadOptions(min_silence_duration_ms=500)
+        return len(get_speech_timestamps(audio, self._silero_options)) > 0